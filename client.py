@@ -6,11 +6,10 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from utils.io_utils import write_file_bytes, read_file_bytes
-from crypto_core.file_decryptor import decrypt_packed_file
+from crypto_core.verified_decrypt import verify_and_decrypt_file
 from key_exchange.qkd_simulator import run_qkd_key_exchange
 from key_exchange.pqc_kyber import generate_pqc_shared_secret
 from key_exchange.hybrid_key_derivation import derive_hybrid_key
-from pqc_signature.dilithium_verify import verify_file_signature
 from audit.audit_log import create_log_entry, append_log
 from audit.audit_signer import sign_log_entry
 
@@ -51,6 +50,32 @@ def recv_file(conn):
 
     return filename, bytes(data)
 
+# Streams a file part straight to disk instead of buffering it
+def recv_file_to(conn, path):
+    header = recv_json(conn)
+
+    if header["type"] != "FILE_PART":
+        print("[CLIENT] ERROR: Invalid file-part header:", header)
+        return None
+
+    filename = header["filename"]
+    size = header["size"]
+
+    print(f"[CLIENT] Receiving {filename} ({size} bytes) → {path}")
+
+    remaining = size
+    buf = memoryview(bytearray(64 * 1024))
+
+    with open(path, "wb") as f:
+        while remaining > 0:
+            n = conn.recv_into(buf, min(len(buf), remaining))
+            if not n:
+                raise ConnectionError(f"Connection closed with {remaining} of {size} bytes of {filename} left.")
+            f.write(buf[:n])
+            remaining -= n
+
+    return filename
+
 def start_client():
     print("=====================================================")
     print("            QUANTACRYPT SECURE CLIENT")
@@ -84,14 +109,13 @@ def start_client():
         print(f"[CLIENT] Incoming secure file: {filename}")
 
         # Receive 5 artifacts
-        fname1, package = recv_file(conn)
+        fname1 = recv_file_to(conn, "cipher_package.bin")
         fname2, signature = recv_file(conn)
         fname3, pk_sig = recv_file(conn)
         fname4, sk_sig = recv_file(conn)
         fname5, hybrid_key = recv_file(conn)
 
         # Save
-        write_file_bytes("cipher_package.bin", package)
         write_file_bytes("cipher_signature.bin", signature)
         write_file_bytes("sender_pk_sig.bin", pk_sig)
         write_file_bytes("sender_sk_sig.bin", sk_sig)
@@ -112,18 +136,14 @@ def start_client():
         # Hybrid (not used)
         _ = derive_hybrid_key(qkd_key, pqc_key)
 
-        # Signature Verify
-        valid = verify_file_signature(package, signature, pk_sig)
+        # Signature Verify + Decrypt in one pass over the package
+        out_path = "decrypted_" + filename
+        valid, _ = verify_and_decrypt_file(hybrid_key, "cipher_package.bin", signature, pk_sig, out_path)
         print(f"[CLIENT] Signature valid: {valid}")
         if not valid:
             print("[CLIENT] Invalid signature. ABORT.")
             continue
 
-        # Decrypt
-        outdata = decrypt_packed_file(hybrid_key, package)
-
-        out_path = "decrypted_" + filename
-        write_file_bytes(out_path, outdata)
         print(f"[CLIENT] Decrypted → {out_path}")
 
         # Audit
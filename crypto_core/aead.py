@@ -0,0 +1,156 @@
+# Pluggable AEAD backends
+#
+# Segmented (v2) packages record the AEAD algorithm in their header, so
+# the sender can pick whatever is fastest on its host (AES-GCM with AES-NI,
+# ChaCha20-Poly1305 without) and every receiver dispatches on the header.
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import platform
+
+import cryptography
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCMSIV
+except ImportError:     # cryptography < 42
+    AESGCMSIV = None
+
+from utils.constants import (
+    NONCE_SIZE,
+    AEAD_AES_GCM,
+    AEAD_CHACHA20_POLY1305,
+    AEAD_AES_GCM_SIV,
+    AEAD_BENCH_SIZE,
+    AEAD_CACHE_FILE,
+)
+
+AEAD_IDS = {
+    "aes-gcm": AEAD_AES_GCM,
+    "chacha20-poly1305": AEAD_CHACHA20_POLY1305,
+    "aes-gcm-siv": AEAD_AES_GCM_SIV,
+}
+
+_AEAD_CLASSES = {
+    AEAD_AES_GCM: AESGCM,
+    AEAD_CHACHA20_POLY1305: ChaCha20Poly1305,
+    AEAD_AES_GCM_SIV: AESGCMSIV,
+}
+
+# Result of select_aead("auto") for this process
+_selected = None
+
+
+def aead_name(aead_id: int) -> str:
+    for name, aid in AEAD_IDS.items():
+        if aid == aead_id:
+            return name
+    raise ValueError(f"Unknown AEAD algorithm id: {aead_id}")
+
+def new_aead(aead_id: int, key: bytes):
+    """
+    Returns an AEAD object (encrypt/decrypt(nonce, data, aad)) keyed with
+    the first 32 bytes of key.
+    """
+    cls = _AEAD_CLASSES.get(aead_id)
+    if cls is None:
+        if aead_id in _AEAD_CLASSES:
+            raise ValueError(f"AEAD {aead_name(aead_id)} is not supported by this cryptography build.")
+        raise ValueError(f"Unknown AEAD algorithm id: {aead_id}")
+
+    try:
+        return cls(key[:32])
+    except UnsupportedAlgorithm:
+        raise ValueError(f"AEAD {aead_name(aead_id)} is not supported by the linked OpenSSL.")
+
+def available_aeads():
+    """
+    Ids of the AEADs usable on this host.
+    """
+    usable = []
+    for aead_id in _AEAD_CLASSES:
+        try:
+            new_aead(aead_id, bytes(32)).encrypt(bytes(NONCE_SIZE), b"", None)
+        except ValueError:
+            continue
+        usable.append(aead_id)
+    return usable
+
+
+# Startup micro-benchmark
+
+def benchmark_aeads(size: int = AEAD_BENCH_SIZE, rounds: int = 5) -> dict:
+    """
+    Encrypt + decrypt throughput (MB/s) of every available AEAD,
+    best of `rounds`, keyed by name.
+    """
+    data = os.urandom(size)
+    key = os.urandom(32)
+    nonce = bytes(NONCE_SIZE)
+    results = {}
+
+    for aead_id in available_aeads():
+        aead = new_aead(aead_id, key)
+        best = None
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            aead.decrypt(nonce, aead.encrypt(nonce, data, None), None)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        results[aead_name(aead_id)] = (2 * size / best / (1024 * 1024)) if best else 0.0
+
+    return results
+
+def _host_fingerprint() -> str:
+    # A cached choice is only valid for the same CPU / library combination
+    from cryptography.hazmat.backends.openssl import backend
+    return "|".join([platform.machine(), platform.processor(), platform.node(),
+                     cryptography.__version__, backend.openssl_version_text()])
+
+def select_aead(preference: str = "auto", cache_path: str = AEAD_CACHE_FILE) -> int:
+    """
+    preference -> an AEAD name, or "auto" to use the fastest one on this
+    host. The auto choice is benchmarked once and cached in memory and in
+    cache_path (pass None to skip the file).
+    """
+    global _selected
+
+    if preference != "auto":
+        if preference not in AEAD_IDS:
+            raise ValueError(f"Unknown AEAD: {preference}")
+        return AEAD_IDS[preference]
+
+    if _selected is not None:
+        return _selected
+
+    fingerprint = _host_fingerprint()
+
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r") as f:
+                cached = json.load(f)
+            if cached.get("host") == fingerprint and cached.get("aead") in AEAD_IDS:
+                _selected = AEAD_IDS[cached["aead"]]
+                return _selected
+        except (OSError, ValueError):
+            pass    # unreadable cache: benchmark again
+
+    results = benchmark_aeads()
+    best = max(results, key=results.get)
+    _selected = AEAD_IDS[best]
+
+    if cache_path:
+        try:
+            folder = os.path.dirname(cache_path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(cache_path, "w") as f:
+                json.dump({"host": fingerprint, "aead": best, "throughput_MBps": results}, f, indent=4)
+        except OSError:
+            pass
+
+    return _selected
@@ -0,0 +1,235 @@
+# Multi-file archive container (QCARCH)
+#
+# Many files share one hybrid key and one signature. Every member is
+# sealed on its own with AES-GCM (nonce = archive prefix || member index),
+# and the table of contents (names, sizes, offsets, SHA3-256 of each
+# sealed member) is sealed as the last record. Signing the sealed TOC
+# therefore covers every member, and a single member can be extracted
+# without touching the others.
+#
+# Layout:
+#   header  = ARCHIVE_MAGIC || version || nonce prefix
+#   members = ciphertext || tag, one per file
+#   toc     = ciphertext || tag of the JSON table of contents
+#   footer  = toc offset (uint64) || toc length (uint64) || ARCHIVE_FOOTER_MAGIC
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import hashlib
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from utils.constants import (
+    ARCHIVE_MAGIC,
+    ARCHIVE_VERSION,
+    ARCHIVE_NONCE_PREFIX_SIZE,
+    ARCHIVE_HEADER_SIZE,
+    ARCHIVE_FOOTER_MAGIC,
+    ARCHIVE_FOOTER_SIZE,
+    ENCODING,
+)
+from utils.io_utils import (
+    read_file_bytes,
+    write_file_bytes,
+    read_exact,
+    ensure_file_exists,
+    pack_uint64,
+    unpack_uint64,
+)
+
+# Index reserved for the table of contents record
+TOC_INDEX = 0xFFFFFFFF
+
+
+def _member_nonce(nonce_prefix: bytes, index: int) -> bytes:
+    return nonce_prefix + index.to_bytes(4, "big")
+
+def _member_aad(header: bytes, index: int, name: str) -> bytes:
+    return header + index.to_bytes(4, "big") + name.encode(ENCODING)
+
+
+class ArchiveWriter:
+    """
+    Writes a QCARCH archive:
+
+        with ArchiveWriter(key, "cipher_archive.bin") as w:
+            w.add_file("notes/a.txt")
+        manifest = w.manifest     # sign this once for the whole archive
+    """
+
+    def __init__(self, key: bytes, output_path: str):
+        if len(key) < 32:
+            raise ValueError("Hybrid key must be at least 32 bytes for AES-256-GCM.")
+
+        folder = os.path.dirname(output_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self._aesgcm = AESGCM(key[:32])
+        self._nonce_prefix = os.urandom(ARCHIVE_NONCE_PREFIX_SIZE)
+        self._header = ARCHIVE_MAGIC + ARCHIVE_VERSION.to_bytes(1, "big") + self._nonce_prefix
+        self._f = open(output_path, "wb")
+        self._f.write(self._header)
+        self._offset = len(self._header)
+        self._entries = []
+        self._names = set()
+        self.manifest = None
+
+    def add_bytes(self, name: str, data: bytes):
+        if name in self._names:
+            raise ValueError(f"Duplicate archive member: {name}")
+
+        index = len(self._entries)
+        if index >= TOC_INDEX:
+            raise ValueError("Too many archive members.")
+
+        sealed = self._aesgcm.encrypt(_member_nonce(self._nonce_prefix, index), data,
+                                      _member_aad(self._header, index, name))
+        self._f.write(sealed)
+
+        self._entries.append({
+            "name": name,
+            "size": len(data),
+            "offset": self._offset,
+            "length": len(sealed),
+            "sha3_256": hashlib.sha3_256(sealed).hexdigest()
+        })
+        self._names.add(name)
+        self._offset += len(sealed)
+
+    def add_file(self, path: str, arcname: str = None):
+        self.add_bytes(arcname or os.path.basename(path), read_file_bytes(path))
+
+    def close(self) -> bytes:
+        """
+        Seals the table of contents and returns it (the manifest to sign).
+        """
+        if self.manifest is not None:
+            return self.manifest
+
+        toc = json.dumps({"members": self._entries}, sort_keys=True).encode(ENCODING)
+        sealed_toc = self._aesgcm.encrypt(_member_nonce(self._nonce_prefix, TOC_INDEX), toc, self._header)
+
+        self._f.write(sealed_toc)
+        self._f.write(pack_uint64(self._offset) + pack_uint64(len(sealed_toc)) + ARCHIVE_FOOTER_MAGIC)
+        self._f.close()
+
+        self.manifest = self._header + sealed_toc
+        return self.manifest
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+
+
+def _read_layout(f):
+    """
+    Returns (header, toc_offset, toc_length) of an open archive.
+    """
+    header = read_exact(f, ARCHIVE_HEADER_SIZE)
+    if len(header) != ARCHIVE_HEADER_SIZE or header[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+        raise ValueError("Invalid archive format. Magic bytes mismatch.")
+    if header[len(ARCHIVE_MAGIC)] != ARCHIVE_VERSION:
+        raise ValueError(f"Unsupported archive version: {header[len(ARCHIVE_MAGIC)]}")
+
+    f.seek(-ARCHIVE_FOOTER_SIZE, os.SEEK_END)
+    footer = read_exact(f, ARCHIVE_FOOTER_SIZE)
+    if footer[16:] != ARCHIVE_FOOTER_MAGIC:
+        raise ValueError("Missing or corrupt archive footer.")
+
+    return header, unpack_uint64(footer[:8]), unpack_uint64(footer[8:16])
+
+def read_archive_manifest(path: str) -> bytes:
+    """
+    Returns the signed manifest (header || sealed TOC) without needing the key.
+    """
+    ensure_file_exists(path)
+    with open(path, "rb") as f:
+        header, toc_offset, toc_length = _read_layout(f)
+        f.seek(toc_offset)
+        return header + read_exact(f, toc_length)
+
+
+class ArchiveReader:
+    """
+    Opens a QCARCH archive; the TOC is authenticated on open and each
+    member is authenticated (tag + TOC digest) when it is extracted.
+    """
+
+    def __init__(self, key: bytes, path: str):
+        ensure_file_exists(path)
+
+        self._aesgcm = AESGCM(key[:32])
+        self._f = open(path, "rb")
+
+        header, toc_offset, toc_length = _read_layout(self._f)
+        self._header = header
+        self._nonce_prefix = header[len(ARCHIVE_MAGIC) + 1:]
+
+        self._f.seek(toc_offset)
+        sealed_toc = read_exact(self._f, toc_length)
+        self.manifest = header + sealed_toc
+
+        toc = self._aesgcm.decrypt(_member_nonce(self._nonce_prefix, TOC_INDEX), sealed_toc, header)
+        self.members = json.loads(toc.decode(ENCODING))["members"]
+        self._by_name = {m["name"]: (i, m) for i, m in enumerate(self.members)}
+
+    def names(self):
+        return [m["name"] for m in self.members]
+
+    def extract(self, name: str) -> bytes:
+        if name not in self._by_name:
+            raise KeyError(f"No such archive member: {name}")
+        index, entry = self._by_name[name]
+
+        self._f.seek(entry["offset"])
+        sealed = read_exact(self._f, entry["length"])
+        if hashlib.sha3_256(sealed).hexdigest() != entry["sha3_256"]:
+            raise ValueError(f"Archive member does not match the manifest: {name}")
+
+        data = self._aesgcm.decrypt(_member_nonce(self._nonce_prefix, index), sealed,
+                                    _member_aad(self._header, index, name))
+        if len(data) != entry["size"]:
+            raise ValueError(f"Archive member size mismatch: {name}")
+        return data
+
+    def extract_to(self, name: str, output_dir: str) -> str:
+        # Keep members inside output_dir whatever their stored name is
+        target = os.path.realpath(os.path.join(output_dir, name))
+        if not target.startswith(os.path.realpath(output_dir) + os.sep):
+            raise ValueError(f"Unsafe archive member path: {name}")
+
+        write_file_bytes(target, self.extract(name))
+        return target
+
+    def extract_all(self, output_dir: str):
+        return [self.extract_to(name, output_dir) for name in self.names()]
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def create_archive(key: bytes, root_dir: str, output_path: str) -> bytes:
+    """
+    Packs every file below root_dir (relative paths as member names).
+    Returns the manifest to sign.
+    """
+    with ArchiveWriter(key, output_path) as writer:
+        for folder, _, files in sorted(os.walk(root_dir)):
+            for filename in sorted(files):
+                path = os.path.join(folder, filename)
+                writer.add_file(path, os.path.relpath(path, root_dir).replace(os.sep, "/"))
+    return writer.manifest
@@ -0,0 +1,143 @@
+# Optional compression stage (applied to each segment before encryption)
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import zlib
+import lzma
+
+from utils.constants import (
+    CODEC_NONE,
+    CODEC_ZLIB,
+    CODEC_LZMA,
+    COMPRESSION_SAMPLE_SIZE,
+    COMPRESSION_SKIP_RATIO,
+)
+
+CODEC_IDS = {
+    "none": CODEC_NONE,
+    "zlib": CODEC_ZLIB,
+    "lzma": CODEC_LZMA,
+}
+
+# Fast levels by default: the stage sits on the encryption hot path
+DEFAULT_LEVELS = {
+    CODEC_ZLIB: 1,
+    CODEC_LZMA: 1,
+}
+
+# Per-segment marker stored in front of the (encrypted) payload, so a
+# segment that does not shrink can be kept raw
+SEGMENT_RAW = b"\x00"
+SEGMENT_COMPRESSED = b"\x01"
+
+
+def codec_name(codec: int) -> str:
+    for name, cid in CODEC_IDS.items():
+        if cid == codec:
+            return name
+    raise ValueError(f"Unknown compression codec id: {codec}")
+
+def compress_bytes(codec: int, data: bytes, level: int = None) -> bytes:
+    level = DEFAULT_LEVELS.get(codec) if level is None else level
+
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, level)
+    if codec == CODEC_LZMA:
+        return lzma.compress(data, format=lzma.FORMAT_XZ, preset=level)
+    raise ValueError(f"Unknown compression codec id: {codec}")
+
+def decompress_bytes(codec: int, data: bytes, expected_size: int) -> bytes:
+    """
+    Decompresses at most expected_size bytes, so a crafted segment cannot
+    expand past the size declared in the package.
+    """
+    if codec == CODEC_ZLIB:
+        d = zlib.decompressobj()
+        out = d.decompress(data, expected_size)
+        ok = d.eof and not d.unconsumed_tail
+    elif codec == CODEC_LZMA:
+        d = lzma.LZMADecompressor()
+        out = d.decompress(data, expected_size)
+        ok = d.eof
+    else:
+        raise ValueError(f"Unknown compression codec id: {codec}")
+
+    if not ok or len(out) != expected_size:
+        raise ValueError("Compressed segment does not match its declared size.")
+    return out
+
+
+# Incompressibility detection
+
+def estimate_ratio(sample: bytes) -> float:
+    """
+    Compressed / original size of a sample using fast zlib (level 1).
+    Already-compressed data (JPEG, zip, video, ...) comes out near 1.0.
+    """
+    if not sample:
+        return 1.0
+    return len(zlib.compress(sample, 1)) / len(sample)
+
+def read_sample(f, size: int, sample_size: int = COMPRESSION_SAMPLE_SIZE) -> bytes:
+    """
+    Reads up to sample_size bytes spread over the start, middle and end
+    of the next `size` bytes of a seekable file, then restores the file
+    position.
+    """
+    pos = f.tell()
+
+    if size <= sample_size:
+        sample = f.read(size)
+    else:
+        piece = sample_size // 3
+        parts = []
+        for offset in (0, (size - piece) // 2, size - piece):
+            f.seek(pos + offset)
+            parts.append(f.read(piece))
+        sample = b"".join(parts)
+
+    f.seek(pos)
+    return sample
+
+def choose_codec(requested: str, sample: bytes) -> int:
+    """
+    requested -> "none", "zlib", "lzma" or "auto".
+    "auto" picks zlib unless the sample looks incompressible.
+    An explicit codec is also skipped for incompressible samples.
+    """
+    if requested not in CODEC_IDS and requested != "auto":
+        raise ValueError(f"Unknown compression mode: {requested}")
+
+    if requested == "none":
+        return CODEC_NONE
+
+    if estimate_ratio(sample[:COMPRESSION_SAMPLE_SIZE]) > COMPRESSION_SKIP_RATIO:
+        return CODEC_NONE
+
+    return CODEC_ZLIB if requested == "auto" else CODEC_IDS[requested]
+
+
+# Segment payloads
+
+def encode_segment(codec: int, data: bytes, level: int = None) -> bytes:
+    if codec == CODEC_NONE:
+        return data
+
+    packed = compress_bytes(codec, data, level)
+    if len(packed) < len(data):
+        return SEGMENT_COMPRESSED + packed
+    return SEGMENT_RAW + data
+
+def decode_segment(codec: int, payload: bytes, expected_size: int) -> bytes:
+    if codec == CODEC_NONE:
+        return payload
+
+    marker, body = payload[:1], payload[1:]
+    if marker == SEGMENT_RAW:
+        if len(body) != expected_size:
+            raise ValueError("Raw segment does not match its declared size.")
+        return body
+    if marker == SEGMENT_COMPRESSED:
+        return decompress_bytes(codec, body, expected_size)
+    raise ValueError("Invalid segment compression marker.")
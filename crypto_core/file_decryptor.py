@@ -3,11 +3,42 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import mmap
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
-from utils.constants import NONCE_SIZE
-from utils.io_utils import ensure_file_exists
-from .file_packager import unpack_encrypted_file
+from utils.constants import (
+    NONCE_SIZE,
+    TAG_SIZE,
+    STREAM_VERSION,
+    STREAM_HEADER_SIZE,
+    FLAG_INDEXED,
+    CODEC_NONE,
+    AEAD_AES_GCM,
+)
+from utils.io_utils import ensure_file_exists, unpack_uint32
+from .file_packager import (
+    unpack_encrypted_file,
+    unpack_encrypted_view,
+    unpack_stream_header,
+    segment_index_size,
+    package_segment_index,
+    get_package_version,
+)
+from .stream_cipher import (
+    decrypt_stream_bytes,
+    segment_count,
+    segment_nonce,
+    segment_plain_size,
+    max_sealed_size,
+    open_record,
+)
+from .file_encryptor import gcm_update_into, UPDATE_SLACK
+from .aead import new_aead
+
+# Chunk size used when decrypting into a file
+DECRYPT_CHUNK_SIZE = 4 * 1024 * 1024
 
 def aes_gcm_decrypt(key: bytes, ciphertext: bytes, nonce: bytes, tag: bytes):
     aesgcm = AESGCM(key[:32])
@@ -19,8 +50,211 @@ def aes_gcm_decrypt(key: bytes, ciphertext: bytes, nonce: bytes, tag: bytes):
     return plaintext
 
 def decrypt_packed_file(key: bytes, packed_bytes: bytes):
+    # Segmented (v2) packages carry one tag per segment
+    if get_package_version(packed_bytes) == STREAM_VERSION:
+        return decrypt_stream_bytes(key, packed_bytes)
+
     version, nonce, tag, file_size, ciphertext = unpack_encrypted_file(packed_bytes)
 
     plaintext = aes_gcm_decrypt(key, ciphertext, nonce, tag)
 
     return plaintext[:file_size]
+
+
+# Zero-copy decryption (memoryview / mmap)
+
+def _gcm_decryptor(key: bytes, nonce: bytes, tag: bytes, aad: bytes = None):
+    decryptor = Cipher(algorithms.AES(key[:32]), modes.GCM(bytes(nonce), bytes(tag))).decryptor()
+    if aad:
+        decryptor.authenticate_additional_data(aad)
+    return decryptor
+
+def _wipe(view):
+    zeros = bytes(min(len(view), DECRYPT_CHUNK_SIZE))
+    for pos in range(0, len(view), len(zeros) or 1):
+        end = min(pos + len(zeros), len(view))
+        view[pos:end] = zeros[:end - pos]
+
+def _stream_header(view):
+    """
+    Returns (raw header, StreamHeader) for a v2 package, None for v1.
+    """
+    if get_package_version(view) != STREAM_VERSION:
+        return None
+    header = bytes(view[:STREAM_HEADER_SIZE])
+    return header, unpack_stream_header(header)
+
+def _check_index(view, hdr, offsets):
+    if hdr.flags & FLAG_INDEXED:
+        if view[offsets[-1]:] != package_segment_index(offsets):
+            raise ValueError("Segment index does not match the package layout.")
+    elif len(view) != offsets[-1]:
+        raise ValueError("Unexpected trailing data after final segment.")
+
+def _iter_package_parts(key: bytes, view):
+    """
+    Yields (decryptor, ciphertext_view, output_offset) for every
+    authenticated unit of an uncompressed AES-GCM package: the whole body for v1,
+    one per segment for v2. finalize() must be called on each decryptor.
+    """
+    parsed = _stream_header(view)
+    if parsed:
+        header, hdr = parsed
+
+        count = segment_count(hdr.file_size, hdr.segment_size)
+        expected = STREAM_HEADER_SIZE + hdr.file_size + count * TAG_SIZE
+        if hdr.flags & FLAG_INDEXED:
+            expected += segment_index_size(count)
+        if len(view) != expected:
+            raise ValueError("Package length does not match its header.")
+
+        offsets = [STREAM_HEADER_SIZE]
+        for index in range(count):
+            pos = offsets[-1]
+            plain_len = segment_plain_size(hdr, index)
+            ciphertext = view[pos:pos + plain_len]
+            tag = view[pos + plain_len:pos + plain_len + TAG_SIZE]
+            nonce = segment_nonce(hdr.nonce_prefix, index, index == count - 1)
+
+            yield _gcm_decryptor(key, nonce, tag, header), ciphertext, index * hdr.segment_size
+            offsets.append(pos + plain_len + TAG_SIZE)
+
+        _check_index(view, hdr, offsets)
+        return
+
+    _, nonce, tag, file_size, ciphertext = unpack_encrypted_view(view)
+    if len(ciphertext) != file_size:
+        raise ValueError("Ciphertext length does not match its header.")
+
+    yield _gcm_decryptor(key, nonce, tag), ciphertext, 0
+
+def _iter_sealed_segments(key: bytes, view, header: bytes, hdr):
+    """
+    Yields (plaintext, output_offset) per segment of a v2 package that
+    needs the one-shot AEAD path (compressed, or not AES-GCM). Each
+    segment is opened into its own (bounded) buffer.
+    """
+    cipher = new_aead(hdr.aead, key)
+    count = segment_count(hdr.file_size, hdr.segment_size)
+    framed = hdr.codec != CODEC_NONE
+
+    offsets = [STREAM_HEADER_SIZE]
+    for index in range(count):
+        pos = offsets[-1]
+        if framed:
+            if pos + 4 > len(view):
+                raise ValueError("Truncated package: segment data missing.")
+            sealed_len = unpack_uint32(view[pos:pos + 4])
+            pos += 4
+        else:
+            sealed_len = segment_plain_size(hdr, index) + TAG_SIZE
+        if not TAG_SIZE <= sealed_len <= max_sealed_size(hdr, index) or pos + sealed_len > len(view):
+            raise ValueError("Invalid segment record length.")
+
+        sealed = view[pos:pos + sealed_len]
+        yield open_record(cipher, header, hdr, index, sealed), index * hdr.segment_size
+        offsets.append(pos + sealed_len)
+
+    _check_index(view, hdr, offsets)
+
+def _needs_one_shot(view) -> bool:
+    # The copy-free GCM path only covers uncompressed AES-GCM packages
+    parsed = _stream_header(view)
+    return parsed is not None and (parsed[1].codec != CODEC_NONE or parsed[1].aead != AEAD_AES_GCM)
+
+def get_plaintext_size(packed) -> int:
+    view = memoryview(packed).cast("B")
+    parsed = _stream_header(view)
+    if parsed:
+        return parsed[1].file_size
+    return unpack_encrypted_view(view)[3]
+
+def decrypt_packed_into(key: bytes, packed, out=None):
+    """
+    Decrypts a package held in any buffer (bytes, bytearray, mmap, ...)
+    straight into out without copying the ciphertext (compressed and
+    non-AES-GCM packages go through one segment-sized buffer). out defaults to a new bytearray
+    of the plaintext size. Returns a memoryview of the
+    plaintext; on authentication failure the output is wiped and
+    cryptography.exceptions.InvalidTag is raised.
+    """
+    view = memoryview(packed).cast("B")
+    file_size = get_plaintext_size(view)
+
+    if out is None:
+        out = bytearray(file_size)
+    out_view = memoryview(out).cast("B")
+    if len(out_view) < file_size:
+        raise ValueError(f"Output buffer too small: need {file_size} bytes.")
+
+    try:
+        if _needs_one_shot(view):
+            header, hdr = _stream_header(view)
+            for plaintext, offset in _iter_sealed_segments(key, view, header, hdr):
+                out_view[offset:offset + len(plaintext)] = plaintext
+        else:
+            for decryptor, ciphertext, offset in _iter_package_parts(key, view):
+                gcm_update_into(decryptor, ciphertext, out_view[offset:offset + len(ciphertext)])
+                decryptor.finalize()
+    except Exception:
+        _wipe(out_view[:file_size])
+        raise
+
+    return out_view[:file_size]
+
+def _decrypt_view_to_file(key: bytes, view, dst, chunk_size: int) -> int:
+    written = 0
+
+    if _needs_one_shot(view):
+        header, hdr = _stream_header(view)
+        for plaintext, _ in _iter_sealed_segments(key, view, header, hdr):
+            dst.write(plaintext)
+            written += len(plaintext)
+        return written
+
+    scratch = memoryview(bytearray(chunk_size + UPDATE_SLACK))
+
+    for decryptor, ciphertext, _ in _iter_package_parts(key, view):
+        for pos in range(0, len(ciphertext), chunk_size):
+            n = decryptor.update_into(ciphertext[pos:pos + chunk_size], scratch)
+            dst.write(scratch[:n])
+            written += n
+        decryptor.finalize()
+
+    return written
+
+def decrypt_package_file(key: bytes, package_path: str, output_path: str,
+                         chunk_size: int = DECRYPT_CHUNK_SIZE) -> int:
+    """
+    Decrypts package_path into output_path through a memory map of the
+    package and one reusable chunk buffer, so memory use does not grow
+    with the file. The output only appears once every tag has verified.
+    Returns the number of plaintext bytes written.
+    """
+    ensure_file_exists(package_path)
+
+    folder = os.path.dirname(output_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    tmp_path = output_path + ".part"
+
+    try:
+        with open(package_path, "rb") as src, open(tmp_path, "wb") as dst:
+            mm = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                written = _decrypt_view_to_file(key, memoryview(mm), dst, chunk_size)
+            finally:
+                try:
+                    mm.close()
+                except BufferError:
+                    # A traceback still holds a view; the map closes on GC
+                    pass
+
+        os.replace(tmp_path, output_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return written
@@ -3,10 +3,22 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import os
 
-from utils.constants import NONCE_SIZE
+from utils.constants import NONCE_SIZE, TAG_SIZE, HEADER_FIXED_SIZE
+from utils.io_utils import ensure_file_exists
+from .file_packager import package_header, TAG_OFFSET
+from .aead import select_aead, aead_name
+from .stream_cipher import encrypt_stream_bytes
+
+# Chunk size used when encrypting from a file
+ENCRYPT_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Some cryptography releases require update_into() output buffers to have
+# (block size - 1) spare bytes, even for GCM
+UPDATE_SLACK = 15
 
 def aes_gcm_encrypt(key: bytes, plaintext: bytes):
     """
@@ -28,3 +40,117 @@ def aes_gcm_encrypt(key: bytes, plaintext: bytes):
 
 def encrypt_file_bytes(key: bytes, file_bytes: bytes):
     return aes_gcm_encrypt(key, file_bytes)
+
+
+# Copy-free encrypt + package (VERSION 1 layout)
+
+def gcm_update_into(ctx, src, dst):
+    """
+    Runs ctx over src, writing the output into dst (same length as src).
+    Only the last few bytes go through a temporary when dst has no slack.
+    """
+    n = len(src)
+    limit = max(0, min(n, len(dst) - UPDATE_SLACK))
+    if limit:
+        ctx.update_into(src[:limit], dst)
+    if limit < n:
+        dst[limit:n] = ctx.update(src[limit:n])
+
+def _gcm_encryptor(key: bytes):
+    if len(key) < 32:
+        raise ValueError("Hybrid key must be at least 32 bytes for AES-256-GCM.")
+
+    nonce = os.urandom(NONCE_SIZE)
+    encryptor = Cipher(algorithms.AES(key[:32]), modes.GCM(nonce)).encryptor()
+    return encryptor, nonce
+
+def encrypt_and_package(key: bytes, plaintext, out=None):
+    """
+    Encrypts plaintext (any buffer) and packages it in one buffer: the
+    header is reserved up front, ciphertext is written straight after it
+    and the tag is patched into the header at the end.
+
+    Returns a bytearray holding exactly the package, or a memoryview of
+    out when a preallocated buffer of at least
+    HEADER_FIXED_SIZE + len(plaintext) bytes is given.
+    """
+    src = memoryview(plaintext).cast("B")
+    file_size = len(src)
+    total = HEADER_FIXED_SIZE + file_size
+
+    owned = out is None
+    if owned:
+        out = bytearray(total + UPDATE_SLACK)
+
+    encryptor, nonce = _gcm_encryptor(key)
+
+    with memoryview(out).cast("B") as dst:
+        if len(dst) < total:
+            raise ValueError(f"Output buffer too small: need {total} bytes.")
+
+        dst[:HEADER_FIXED_SIZE] = package_header(nonce, bytes(TAG_SIZE), file_size)
+        gcm_update_into(encryptor, src, dst[HEADER_FIXED_SIZE:total])
+        encryptor.finalize()
+        dst[TAG_OFFSET:TAG_OFFSET + TAG_SIZE] = encryptor.tag
+
+    if owned:
+        # Shrinking a bytearray in place does not copy it
+        del out[total:]
+        return out
+
+    return memoryview(out)[:total]
+
+def encrypt_and_package_file(key: bytes, input_path: str, output_path: str,
+                             chunk_size: int = ENCRYPT_CHUNK_SIZE) -> int:
+    """
+    File-to-file variant of encrypt_and_package using one reusable input
+    buffer and one reusable output buffer. Returns the package size.
+    """
+    ensure_file_exists(input_path)
+
+    folder = os.path.dirname(output_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    encryptor, nonce = _gcm_encryptor(key)
+    inbuf = memoryview(bytearray(chunk_size))
+    outbuf = memoryview(bytearray(chunk_size + UPDATE_SLACK))
+
+    try:
+        with open(input_path, "rb") as src, open(output_path, "wb") as dst:
+            file_size = os.fstat(src.fileno()).st_size
+            dst.write(package_header(nonce, bytes(TAG_SIZE), file_size))
+
+            read = 0
+            while n := src.readinto(inbuf):
+                written = encryptor.update_into(inbuf[:n], outbuf)
+                dst.write(outbuf[:written])
+                read += n
+            if read != file_size:
+                raise ValueError("Input changed size during encryption.")
+
+            encryptor.finalize()
+            dst.seek(TAG_OFFSET)
+            dst.write(encryptor.tag)
+    except Exception:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+    return HEADER_FIXED_SIZE + file_size
+
+
+# Format selection
+
+def encrypt_package(key: bytes, plaintext, aead: str = "aes-gcm", compression: str = "none"):
+    """
+    Plain AES-GCM uses the single-shot VERSION 1 package; any other AEAD
+    (or compression) uses the segmented VERSION 2 package, whose header
+    records the algorithm so the receiver can dispatch on it.
+    aead may be "auto" (fastest AEAD on this host, see aead.py).
+    """
+    aead = aead_name(select_aead(aead))
+
+    if aead == "aes-gcm" and compression == "none":
+        return encrypt_and_package(key, plaintext)
+    return encrypt_stream_bytes(key, bytes(plaintext), compression=compression, aead=aead)
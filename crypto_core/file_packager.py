@@ -2,20 +2,35 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from collections import namedtuple
+
 from utils.constants import (
     MAGIC_BYTES,
     VERSION,
     NONCE_SIZE,
     TAG_SIZE,
+    STREAM_VERSION,
+    NONCE_PREFIX_SIZE,
+    STREAM_HEADER_SIZE,
+    MIN_SEGMENT_SIZE,
+    MAX_SEGMENT_SIZE,
+    FLAG_INDEXED,
+    CODEC_NONE,
+    CODEC_ZLIB,
+    CODEC_LZMA,
+    AEAD_AES_GCM,
+    AEAD_CHACHA20_POLY1305,
+    AEAD_AES_GCM_SIV,
+    INDEX_MAGIC,
+    INDEX_FOOTER_SIZE,
 )
-from utils.io_utils import pack_uint64, unpack_uint64
+from utils.io_utils import pack_uint64, unpack_uint64, pack_uint32, unpack_uint32
 
-# Encrypted file + Metadata Header
-def package_encrypted_file(ciphertext: bytes, nonce: bytes, tag: bytes, original_file_size: int):
-    """
-    Returns a fully packaged encrypted file ready to be signed.
-    """
+# Offset of the tag inside the VERSION 1 header (patched after encryption)
+TAG_OFFSET = len(MAGIC_BYTES) + 1 + NONCE_SIZE
 
+# Metadata Header (VERSION 1)
+def package_header(nonce: bytes, tag: bytes, original_file_size: int) -> bytes:
     header = bytearray()
     header += MAGIC_BYTES               # 6 bytes
     header += VERSION.to_bytes(1, "big")  # 1 byte
@@ -23,7 +38,14 @@ def package_encrypted_file(ciphertext: bytes, nonce: bytes, tag: bytes, original
     header += tag                       # 16 bytes
     header += pack_uint64(original_file_size)  # 8 bytes
 
-    return bytes(header) + ciphertext
+    return bytes(header)
+
+# Encrypted file + Metadata Header
+def package_encrypted_file(ciphertext: bytes, nonce: bytes, tag: bytes, original_file_size: int):
+    """
+    Returns a fully packaged encrypted file ready to be signed.
+    """
+    return package_header(nonce, tag, original_file_size) + ciphertext
 
 # Unpack header + encrypted content
 
@@ -60,3 +82,126 @@ def unpack_encrypted_file(packed_data: bytes):
     ciphertext = packed_data[offset:]
 
     return version, nonce, tag, file_size, ciphertext
+
+# Zero-copy variant of unpack_encrypted_file for memoryview / mmap input
+
+def unpack_encrypted_view(packed_data):
+    """
+    Same as unpack_encrypted_file, but the ciphertext is returned as a
+    memoryview into packed_data instead of a copy.
+    """
+    view = memoryview(packed_data).cast("B")
+    version, nonce, tag, file_size, ciphertext = unpack_encrypted_file(view)
+    return version, bytes(nonce), bytes(tag), file_size, ciphertext
+
+# Package format version (1 = single-shot, 2 = segmented stream)
+
+def get_package_version(packed_data: bytes) -> int:
+    if packed_data[:len(MAGIC_BYTES)] != MAGIC_BYTES:
+        raise ValueError("Invalid file format. Magic bytes mismatch.")
+    return packed_data[len(MAGIC_BYTES)]
+
+# Segmented stream header (VERSION 2)
+
+KNOWN_FLAGS = FLAG_INDEXED
+KNOWN_CODECS = (CODEC_NONE, CODEC_ZLIB, CODEC_LZMA)
+KNOWN_AEADS = (AEAD_AES_GCM, AEAD_CHACHA20_POLY1305, AEAD_AES_GCM_SIV)
+
+StreamHeader = namedtuple(
+    "StreamHeader",
+    ["version", "flags", "codec", "aead", "nonce_prefix", "segment_size", "file_size"]
+)
+
+def package_stream_header(nonce_prefix: bytes, segment_size: int, original_file_size: int,
+                          flags: int = 0, codec: int = CODEC_NONE, aead: int = AEAD_AES_GCM) -> bytes:
+    """
+    Header for a segmented package. The segments follow it directly,
+    each one being ciphertext || tag (length-prefixed when a compression
+    codec is set), then the segment index when FLAG_INDEXED is set.
+    """
+    if len(nonce_prefix) != NONCE_PREFIX_SIZE:
+        raise ValueError(f"Nonce prefix must be {NONCE_PREFIX_SIZE} bytes.")
+    if not MIN_SEGMENT_SIZE <= segment_size <= MAX_SEGMENT_SIZE:
+        raise ValueError(f"Segment size must be between {MIN_SEGMENT_SIZE} and {MAX_SEGMENT_SIZE} bytes.")
+
+    header = bytearray()
+    header += MAGIC_BYTES                       # 6 bytes
+    header += STREAM_VERSION.to_bytes(1, "big") # 1 byte
+    header += flags.to_bytes(1, "big")          # 1 byte
+    header += codec.to_bytes(1, "big")          # 1 byte
+    header += aead.to_bytes(1, "big")           # 1 byte
+    header += nonce_prefix                      # 7 bytes
+    header += pack_uint32(segment_size)         # 4 bytes
+    header += pack_uint64(original_file_size)   # 8 bytes
+
+    return bytes(header)
+
+def unpack_stream_header(header: bytes):
+    """
+    Parses a segmented package header.
+    Returns StreamHeader(version, flags, codec, aead, nonce_prefix, segment_size, file_size)
+    """
+    if len(header) < STREAM_HEADER_SIZE:
+        raise ValueError("Truncated package header.")
+
+    version = get_package_version(header)
+    if version != STREAM_VERSION:
+        raise ValueError(f"Unsupported package version for stream header: {version}")
+
+    offset = len(MAGIC_BYTES) + 1
+
+    flags = header[offset]
+    offset += 1
+
+    codec = header[offset]
+    offset += 1
+
+    aead = header[offset]
+    offset += 1
+
+    nonce_prefix = bytes(header[offset:offset + NONCE_PREFIX_SIZE])
+    offset += NONCE_PREFIX_SIZE
+
+    segment_size = unpack_uint32(header[offset:offset + 4])
+    offset += 4
+
+    file_size = unpack_uint64(header[offset:offset + 8])
+
+    if not MIN_SEGMENT_SIZE <= segment_size <= MAX_SEGMENT_SIZE:
+        raise ValueError("Invalid segment size in package header.")
+    if flags & ~KNOWN_FLAGS:
+        raise ValueError(f"Unsupported package flags: {flags:#04x}")
+    if codec not in KNOWN_CODECS:
+        raise ValueError(f"Unsupported compression codec: {codec}")
+    if aead not in KNOWN_AEADS:
+        raise ValueError(f"Unsupported AEAD algorithm: {aead}")
+
+    return StreamHeader(version, flags, codec, aead, nonce_prefix, segment_size, file_size)
+
+# Segment offset index (trailer of a VERSION 2 package)
+
+def package_segment_index(offsets) -> bytes:
+    """
+    offsets = absolute start of every segment record, followed by the end
+    of the last record (where the index itself begins).
+    """
+    index = bytearray()
+    for offset in offsets:
+        index += pack_uint64(offset)
+    index += INDEX_MAGIC
+    index += pack_uint64(offsets[-1])
+    return bytes(index)
+
+def segment_index_size(count: int) -> int:
+    return (count + 1) * 8 + INDEX_FOOTER_SIZE
+
+def unpack_index_footer(footer: bytes) -> int:
+    """
+    Returns the absolute offset of the segment index.
+    """
+    if len(footer) != INDEX_FOOTER_SIZE or footer[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+        raise ValueError("Missing or corrupt segment index footer.")
+    return unpack_uint64(footer[len(INDEX_MAGIC):])
+
+def unpack_segment_offsets(data: bytes):
+    return [unpack_uint64(data[i:i + 8]) for i in range(0, len(data), 8)]
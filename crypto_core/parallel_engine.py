@@ -0,0 +1,233 @@
+# Multi-core segment encryption / decryption engine (QCFILE v2)
+#
+# Segments of a v2 package are independent once the header is known, so
+# they can be sealed or opened on a worker pool. OpenSSL releases the GIL
+# during AES-GCM, so a thread pool scales across cores; a process pool is
+# available for builds where that is not the case. Output is always
+# written in segment order, so the bytes do not depend on worker count.
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from utils.constants import (
+    NONCE_PREFIX_SIZE,
+    DEFAULT_SEGMENT_SIZE,
+    FLAG_INDEXED,
+)
+from utils.io_utils import read_exact, ensure_file_exists
+from .aead import new_aead, select_aead
+from .file_packager import package_stream_header, unpack_stream_header, package_segment_index
+from .stream_cipher import (
+    segment_count,
+    segment_plain_size,
+    seal_record,
+    open_record,
+    read_record,
+    read_stream_header,
+    select_codec,
+    finish_segments,
+)
+
+
+# Worker side (module level so process pools can pickle the jobs)
+#
+# The cipher lives only as long as one stream's pool: thread jobs get
+# the stream's cipher as an argument, and process workers build their
+# own once in the pool initializer (ciphers do not pickle). Nothing keyed
+# by the secret key outlives the call.
+
+_worker_cipher = None
+
+def _init_worker(aead_id: int, key: bytes):
+    global _worker_cipher
+    _worker_cipher = new_aead(aead_id, key)
+
+def _worker_label() -> str:
+    return f"{os.getpid()}/{threading.current_thread().name}"
+
+def _seal_job(cipher, header, hdr, index, data, level):
+    t0 = time.perf_counter()
+    record = seal_record(cipher or _worker_cipher, header, hdr, index, data, level)
+    return record, _worker_label(), len(data), time.perf_counter() - t0
+
+def _open_job(cipher, header, hdr, index, sealed):
+    t0 = time.perf_counter()
+    plaintext = open_record(cipher or _worker_cipher, header, hdr, index, sealed)
+    return plaintext, _worker_label(), len(plaintext), time.perf_counter() - t0
+
+
+class ParallelSegmentEngine:
+    """
+    Encrypts / decrypts v2 packages with a pool of workers.
+
+    workers      -> pool size (default: os.cpu_count())
+    executor     -> "thread" or "process"
+    segment_size -> plaintext bytes per segment (encryption only)
+    max_inflight -> segments queued at once; bounds memory to roughly
+                    max_inflight * segment_size (default: 2 * workers)
+    compression  -> "none", "auto", "zlib" or "lzma" (encryption only);
+                    segments are compressed on the workers too
+    aead         -> AEAD name or "auto" (encryption only; see aead.py)
+    """
+
+    def __init__(self, workers: int = None, executor: str = "thread",
+                 segment_size: int = DEFAULT_SEGMENT_SIZE, max_inflight: int = None,
+                 compression: str = "none", level: int = None, aead: str = "aes-gcm"):
+        if executor not in ("thread", "process"):
+            raise ValueError("executor must be 'thread' or 'process'.")
+
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.segment_size = segment_size
+        self.max_inflight = max_inflight or 2 * self.workers
+        self.compression = compression
+        self.level = level
+        self.aead = aead
+
+    def _make_pool(self, aead_id: int, key: bytes):
+        """
+        Returns (pool, cipher). Process workers build their own cipher, so
+        cipher is None for them; thread jobs share the one returned here.
+        """
+        if self.executor == "process":
+            return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                       initargs=(aead_id, key)), None
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="qc-seg"), new_aead(aead_id, key)
+
+    def _run_ordered(self, jobs, fn, dst, aead_id: int, key: bytes, on_output=None):
+        """
+        Submits the (args) tuples jobs(cipher) yields, keeping at most
+        max_inflight outstanding, and writes results to dst in submission
+        order. Returns the stats dictionary.
+        """
+        per_worker = {}
+        total_bytes = 0
+        t0 = time.perf_counter()
+
+        def drain_one(pending):
+            nonlocal total_bytes
+            out, label, nbytes, elapsed = pending.popleft().result()
+            dst.write(out)
+            if on_output:
+                on_output(out)
+            total_bytes += nbytes
+
+            w = per_worker.setdefault(label, {"segments": 0, "bytes": 0, "busy_s": 0.0})
+            w["segments"] += 1
+            w["bytes"] += nbytes
+            w["busy_s"] += elapsed
+
+        pool, cipher = self._make_pool(aead_id, key)
+        with pool:
+            pending = deque()
+            for args in jobs(cipher):
+                pending.append(pool.submit(fn, *args))
+                if len(pending) >= self.max_inflight:
+                    drain_one(pending)
+            while pending:
+                drain_one(pending)
+
+        wall = time.perf_counter() - t0
+
+        for w in per_worker.values():
+            w["throughput_MBps"] = (w["bytes"] / w["busy_s"] / (1024 * 1024)) if w["busy_s"] else 0.0
+
+        return {
+            "workers": self.workers,
+            "executor": self.executor,
+            "bytes": total_bytes,
+            "wall_time_s": wall,
+            "throughput_MBps": (total_bytes / wall / (1024 * 1024)) if wall else 0.0,
+            "per_worker": per_worker,
+        }
+
+    # Encryption
+
+    def encrypt_stream(self, key: bytes, src, dst, file_size: int, nonce_prefix: bytes = None) -> dict:
+        if len(key) < 32:
+            raise ValueError("Hybrid key must be at least 32 bytes for a 256-bit AEAD.")
+
+        key = bytes(key[:32])
+        aead_id = select_aead(self.aead)
+        if nonce_prefix is None:
+            nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+
+        codec = select_codec(src, file_size, self.compression)
+        header = package_stream_header(nonce_prefix, self.segment_size, file_size, FLAG_INDEXED, codec, aead_id)
+        hdr = unpack_stream_header(header)
+        dst.write(header)
+
+        count = segment_count(file_size, self.segment_size)
+        offsets = [len(header)]
+
+        def jobs(cipher):
+            for index in range(count):
+                want = segment_plain_size(hdr, index)
+                data = read_exact(src, want)
+                if len(data) != want:
+                    raise ValueError("Input ended before the declared file size.")
+                yield cipher, header, hdr, index, data, self.level
+
+        def record_offset(record):
+            offsets.append(offsets[-1] + len(record))
+
+        stats = self._run_ordered(jobs, _seal_job, dst, aead_id, key, record_offset)
+        index = package_segment_index(offsets)
+        dst.write(index)
+
+        stats["segments"] = count
+        stats["package_bytes"] = offsets[-1] + len(index)
+        return stats
+
+    def encrypt_file(self, key: bytes, input_path: str, output_path: str, nonce_prefix: bytes = None) -> dict:
+        ensure_file_exists(input_path)
+
+        folder = os.path.dirname(output_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        with open(input_path, "rb") as src, open(output_path, "wb") as dst:
+            file_size = os.fstat(src.fileno()).st_size
+            return self.encrypt_stream(key, src, dst, file_size, nonce_prefix)
+
+    # Decryption
+
+    def decrypt_stream(self, key: bytes, src, dst) -> dict:
+        key = bytes(key[:32])
+
+        header, hdr = read_stream_header(src)
+
+        count = segment_count(hdr.file_size, hdr.segment_size)
+        offsets = [len(header)]
+
+        def jobs(cipher):
+            for index in range(count):
+                sealed, consumed = read_record(src, hdr, index)
+                offsets.append(offsets[-1] + consumed)
+                yield cipher, header, hdr, index, sealed
+
+        stats = self._run_ordered(jobs, _open_job, dst, hdr.aead, key)
+        finish_segments(src, hdr.flags, offsets)
+
+        stats["segments"] = count
+        return stats
+
+    def decrypt_file(self, key: bytes, input_path: str, output_path: str) -> dict:
+        ensure_file_exists(input_path)
+
+        folder = os.path.dirname(output_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        try:
+            with open(input_path, "rb") as src, open(output_path, "wb") as dst:
+                return self.decrypt_stream(key, src, dst)
+        except Exception:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
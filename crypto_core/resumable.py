@@ -0,0 +1,293 @@
+# Resumable encryption / decryption jobs (QCFILE v2)
+#
+# Long jobs write to "<output>.part" and periodically record the last
+# completed segment in a sidecar checkpoint ("<output>.ckpt"). A restarted
+# job checks the tail of the partial output against the checkpoint,
+# truncates anything written after it and carries on from the next
+# segment; finished segments are neither re-read nor re-encrypted.
+#
+# Segments redone after a restart reuse the header's nonce prefix. That is
+# only safe because they are sealed over the same plaintext, so the
+# checkpoint is bound to the input's size and mtime and to the compression
+# level, and the job refuses to resume if any of them has changed.
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import hmac
+
+from utils.constants import (
+    NONCE_PREFIX_SIZE,
+    DEFAULT_SEGMENT_SIZE,
+    FLAG_INDEXED,
+    STREAM_VERSION,
+    STREAM_HEADER_SIZE,
+    CHECKPOINT_SUFFIX,
+    CHECKPOINT_INTERVAL,
+)
+from utils.hashing import hmac_sha3_256
+from utils.io_utils import read_exact, ensure_file_exists
+from .file_packager import package_stream_header, unpack_stream_header, package_segment_index, get_package_version
+from .stream_cipher import (
+    segment_count,
+    segment_plain_size,
+    seal_record,
+    open_record,
+    read_record,
+    read_stream_header,
+    select_codec,
+    finish_segments,
+)
+from .aead import new_aead, select_aead
+
+
+# Checkpoint file
+
+def checkpoint_path(output_path: str) -> str:
+    return output_path + CHECKPOINT_SUFFIX
+
+def _source_fingerprint(path: str) -> dict:
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def _key_check(key: bytes, header: bytes) -> str:
+    # Lets a resume with the wrong key fail before anything is written
+    return hmac_sha3_256(key[:32], b"checkpoint" + header).hex()
+
+def _tail_mac(key: bytes, tail: bytes) -> str:
+    return hmac_sha3_256(key[:32], b"checkpoint-tail" + tail).hex()
+
+def save_checkpoint(path: str, state: dict):
+    """
+    Atomically replaces the checkpoint file.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path: str, job: str, key: bytes, source: str, level: int = None):
+    """
+    Returns the checkpoint state for this job, or None when there is none.
+    Raises ValueError if it belongs to another job, key or input, or if a
+    level is given that differs from the one the checkpoint was written with.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r") as f:
+        state = json.load(f)
+
+    if state.get("job") != job:
+        raise ValueError(f"Checkpoint {path} belongs to a {state.get('job')} job.")
+    if state["source"] != _source_fingerprint(source):
+        raise ValueError(f"Input changed since checkpoint {path} was written; delete it to start over.")
+    if not hmac.compare_digest(state["key_check"], _key_check(key, bytes.fromhex(state["header"]))):
+        raise ValueError("Checkpoint was written with a different key.")
+    if level is not None and state.get("level") != level:
+        raise ValueError(f"Checkpoint {path} was written with compression level {state.get('level')}, "
+                         f"not {level}; resume without a level or delete it to start over.")
+
+    return state
+
+def _checkpoint_state(job, key, source, header, offsets, segments_done, output_length, tail, level=None):
+    return {
+        "job": job,
+        "level": level,
+        "source": _source_fingerprint(source),
+        "header": header.hex(),
+        "key_check": _key_check(key, header),
+        "segments_done": segments_done,
+        "offsets": offsets,
+        "output_length": output_length,
+        "tail_length": len(tail),
+        "tail_mac": _tail_mac(key, tail),
+    }
+
+def _reopen_partial(tmp_path: str, key: bytes, state: dict):
+    """
+    Opens the partial output, checks the last block recorded in the
+    checkpoint and drops anything written after it.
+    """
+    if not os.path.exists(tmp_path):
+        raise ValueError(f"Partial output {tmp_path} is missing; delete the checkpoint to start over.")
+
+    length = state["output_length"]
+    dst = open(tmp_path, "r+b")
+    try:
+        dst.seek(0, os.SEEK_END)
+        if dst.tell() < length:
+            raise ValueError("Partial output is shorter than its checkpoint.")
+
+        dst.seek(length - state["tail_length"])
+        tail = read_exact(dst, state["tail_length"])
+        if not hmac.compare_digest(_tail_mac(key, tail), state["tail_mac"]):
+            raise ValueError("Partial output does not match its checkpoint.")
+
+        dst.truncate(length)
+        dst.seek(length)
+    except Exception:
+        dst.close()
+        raise
+
+    return dst
+
+def _commit(dst, ckpt_path: str, state: dict):
+    # Data must be on disk before the checkpoint that points past it
+    dst.flush()
+    os.fsync(dst.fileno())
+    save_checkpoint(ckpt_path, state)
+
+def _finish(tmp_path: str, output_path: str, ckpt_path: str):
+    os.replace(tmp_path, output_path)
+    if os.path.exists(ckpt_path):
+        os.remove(ckpt_path)
+
+
+# Encryption
+
+def encrypt_file_resumable(key: bytes, input_path: str, output_path: str,
+                           segment_size: int = DEFAULT_SEGMENT_SIZE, compression: str = "none",
+                           level: int = None, aead: str = "aes-gcm",
+                           checkpoint_interval: int = CHECKPOINT_INTERVAL, resume: bool = True) -> dict:
+    """
+    Encrypts input_path into an indexed v2 package at output_path,
+    checkpointing every checkpoint_interval plaintext bytes. With resume,
+    an existing checkpoint is continued (same key required, and the level
+    it was started with unless level is None); otherwise the job starts
+    from scratch. Returns a stats dictionary.
+    """
+    if len(key) < 32:
+        raise ValueError("Hybrid key must be at least 32 bytes for a 256-bit AEAD.")
+
+    ensure_file_exists(input_path)
+
+    folder = os.path.dirname(output_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    tmp_path = output_path + ".part"
+    ckpt_path = checkpoint_path(output_path)
+    state = load_checkpoint(ckpt_path, "encrypt", key, input_path, level) if resume else None
+
+    with open(input_path, "rb") as src:
+        if state:
+            level = state.get("level")
+            header = bytes.fromhex(state["header"])
+            hdr = unpack_stream_header(header)
+            offsets = state["offsets"]
+            done = state["segments_done"]
+            dst = _reopen_partial(tmp_path, key, state)
+            src.seek(done * hdr.segment_size)
+        else:
+            file_size = os.fstat(src.fileno()).st_size
+            codec = select_codec(src, file_size, compression)
+            header = package_stream_header(os.urandom(NONCE_PREFIX_SIZE), segment_size, file_size,
+                                           FLAG_INDEXED, codec, select_aead(aead))
+            hdr = unpack_stream_header(header)
+            offsets = [len(header)]
+            done = 0
+            dst = open(tmp_path, "wb")
+            dst.write(header)
+            _commit(dst, ckpt_path, _checkpoint_state("encrypt", key, input_path, header,
+                                                      offsets, 0, len(header), header, level))
+
+        with dst:
+            cipher = new_aead(hdr.aead, key)
+            count = segment_count(hdr.file_size, hdr.segment_size)
+            pending = 0
+
+            for index in range(done, count):
+                want = segment_plain_size(hdr, index)
+                data = read_exact(src, want)
+                if len(data) != want:
+                    raise ValueError("Input ended before the declared file size.")
+
+                record = seal_record(cipher, header, hdr, index, data, level)
+                dst.write(record)
+                offsets.append(offsets[-1] + len(record))
+
+                pending += want
+                if pending >= checkpoint_interval and index < count - 1:
+                    _commit(dst, ckpt_path, _checkpoint_state("encrypt", key, input_path, header,
+                                                              offsets, index + 1, offsets[-1], record, level))
+                    pending = 0
+
+            dst.write(package_segment_index(offsets))
+
+    _finish(tmp_path, output_path, ckpt_path)
+
+    return {
+        "segments": count,
+        "resumed_from_segment": done,
+        "bytes": hdr.file_size,
+        "package_bytes": os.path.getsize(output_path),
+    }
+
+
+# Decryption
+
+def decrypt_file_resumable(key: bytes, package_path: str, output_path: str,
+                           checkpoint_interval: int = CHECKPOINT_INTERVAL, resume: bool = True) -> dict:
+    """
+    Decrypts a v2 package into output_path, checkpointing every
+    checkpoint_interval plaintext bytes. The output only appears once every
+    segment (and the index) has been authenticated. Returns a stats dictionary.
+    """
+    ensure_file_exists(package_path)
+
+    folder = os.path.dirname(output_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    tmp_path = output_path + ".part"
+    ckpt_path = checkpoint_path(output_path)
+    state = load_checkpoint(ckpt_path, "decrypt", key, package_path) if resume else None
+
+    with open(package_path, "rb") as src:
+        if get_package_version(read_exact(src, STREAM_HEADER_SIZE)) != STREAM_VERSION:
+            raise ValueError("Resumable decryption requires a segmented (v2) package.")
+        src.seek(0)
+        header, hdr = read_stream_header(src)
+
+        if state:
+            if bytes.fromhex(state["header"]) != header:
+                raise ValueError("Checkpoint does not match the package header.")
+            offsets = state["offsets"]
+            done = state["segments_done"]
+            dst = _reopen_partial(tmp_path, key, state)
+            src.seek(offsets[-1])
+        else:
+            offsets = [len(header)]
+            done = 0
+            dst = open(tmp_path, "wb")
+
+        with dst:
+            cipher = new_aead(hdr.aead, key)
+            count = segment_count(hdr.file_size, hdr.segment_size)
+            pending = 0
+
+            for index in range(done, count):
+                sealed, consumed = read_record(src, hdr, index)
+                plaintext = open_record(cipher, header, hdr, index, sealed)
+                dst.write(plaintext)
+                offsets.append(offsets[-1] + consumed)
+
+                pending += len(plaintext)
+                if pending >= checkpoint_interval and index < count - 1:
+                    _commit(dst, ckpt_path, _checkpoint_state("decrypt", key, package_path, header, offsets,
+                                                              index + 1, (index + 1) * hdr.segment_size, plaintext))
+                    pending = 0
+
+            finish_segments(src, hdr.flags, offsets)
+
+    _finish(tmp_path, output_path, ckpt_path)
+
+    return {
+        "segments": count,
+        "resumed_from_segment": done,
+        "bytes": hdr.file_size,
+    }
@@ -0,0 +1,351 @@
+# Segmented AES-256-GCM streaming module (QCFILE v2)
+#
+# The file is split into fixed-size segments, each sealed with its own
+# nonce and tag. The nonce carries the segment index and a last-segment
+# flag, and the header is bound as associated data, so segments cannot be
+# reordered, dropped, truncated or moved between packages.
+#
+# Indexed packages end with the absolute offset of every segment, which
+# lets decrypt_range() seek straight to the segments covering a range.
+#
+# With a compression codec in the header, each segment is compressed on
+# its own before sealing and the record is prefixed by its length.
+#
+# The AEAD (AES-GCM, ChaCha20-Poly1305, AES-GCM-SIV) is named in the
+# header; decryption always follows the header.
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+
+from utils.constants import (
+    TAG_SIZE,
+    STREAM_VERSION,
+    NONCE_PREFIX_SIZE,
+    STREAM_HEADER_SIZE,
+    DEFAULT_SEGMENT_SIZE,
+    FLAG_INDEXED,
+    INDEX_FOOTER_SIZE,
+    CODEC_NONE,
+)
+from utils.io_utils import read_exact, ensure_file_exists, pack_uint32, unpack_uint32
+from .file_packager import (
+    package_stream_header,
+    unpack_stream_header,
+    package_segment_index,
+    segment_index_size,
+    unpack_index_footer,
+    unpack_segment_offsets,
+    get_package_version,
+)
+from .compression import choose_codec, read_sample, encode_segment, decode_segment
+from .aead import new_aead, select_aead
+
+
+# Segment helpers
+
+def segment_count(file_size: int, segment_size: int) -> int:
+    # An empty file still produces one (empty) authenticated segment
+    return max(1, -(-file_size // segment_size))
+
+def segment_plain_size(hdr, index: int) -> int:
+    return min(hdr.segment_size, hdr.file_size - index * hdr.segment_size)
+
+def segment_nonce(nonce_prefix: bytes, index: int, last: bool) -> bytes:
+    return nonce_prefix + index.to_bytes(4, "big") + (b"\x01" if last else b"\x00")
+
+def seal_segment(cipher, nonce_prefix: bytes, index: int, last: bool, header: bytes, data: bytes) -> bytes:
+    """
+    Returns ciphertext || tag for one segment.
+    """
+    return cipher.encrypt(segment_nonce(nonce_prefix, index, last), data, header)
+
+def open_segment(cipher, nonce_prefix: bytes, index: int, last: bool, header: bytes, record: bytes) -> bytes:
+    """
+    Authenticates and decrypts one ciphertext || tag record.
+    Raises cryptography.exceptions.InvalidTag on tampering.
+    """
+    return cipher.decrypt(segment_nonce(nonce_prefix, index, last), record, header)
+
+def seal_record(cipher, header: bytes, hdr, index: int, data: bytes, level: int = None) -> bytes:
+    """
+    Compresses (per the header codec), seals and frames one segment.
+    Returns the bytes written to the package for it.
+    """
+    last = index == segment_count(hdr.file_size, hdr.segment_size) - 1
+    sealed = seal_segment(cipher, hdr.nonce_prefix, index, last, header,
+                          encode_segment(hdr.codec, data, level))
+    if hdr.codec == CODEC_NONE:
+        return sealed
+    return pack_uint32(len(sealed)) + sealed
+
+def open_record(cipher, header: bytes, hdr, index: int, sealed: bytes) -> bytes:
+    """
+    Inverse of seal_record for an unframed ciphertext || tag record.
+    """
+    last = index == segment_count(hdr.file_size, hdr.segment_size) - 1
+    payload = open_segment(cipher, hdr.nonce_prefix, index, last, header, sealed)
+    return decode_segment(hdr.codec, payload, segment_plain_size(hdr, index))
+
+def max_sealed_size(hdr, index: int) -> int:
+    # Compressed payloads never exceed the raw size + the marker byte
+    extra = 0 if hdr.codec == CODEC_NONE else 1
+    return segment_plain_size(hdr, index) + extra + TAG_SIZE
+
+def read_record(reader, hdr, index: int):
+    """
+    Reads the next record for segment index.
+    Returns (sealed, bytes_consumed).
+    """
+    if hdr.codec == CODEC_NONE:
+        want = segment_plain_size(hdr, index) + TAG_SIZE
+        framing = 0
+    else:
+        prefix = read_exact(reader, 4)
+        if len(prefix) != 4:
+            raise ValueError("Truncated package: segment data missing.")
+        want = unpack_uint32(prefix)
+        framing = 4
+        if not TAG_SIZE <= want <= max_sealed_size(hdr, index):
+            raise ValueError("Invalid segment record length.")
+
+    sealed = read_exact(reader, want)
+    if len(sealed) != want:
+        raise ValueError("Truncated package: segment data missing.")
+    return sealed, framing + want
+
+def unframe_record(hdr, record: bytes) -> bytes:
+    """
+    Strips the length prefix from a record read by offset (random access).
+    """
+    if hdr.codec == CODEC_NONE:
+        return record
+    if len(record) < 4 or unpack_uint32(record[:4]) != len(record) - 4:
+        raise ValueError("Invalid segment record length.")
+    return record[4:]
+
+def read_stream_header(reader):
+    """
+    Returns (raw header bytes, StreamHeader).
+    """
+    header = read_exact(reader, STREAM_HEADER_SIZE)
+    return header, unpack_stream_header(header)
+
+def select_codec(reader, file_size: int, compression: str) -> int:
+    if compression == "none":
+        return CODEC_NONE
+    if reader.seekable():
+        sample = read_sample(reader, file_size)
+    else:
+        sample = b""        # cannot look ahead: treat as incompressible
+    return choose_codec(compression, sample)
+
+def finish_segments(reader, flags: int, offsets):
+    """
+    Called once the last segment has been read: checks the segment index
+    (if any) against the offsets actually seen and rejects trailing data.
+    """
+    if flags & FLAG_INDEXED:
+        trailer = read_exact(reader, segment_index_size(len(offsets) - 1))
+        if trailer != package_segment_index(offsets):
+            raise ValueError("Segment index does not match the package layout.")
+
+    if reader.read(1):
+        raise ValueError("Unexpected trailing data after final segment.")
+
+
+# Encryption
+
+def iter_encrypt_segments(key: bytes, reader, file_size: int, segment_size: int = DEFAULT_SEGMENT_SIZE,
+                          nonce_prefix: bytes = None, indexed: bool = True,
+                          compression: str = "none", level: int = None, aead: str = "aes-gcm"):
+    """
+    Generator over the packaged output: yields the header first, then one
+    record per segment, then the segment index. Only one segment is held
+    in memory at a time.
+
+    compression -> "none", "auto", "zlib" or "lzma" (see compression.py);
+    incompressible input is detected from a sample and stored raw.
+    aead        -> "aes-gcm", "chacha20-poly1305", "aes-gcm-siv" or "auto"
+                   (fastest on this host, see aead.py)
+    """
+    if len(key) < 32:
+        raise ValueError("Hybrid key must be at least 32 bytes for a 256-bit AEAD.")
+
+    aead_id = select_aead(aead)
+    cipher = new_aead(aead_id, key)
+    if nonce_prefix is None:
+        nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+
+    codec = select_codec(reader, file_size, compression)
+    header = package_stream_header(nonce_prefix, segment_size, file_size,
+                                   FLAG_INDEXED if indexed else 0, codec, aead_id)
+    hdr = unpack_stream_header(header)
+    yield header
+
+    count = segment_count(file_size, segment_size)
+    offsets = [len(header)]
+
+    for index in range(count):
+        want = segment_plain_size(hdr, index)
+        data = read_exact(reader, want)
+        if len(data) != want:
+            raise ValueError("Input ended before the declared file size.")
+
+        record = seal_record(cipher, header, hdr, index, data, level)
+        offsets.append(offsets[-1] + len(record))
+        yield record
+
+    if indexed:
+        yield package_segment_index(offsets)
+
+def encrypt_stream_bytes(key: bytes, data: bytes, segment_size: int = DEFAULT_SEGMENT_SIZE,
+                         compression: str = "none", level: int = None, aead: str = "aes-gcm") -> bytes:
+    return b"".join(iter_encrypt_segments(key, io.BytesIO(data), len(data), segment_size,
+                                          compression=compression, level=level, aead=aead))
+
+def encrypt_file_stream(key: bytes, input_path: str, output_path: str,
+                        segment_size: int = DEFAULT_SEGMENT_SIZE, indexed: bool = True,
+                        compression: str = "none", level: int = None, aead: str = "aes-gcm") -> int:
+    """
+    Encrypts input_path into a segmented package at output_path.
+    Returns the number of bytes written.
+    """
+    ensure_file_exists(input_path)
+
+    folder = os.path.dirname(output_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    written = 0
+    with open(input_path, "rb") as src, open(output_path, "wb") as dst:
+        file_size = os.fstat(src.fileno()).st_size
+        for chunk in iter_encrypt_segments(key, src, file_size, segment_size, indexed=indexed,
+                                           compression=compression, level=level, aead=aead):
+            dst.write(chunk)
+            written += len(chunk)
+
+    return written
+
+
+# Decryption
+
+def iter_decrypt_segments(key: bytes, reader):
+    """
+    Generator over the plaintext of a segmented package read from reader.
+    Every segment is authenticated before it is yielded; truncation or
+    trailing data raises ValueError once the stream is exhausted.
+    """
+    header, hdr = read_stream_header(reader)
+    cipher = new_aead(hdr.aead, key)
+
+    count = segment_count(hdr.file_size, hdr.segment_size)
+    offsets = [len(header)]
+
+    for index in range(count):
+        sealed, consumed = read_record(reader, hdr, index)
+        offsets.append(offsets[-1] + consumed)
+
+        yield open_record(cipher, header, hdr, index, sealed)
+
+    finish_segments(reader, hdr.flags, offsets)
+
+def decrypt_stream_bytes(key: bytes, packed_bytes: bytes) -> bytes:
+    return b"".join(iter_decrypt_segments(key, io.BytesIO(packed_bytes)))
+
+def decrypt_file_stream(key: bytes, input_path: str, output_path: str) -> int:
+    """
+    Decrypts a segmented package from input_path into output_path.
+    The partial output is removed if any segment fails to authenticate.
+    Returns the number of plaintext bytes written.
+    """
+    ensure_file_exists(input_path)
+
+    folder = os.path.dirname(output_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    written = 0
+    try:
+        with open(input_path, "rb") as src, open(output_path, "wb") as dst:
+            for chunk in iter_decrypt_segments(key, src):
+                dst.write(chunk)
+                written += len(chunk)
+    except Exception:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+    return written
+
+
+# Random access
+
+def read_segment_offsets(f, hdr, first: int, last: int):
+    """
+    Returns the absolute offsets of segments first..last plus the end of
+    segment last, read from the index when the package has one.
+    """
+    if hdr.flags & FLAG_INDEXED:
+        f.seek(-INDEX_FOOTER_SIZE, os.SEEK_END)
+        index_offset = unpack_index_footer(read_exact(f, INDEX_FOOTER_SIZE))
+
+        f.seek(index_offset + first * 8)
+        entries = read_exact(f, (last - first + 2) * 8)
+        if len(entries) != (last - first + 2) * 8:
+            raise ValueError("Truncated segment index.")
+        offsets = unpack_segment_offsets(entries)
+
+        if any(b <= a for a, b in zip(offsets, offsets[1:])) or offsets[-1] > index_offset:
+            raise ValueError("Corrupt segment index.")
+        return offsets
+
+    if hdr.codec != CODEC_NONE:
+        raise ValueError("Range decryption of a compressed package requires a segment index.")
+
+    # Unindexed, uncompressed packages have a fixed layout
+    record = hdr.segment_size + TAG_SIZE
+    offsets = [STREAM_HEADER_SIZE + i * record for i in range(first, last + 1)]
+    offsets.append(offsets[-1] + segment_plain_size(hdr, last) + TAG_SIZE)
+    return offsets
+
+def decrypt_range(key: bytes, path: str, start: int, length: int) -> bytes:
+    """
+    Decrypts plaintext bytes [start, start + length) of a segmented
+    package, reading and authenticating only the segments that cover the
+    range. The range is clipped to the end of the file.
+    """
+    if start < 0 or length < 0:
+        raise ValueError("Range start and length must be non-negative.")
+
+    ensure_file_exists(path)
+
+    with open(path, "rb") as f:
+        header = read_exact(f, STREAM_HEADER_SIZE)
+        if get_package_version(header) != STREAM_VERSION:
+            raise ValueError("Range decryption requires a segmented (v2) package.")
+        hdr = unpack_stream_header(header)
+        cipher = new_aead(hdr.aead, key)
+
+        end = min(start + length, hdr.file_size)
+        if start >= end:
+            return b""
+
+        first = start // hdr.segment_size
+        last = (end - 1) // hdr.segment_size
+        offsets = read_segment_offsets(f, hdr, first, last)
+
+        parts = []
+        for index, (a, b) in zip(range(first, last + 1), zip(offsets, offsets[1:])):
+            f.seek(a)
+            record = read_exact(f, b - a)
+            if len(record) != b - a:
+                raise ValueError("Truncated package: segment data missing.")
+
+            plaintext = open_record(cipher, header, hdr, index, unframe_record(hdr, record))
+
+            seg_start = index * hdr.segment_size
+            parts.append(plaintext[max(start - seg_start, 0):end - seg_start])
+
+    return b"".join(parts)
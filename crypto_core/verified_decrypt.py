@@ -0,0 +1,140 @@
+# Single-pass verify + decrypt (receiver side)
+#
+# Every chunk of the package is fed to the signature hash and to the
+# decryptor as it is read, so the package is read once and never held
+# twice. Plaintext goes to "<output>.part" and is renamed into place only
+# after the signature and every AEAD tag have verified.
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from utils.constants import MAGIC_BYTES, STREAM_VERSION, HEADER_FIXED_SIZE
+from utils.io_utils import read_exact, ensure_file_exists
+from pqc_signature.dilithium_verify import Verifier
+from .file_packager import unpack_encrypted_file, get_package_version
+from .stream_cipher import iter_decrypt_segments
+from .file_encryptor import UPDATE_SLACK
+from .file_decryptor import DECRYPT_CHUNK_SIZE
+
+
+class HashingReader:
+    """
+    File-like wrapper that feeds every byte read through it into h
+    (anything with update(), e.g. a Verifier).
+    prefix holds bytes already read (and hashed) from f.
+    """
+
+    def __init__(self, f, h, prefix: bytes = b""):
+        self._f = f
+        self._h = h
+        self._prefix = prefix
+
+    def read(self, n: int = -1) -> bytes:
+        head = b""
+        if self._prefix:
+            if 0 <= n < len(self._prefix):
+                head, self._prefix = self._prefix[:n], self._prefix[n:]
+                return head
+            head, self._prefix = self._prefix, b""
+            if n >= 0:
+                n -= len(head)
+                if n == 0:
+                    return head
+
+        data = self._f.read(n)
+        self._h.update(data)
+        return head + data
+
+    def seekable(self) -> bool:
+        return False
+
+
+def _decrypt_v1(key: bytes, reader, dst, chunk_size: int) -> int:
+    header = read_exact(reader, HEADER_FIXED_SIZE)
+    if len(header) != HEADER_FIXED_SIZE:
+        raise ValueError("Truncated package header.")
+    _, nonce, tag, file_size, _ = unpack_encrypted_file(header)
+
+    decryptor = Cipher(algorithms.AES(key[:32]), modes.GCM(nonce, tag)).decryptor()
+    scratch = memoryview(bytearray(chunk_size + UPDATE_SLACK))
+    written = 0
+
+    while chunk := reader.read(chunk_size):
+        n = decryptor.update_into(chunk, scratch)
+        dst.write(scratch[:n])
+        written += n
+    decryptor.finalize()
+
+    if written != file_size:
+        raise ValueError("Ciphertext length does not match its header.")
+    return written
+
+def _decrypt_v2(key: bytes, reader, dst) -> int:
+    written = 0
+    for plaintext in iter_decrypt_segments(key, reader):
+        dst.write(plaintext)
+        written += len(plaintext)
+    return written
+
+def verify_and_decrypt_stream(key: bytes, reader, signature: bytes, pk: bytes,
+                              output_path: str, chunk_size: int = DECRYPT_CHUNK_SIZE):
+    """
+    Verifies the signature over the package read from reader and decrypts
+    it to output_path in the same pass.
+
+    Returns (signature_valid, plaintext bytes written). With an invalid
+    signature nothing is written and (False, 0) is returned; a valid
+    signature over a package that fails to decrypt raises
+    (cryptography.exceptions.InvalidTag / ValueError).
+    """
+    h = Verifier(pk)
+
+    head = read_exact(reader, len(MAGIC_BYTES) + 1)
+    h.update(head)
+    tap = HashingReader(reader, h, head)
+
+    folder = os.path.dirname(output_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    tmp_path = output_path + ".part"
+    error = None
+    written = 0
+
+    try:
+        with open(tmp_path, "wb") as dst:
+            if get_package_version(head) == STREAM_VERSION:
+                written = _decrypt_v2(key, tap, dst)
+            else:
+                written = _decrypt_v1(key, tap, dst, chunk_size)
+    except (InvalidTag, ValueError) as e:
+        error = e
+
+    # The signature covers the whole package, including anything the
+    # decryptor did not get to
+    while tap.read(chunk_size):
+        pass
+    valid = h.finalize(signature)
+
+    if not valid or error is not None:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if not valid:
+            return False, 0
+        raise error
+
+    os.replace(tmp_path, output_path)
+    return True, written
+
+def verify_and_decrypt_bytes(key: bytes, packed, signature: bytes, pk: bytes, output_path: str):
+    return verify_and_decrypt_stream(key, io.BytesIO(packed), signature, pk, output_path)
+
+def verify_and_decrypt_file(key: bytes, package_path: str, signature: bytes, pk: bytes, output_path: str):
+    ensure_file_exists(package_path)
+    with open(package_path, "rb") as f:
+        return verify_and_decrypt_stream(key, f, signature, pk, output_path)
@@ -2,15 +2,29 @@ import os
 import time
 import json
 import statistics
+import tracemalloc
 import matplotlib.pyplot as plt
 
 from pqc_signature.dilithium_sign import (
     generate_sig_keypair,
     sign_message,
+    Signer,
+    sign_file_path,
 )
 from pqc_signature.dilithium_verify import (
     verify_signature,
+    verify_file_signature,
+    Verifier,
+    verify_file_path,
 )
+from pqc_signature.merkle import (
+    merkle_sign_file,
+    merkle_verify_file,
+    merkle_verify_chunk,
+)
+from pqc_signature.batch_verify import BatchVerifier
+from utils.constants import MERKLE_CHUNK_SIZE
+from utils.experiment import run_experiment
 
 BASE_DIR = "dilithium_results"
 PLOT_DIR = os.path.join(BASE_DIR, "plots")
@@ -21,65 +35,334 @@ os.makedirs(PLOT_DIR, exist_ok=True)
 def generate_message(size):
     return os.urandom(size)
 
-def run_dilithium_metrics(sizes=[1024, 10_000, 100_000, 1_000_000], runs=20):
+def _dilithium_case(params, rng):
+    # One keypair / sign / verify / tampered-verify run on a message
+    # drawn from the case's own RNG stream
+    size = params["size"]
+
+    t1 = time.time()
+    pk, sk = generate_sig_keypair()
+    t2 = time.time()
+    keypair_ms = (t2 - t1) * 1000
+
+    message = rng.bytes(size)
+
+    t3 = time.time()
+    sig = sign_message(message, sk)
+    t4 = time.time()
+    sign_ms = (t4 - t3) * 1000
+
+    t5 = time.time()
+    ok = verify_signature(message, sig, pk)
+    t6 = time.time()
+    verify_ms = (t6 - t5) * 1000
+
+    tampered_msg = message + b"x"
+    wrong = verify_signature(tampered_msg, sig, pk)
+
+    return {
+        "keypair_time_ms": keypair_ms,
+        "sign_time_ms": sign_ms,
+        "verify_time_ms": verify_ms,
+        "pk_size": len(pk),
+        "sk_size": len(sk),
+        "sig_size": len(sig),
+        "verify_success": ok,
+        "verify_failure": wrong
+    }
 
+def run_dilithium_metrics(sizes=[1024, 10_000, 100_000, 1_000_000], runs=20,
+                          workers=1, seed=0):
+    """
+    (size, run) cases go through the experiment driver uncached (they are
+    wall-clock timings) and, by default, one at a time so they do not
+    compete for the CPU. seed fixes the messages.
+    """
     results = {
         "message_sizes": sizes,
         "runs_per_case": runs,
         "metrics": {}
     }
 
+    cases = [{"size": size, "run": i} for size in sizes for i in range(runs)]
+    outcomes = run_experiment("dilithium", _dilithium_case, cases, seed=seed, workers=workers, cache=False)
+
     for size in sizes:
-        print(f"\n=== Running signature metrics for message size {size} bytes ===")
-
-        results["metrics"][size] = {
-            "keypair_time_ms": [],
-            "sign_time_ms": [],
-            "verify_time_ms": [],
-            "pk_size": [],
-            "sk_size": [],
-            "sig_size": [],
-            "verify_success": [],
-            "verify_failure": []
+        results["metrics"][size] = {key: [] for key in outcomes[0]}
+    for case, outcome in zip(cases, outcomes):
+        for key, value in outcome.items():
+            results["metrics"][case["size"]][key].append(value)
+
+    return results
+
+def run_streaming_metrics(file_sizes=[10_000_000, 100_000_000, 1_000_000_000],
+                          small_messages=10_000, small_size=256):
+    """
+    Streaming sign/verify of files (reusable buffer) against loading the
+    file and signing it in one shot, plus many small messages signed with
+    one Signer (precomputed key prefix) against sign_message.
+    """
+    results = {
+        "file_sizes": file_sizes,
+        "files": {},
+        "small_messages": {}
+    }
+
+    pk, sk = generate_sig_keypair()
+    path = os.path.join(BASE_DIR, "stream_message.bin")
+
+    for size in file_sizes:
+        print(f"\n=== Streaming signature metrics for {size} bytes ===")
+        with open(path, "wb") as f:
+            for _ in range(0, size, 16 * 1024 * 1024):
+                f.write(os.urandom(min(16 * 1024 * 1024, size - f.tell())))
+
+        def one_shot():
+            with open(path, "rb") as f:
+                return sign_message(f.read(), sk)
+
+        tracemalloc.start()
+        t1 = time.time()
+        sig_a = one_shot()
+        one_shot_ms = (time.time() - t1) * 1000
+        _, one_shot_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        t2 = time.time()
+        sig_b = sign_file_path(path, sk)
+        stream_ms = (time.time() - t2) * 1000
+        _, stream_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        t3 = time.time()
+        ok = verify_file_path(path, sig_b, pk)
+        verify_ms = (time.time() - t3) * 1000
+
+        results["files"][size] = {
+            "one_shot_sign_ms": one_shot_ms,
+            "one_shot_peak_bytes": one_shot_peak,
+            "stream_sign_ms": stream_ms,
+            "stream_peak_bytes": stream_peak,
+            "stream_verify_ms": verify_ms,
+            "identical": sig_a == sig_b,
+            "verify_success": ok
         }
+        print(f"    one-shot {one_shot_ms:9.1f} ms, peak {one_shot_peak / 1e6:8.1f} MB")
+        print(f"    stream   {stream_ms:9.1f} ms, peak {stream_peak / 1e6:8.1f} MB (identical: {sig_a == sig_b})")
+
+    os.remove(path)
+
+    print(f"\n=== {small_messages} small messages ({small_size} bytes) ===")
+    messages = [generate_message(small_size) for _ in range(small_messages)]
+
+    t1 = time.time()
+    sigs_a = [sign_message(m, sk) for m in messages]
+    sign_message_ms = (time.time() - t1) * 1000
+
+    signer = Signer(sk)
+    t2 = time.time()
+    sigs_b = [signer.sign(m) for m in messages]
+    signer_ms = (time.time() - t2) * 1000
+
+    verifier = Verifier(pk)
+    t3 = time.time()
+    all_ok = all(verifier.verify(m, s) for m, s in zip(messages, sigs_b))
+    verifier_ms = (time.time() - t3) * 1000
+
+    results["small_messages"] = {
+        "count": small_messages,
+        "size": small_size,
+        "sign_message_ms": sign_message_ms,
+        "signer_ms": signer_ms,
+        "verifier_ms": verifier_ms,
+        "identical": sigs_a == sigs_b,
+        "verify_success": all_ok
+    }
+    print(f"    sign_message {sign_message_ms:8.1f} ms | Signer.sign {signer_ms:8.1f} ms")
 
-        for _ in range(runs):
+    return results
 
+def run_merkle_metrics(file_size=256_000_000, worker_counts=[1, 2, 4, 8, 16],
+                       chunk_size=MERKLE_CHUNK_SIZE, runs=3):
+    """
+    Merkle-mode sign/verify time against the number of hashing threads,
+    with streaming sign_file_path as the single-threaded baseline, and the
+    cost of checking one chunk on its own.
+    """
+    results = {
+        "file_size": file_size,
+        "chunk_size": chunk_size,
+        "worker_counts": worker_counts,
+        "runs_per_case": runs,
+        "metrics": {}
+    }
+
+    pk, sk = generate_sig_keypair()
+    path = os.path.join(BASE_DIR, "merkle_message.bin")
+    with open(path, "wb") as f:
+        for _ in range(0, file_size, 16 * 1024 * 1024):
+            f.write(os.urandom(min(16 * 1024 * 1024, file_size - f.tell())))
+
+    print(f"\n=== Merkle signature metrics ({file_size} bytes, {chunk_size} byte chunks) ===")
+
+    baseline = []
+    for _ in range(runs):
+        t1 = time.time()
+        sign_file_path(path, sk)
+        baseline.append((time.time() - t1) * 1000)
+    results["baseline_sign_ms"] = baseline
+    print(f"    sign_file_path       {statistics.mean(baseline):9.1f} ms")
+
+    tree = sig = None
+    for workers in worker_counts:
+        sign_ms, verify_ms = [], []
+        for _ in range(runs):
             t1 = time.time()
-            pk, sk = generate_sig_keypair()
+            sig, tree = merkle_sign_file(path, sk, chunk_size, workers)
+            sign_ms.append((time.time() - t1) * 1000)
+
             t2 = time.time()
-            keypair_ms = (t2 - t1) * 1000
+            ok = merkle_verify_file(path, sig, pk, chunk_size, workers)
+            verify_ms.append((time.time() - t2) * 1000)
+
+        results["metrics"][workers] = {
+            "sign_time_ms": sign_ms,
+            "verify_time_ms": verify_ms,
+            "verify_success": ok
+        }
+        print(f"    merkle, {workers:2d} workers  {statistics.mean(sign_ms):9.1f} ms "
+              f"(verify {statistics.mean(verify_ms):9.1f} ms)")
+
+    # One chunk from the middle of the file, checked against the signed root
+    index = len(tree.levels[0]) // 2
+    with open(path, "rb") as f:
+        f.seek(index * chunk_size)
+        chunk = f.read(chunk_size)
+    proof = tree.proof(index)
+
+    t1 = time.time()
+    ok = merkle_verify_chunk(chunk, index, proof, tree.root, file_size, sig, pk, chunk_size)
+    chunk_ms = (time.time() - t1) * 1000
+
+    results["single_chunk"] = {
+        "index": index,
+        "proof_hashes": len(proof),
+        "proof_bytes": sum(len(p) for p in proof),
+        "verify_time_ms": chunk_ms,
+        "verify_success": ok
+    }
+    print(f"    one chunk: {len(proof)} proof hashes, {chunk_ms:.2f} ms (valid: {ok})")
+
+    os.remove(path)
+    return results
+
+def plot_merkle(results, filename="merkle_sign_time.png"):
 
-            results["metrics"][size]["keypair_time_ms"].append(keypair_ms)
-            results["metrics"][size]["pk_size"].append(len(pk))
-            results["metrics"][size]["sk_size"].append(len(sk))
+    workers = results["worker_counts"]
+    averages = [statistics.mean(results["metrics"][w]["sign_time_ms"]) for w in workers]
 
-            message = generate_message(size)
+    plt.figure(figsize=(8,5))
+    plt.plot(workers, averages, marker='o', label="Merkle sign")
+    plt.axhline(statistics.mean(results["baseline_sign_ms"]), linestyle='--', color='gray',
+                label="sign_file_path (single hash)")
+    plt.grid(True)
+    plt.xlabel("Worker Threads")
+    plt.ylabel("ms")
+    plt.title("Merkle Signature Time vs Worker Threads")
+    plt.legend()
 
-            t3 = time.time()
-            sig = sign_message(message, sk)
-            t4 = time.time()
-            sign_ms = (t4 - t3) * 1000
+    save_path = os.path.join(PLOT_DIR, filename)
+    plt.savefig(save_path, dpi=200)
+    plt.close()
 
-            results["metrics"][size]["sign_time_ms"].append(sign_ms)
-            results["metrics"][size]["sig_size"].append(len(sig))
+    print(f"[+] Plot saved → {save_path}")
 
-            t5 = time.time()
-            ok = verify_signature(message, sig, pk)
-            t6 = time.time()
-            verify_ms = (t6 - t5) * 1000
+def run_batch_verify_metrics(count=2000, size=256_000, worker_counts=[1, 2, 4, 8],
+                             executor=None, in_memory=False):
+    """
+    Verifications/sec of BatchVerifier (package files on disk, or package
+    bytes with in_memory=True) against the number of workers, then the
+    same batch again to show cache hits.
+    """
+    results = {
+        "count": count,
+        "package_size": size,
+        "executor": executor,
+        "in_memory": in_memory,
+        "worker_counts": worker_counts,
+        "metrics": {}
+    }
 
-            results["metrics"][size]["verify_time_ms"].append(verify_ms)
-            results["metrics"][size]["verify_success"].append(ok)
+    pk, sk = generate_sig_keypair()
+    folder = os.path.join(BASE_DIR, "batch_packages")
+    os.makedirs(folder, exist_ok=True)
+
+    items = []
+    for i in range(count):
+        path = os.path.join(folder, f"package_{i}.bin")
+        message = generate_message(size)
+        with open(path, "wb") as f:
+            f.write(message)
+        items.append((message if in_memory else path, sign_message(message, sk), pk))
+
+    print(f"\n=== Batch verification ({count} {'in-memory' if in_memory else 'on-disk'} packages "
+          f"of {size} bytes, {executor or 'default'} pool) ===")
+
+    t1 = time.time()
+    for package, sig, key in items:
+        if not in_memory:
+            with open(package, "rb") as f:
+                package = f.read()
+        verify_file_signature(package, sig, key)
+    sequential_s = time.time() - t1
+    results["sequential_per_s"] = count / sequential_s
+    print(f"    verify_file_signature loop  {count / sequential_s:10.1f} verifications/s")
+
+    for workers in worker_counts:
+        verifier = BatchVerifier(workers, executor)
+        ok = all(verifier.verify_all(items))
+        cold = verifier.stats
+
+        verifier.verify_all(items)
+        warm = verifier.stats
+
+        results["metrics"][workers] = {
+            "cold_per_s": cold["verifications_per_s"],
+            "warm_per_s": warm["verifications_per_s"],
+            "warm_cache_hits": warm["cache_hits"],
+            "verify_success": ok
+        }
+        print(f"    {workers:2d} workers  cold {cold['verifications_per_s']:10.1f} /s | "
+              f"cached {warm['verifications_per_s']:10.1f} /s ({warm['cache_hits']} hits)")
 
-            tampered_msg = message + b"x"
-            wrong = verify_signature(tampered_msg, sig, pk)
-            results["metrics"][size]["verify_failure"].append(wrong)
+    for i in range(count):
+        os.remove(os.path.join(folder, f"package_{i}.bin"))
+    os.rmdir(folder)
 
     return results
 
-def save_json(results):
-    fname = os.path.join(BASE_DIR, "results.json")
+def plot_batch_verify(results, filename="batch_verify_rate.png"):
+
+    workers = results["worker_counts"]
+
+    plt.figure(figsize=(8,5))
+    plt.plot(workers, [results["metrics"][w]["cold_per_s"] for w in workers], marker='o', label="Batch (cold)")
+    plt.axhline(results["sequential_per_s"], linestyle='--', color='gray', label="Sequential loop")
+    plt.grid(True)
+    plt.xlabel("Workers")
+    plt.ylabel("Verifications / s")
+    plt.title("Batch Signature Verification Rate vs Workers")
+    plt.legend()
+
+    save_path = os.path.join(PLOT_DIR, filename)
+    plt.savefig(save_path, dpi=200)
+    plt.close()
+
+    print(f"[+] Plot saved → {save_path}")
+
+def save_json(results, filename="results.json"):
+    fname = os.path.join(BASE_DIR, filename)
     with open(fname, "w") as f:
         json.dump(results, f, indent=4)
     print(f"[✓] Saved results → {fname}")
@@ -122,4 +405,19 @@ if __name__ == "__main__":
     plot_metric(results, "sig_size", "bytes",
                 "Signature Size", "sig_size.png")
 
+    streaming = run_streaming_metrics()
+    save_json(streaming, "streaming_results.json")
+
+    merkle = run_merkle_metrics()
+    save_json(merkle, "merkle_results.json")
+    plot_merkle(merkle)
+
+    batch = run_batch_verify_metrics()
+    save_json(batch, "batch_verify_results.json")
+    plot_batch_verify(batch)
+
+    batch_mem = run_batch_verify_metrics(count=60, size=4 * 1024 * 1024, in_memory=True)
+    save_json(batch_mem, "batch_verify_memory_results.json")
+    plot_batch_verify(batch_mem, "batch_verify_memory_rate.png")
+
     print("\n[✓] All Dilithium-inspired signature metrics generated!")
@@ -0,0 +1,117 @@
+# Vectorized QBER sweep over channel parameter grids
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.constants import QKD_BLOCK_BITS
+from key_exchange.qkd_simulator import (
+    get_rng, generate_random_bits, generate_random_bases,
+    eve_intercept, depolarize, detect, measure_bits
+)
+
+# Every (noise, intercept_rate, session) combination is one row of a 2-D
+# qubit array, simulated at the longest bit length. Shorter lengths are
+# prefixes of the same row: sifted and error counts are summed per
+# segment between consecutive lengths and accumulated, so the whole
+# (noise, intercept_rate, length) grid costs one pass over the qubits.
+# Blocks of about QKD_BLOCK_BITS qubits bound the memory.
+
+
+def _simulate_block(rows: int, width: int, noise, rate, loss_db: float, rng):
+    """
+    Returns (sifted, error) uint8 masks of shape (rows, width).
+    """
+    shape = (rows, width)
+    sender_bits = generate_random_bits(shape, rng)
+    sender_bases = generate_random_bases(shape, rng)
+
+    bits, bases = eve_intercept(sender_bits, sender_bases, eve_enabled=bool(np.any(rate > 0)), rng=rng, rate=rate)
+    bits, bases = depolarize(bits, bases, noise, rng)
+    detected = detect(shape, loss_db, rng)
+
+    receiver_bases = generate_random_bases(shape, rng)
+    receiver_bits = measure_bits(bits, bases, receiver_bases, rng)
+
+    sifted = (sender_bases == receiver_bases)
+    if detected is not None:
+        sifted &= detected
+    errors = sifted & (sender_bits != receiver_bits)
+    return sifted, errors
+
+
+def _segment_sums(mask, cuts):
+    # Sum of mask[:, cuts[k]:cuts[k + 1]] for every k
+    prefix = np.zeros((mask.shape[0], mask.shape[1] + 1), dtype=np.int64)
+    np.cumsum(mask, axis=1, out=prefix[:, 1:])
+    return prefix[:, cuts[1:]] - prefix[:, cuts[:-1]]
+
+
+def sweep_channel_grid(noise_levels, intercept_rates, bit_lengths, loss_db: float = 0.0,
+                       sessions: int = 1, rng=None) -> dict:
+    """
+    QBER over the (noise, intercept_rate, bit_length) grid.
+
+    Returns a dict of arrays (grid axes first, then):
+        qber, qber_std      -> (noise, rate, length), over sessions
+        sifted              -> (noise, rate, length), mean sifted bits
+        compromised         -> (noise, rate, length), fraction with QBER > 0.11
+        qber_theory         -> (noise, rate), p/2 + (1 - p) r/4
+    """
+    rng = get_rng(rng)
+    noise = np.asarray(noise_levels, dtype=np.float64)
+    rates = np.asarray(intercept_rates, dtype=np.float64)
+    lengths = np.unique(np.asarray(bit_lengths, dtype=np.int64))
+    if len(lengths) == 0 or lengths[0] <= 0:
+        raise ValueError("bit_lengths must be positive.")
+
+    n_noise, n_rate, n_len = len(noise), len(rates), len(lengths)
+    rows = n_noise * n_rate * sessions
+    max_len = int(lengths[-1])
+
+    # Row order: noise, then intercept rate, then session
+    row_noise = np.repeat(noise, n_rate * sessions)[:, None]
+    row_rate = np.tile(np.repeat(rates, sessions), n_noise)[:, None]
+
+    bounds = np.concatenate(([0], lengths))
+    seg_sifted = np.zeros((rows, n_len), dtype=np.int64)
+    seg_errors = np.zeros((rows, n_len), dtype=np.int64)
+
+    width = min(max_len, QKD_BLOCK_BITS)
+    row_block = max(1, QKD_BLOCK_BITS // width)
+
+    for r0 in range(0, rows, row_block):
+        r1 = min(r0 + row_block, rows)
+        for c0 in range(0, max_len, width):
+            c1 = min(c0 + width, max_len)
+            sifted, errors = _simulate_block(r1 - r0, c1 - c0, row_noise[r0:r1], row_rate[r0:r1], loss_db, rng)
+
+            cuts = np.clip(bounds, c0, c1) - c0
+            seg_sifted[r0:r1] += _segment_sums(sifted, cuts)
+            seg_errors[r0:r1] += _segment_sums(errors, cuts)
+
+    sifted = np.cumsum(seg_sifted, axis=1).reshape(n_noise, n_rate, sessions, n_len)
+    errors = np.cumsum(seg_errors, axis=1).reshape(n_noise, n_rate, sessions, n_len)
+    qber = np.where(sifted > 0, errors / np.maximum(sifted, 1), 1.0)
+
+    return {
+        "noise_levels": noise,
+        "intercept_rates": rates,
+        "bit_lengths": lengths,
+        "loss_db": np.float64(loss_db),
+        "sessions": np.int64(sessions),
+        "qber": qber.mean(axis=2),
+        "qber_std": qber.std(axis=2),
+        "sifted": sifted.mean(axis=2),
+        "compromised": (qber > 0.11).mean(axis=2),
+        "qber_theory": noise[:, None] / 2 + (1 - noise[:, None]) * rates[None, :] / 4
+    }
+
+
+def save_sweep(path: str, results: dict):
+    np.savez_compressed(path, **results)
+
+
+def load_sweep(path: str) -> dict:
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
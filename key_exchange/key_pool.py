@@ -0,0 +1,200 @@
+# Background hybrid-key pool
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import threading
+from collections import deque, namedtuple
+
+from utils.constants import KEY_POOL_HIGH_WATER, KEY_POOL_MAX_FAILURES, QKD_DEFAULT_BITS
+from utils.hashing import sha3_256
+from key_exchange.qkd_simulator import run_qkd_key_exchange
+from key_exchange.pqc_kyber import generate_pqc_shared_secret
+from key_exchange.hybrid_key_derivation import derive_hybrid_key
+
+# A background thread runs QKD + KEM + hybrid derivation ahead of time and
+# keeps up to high_water keys ready, so a sender takes a key in O(1)
+# instead of running the exchange on its critical path. Sessions whose
+# QBER marks the channel as compromised are discarded and retried; each
+# key is handed out once. Any other error stops the refill thread and is
+# raised from get() once the keys already made are used up.
+
+PooledKey = namedtuple(
+    "PooledKey",
+    ["key", "key_id", "qber", "qkd_bits", "created_at", "gen_time_ms"]
+)
+
+
+class HybridKeyPool:
+    """
+    Pre-generated hybrid keys, refilled on a background thread.
+
+    high_water   -> keys kept ready
+    qkd_bits     -> raw qubits per QKD session
+    max_failures -> consecutive compromised sessions after which get()
+                    on an empty pool raises instead of waiting
+    """
+
+    def __init__(self, high_water: int = KEY_POOL_HIGH_WATER, qkd_bits: int = QKD_DEFAULT_BITS,
+                 max_failures: int = KEY_POOL_MAX_FAILURES):
+        if high_water < 1:
+            raise ValueError("high_water must be at least 1.")
+
+        self.high_water = high_water
+        self.qkd_bits = qkd_bits
+        self.max_failures = max_failures
+
+        self._keys = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._failures = 0
+        self._error = None
+
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.discarded = 0
+        self.wait_time_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stopping = False
+            self._error = None
+            self._thread = threading.Thread(target=self._refill, name="qc-key-pool", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _generate(self):
+        t0 = time.time()
+        qkd_key, qber, compromised = run_qkd_key_exchange(self.qkd_bits, eve=False)
+        if compromised:
+            return None, qber
+
+        pqc_key, _, _ = generate_pqc_shared_secret()
+        key = derive_hybrid_key(qkd_key, pqc_key)
+        return PooledKey(
+            key=key,
+            key_id=sha3_256(key)[:8].hex(),
+            qber=qber,
+            qkd_bits=self.qkd_bits,
+            created_at=time.time(),
+            gen_time_ms=(time.time() - t0) * 1000
+        ), qber
+
+    def _refill(self):
+        while True:
+            with self._cond:
+                while len(self._keys) >= self.high_water and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+
+            # The exchange itself runs without holding the lock
+            try:
+                record, _ = self._generate()
+            except Exception as exc:
+                with self._cond:
+                    self._error = exc
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                if record is None:
+                    self.discarded += 1
+                    self._failures += 1
+                else:
+                    self._keys.append(record)
+                    self.generated += 1
+                    self._failures = 0
+                self._cond.notify_all()
+
+    def get(self, timeout: float = None) -> PooledKey:
+        """
+        Takes one key. Waits for the refill thread when the pool is empty;
+        raises TimeoutError after timeout seconds, ValueError when the
+        last max_failures sessions were all compromised, or the error
+        that stopped the refill thread.
+        """
+        with self._cond:
+            if self._thread is None:
+                raise ValueError("Key pool is not running — call start() first.")
+
+            if self._keys:
+                self.hits += 1
+            else:
+                self.misses += 1
+                t0 = time.time()
+                deadline = None if timeout is None else t0 + timeout
+                while not self._keys:
+                    if self._error is not None:
+                        raise self._error
+                    if self._failures >= self.max_failures:
+                        raise ValueError("[!] QKD Channel compromised — key pool cannot refill.")
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("No hybrid key available from the pool.")
+                    self._cond.wait(remaining)
+                waited = (time.time() - t0) * 1000
+                self.wait_time_ms += waited
+                self.max_wait_ms = max(self.max_wait_ms, waited)
+
+            record = self._keys.popleft()
+            self._cond.notify_all()
+            return record
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._keys)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "depth": len(self._keys),
+                "high_water": self.high_water,
+                "hits": self.hits,
+                "misses": self.misses,
+                "generated": self.generated,
+                "discarded": self.discarded,
+                "wait_time_ms": self.wait_time_ms,
+                "max_wait_ms": self.max_wait_ms,
+                "avg_wait_ms": self.wait_time_ms / self.misses if self.misses else 0.0
+            }
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def get_key_pool(high_water: int = None) -> HybridKeyPool:
+    """
+    Process-wide pool, started on first use with high_water keys ready
+    (default KEY_POOL_HIGH_WATER; one-shot callers that need a single key
+    pass high_water=1). Later calls return the same pool; asking them for
+    a different high_water raises ValueError.
+    """
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = HybridKeyPool(high_water or KEY_POOL_HIGH_WATER).start()
+        elif high_water is not None and high_water != _default_pool.high_water:
+            raise ValueError(f"Key pool already started with high_water={_default_pool.high_water}, "
+                             f"not {high_water}.")
+        return _default_pool
@@ -1,6 +1,8 @@
 import secrets
 import hashlib
 
+import numpy as np
+
 def random_bytes(n: int) -> bytes:
     return secrets.token_bytes(n)
 
@@ -13,51 +15,115 @@ def kdf(label: bytes, *parts: bytes, length: int = 32) -> bytes:
     return h.digest()[:length]
 
 
-def clamp_to_byte_list(b: bytes) -> list:
-    """Convert ANY bytes object into a list of 0–255 integers."""
-    return [x for x in b]    # each x is already 0..255
+def xor_bytes(a: bytes, b: bytes) -> bytes:
+    # One big-integer XOR instead of a per-byte loop
+    return (int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).to_bytes(len(a), "big")
 
-def kyber_generate_keypair():
+
+# Bytes-native KEM: pk, sk, ct and shared secrets are all bytes
+
+def kem_generate_keypair():
     """
     sk = random 32 bytes
     pk = KDF(sk)
-    ALWAYS returned as byte lists IN 0..255 RANGE
     """
     sk = random_bytes(32)
-    pk_bytes = kdf(b"pk", sk, length=32)
-    pk_list = clamp_to_byte_list(pk_bytes)
-    return pk_list, sk
+    pk = kdf(b"pk", sk, length=32)
+    return pk, sk
 
 
-def kyber_encapsulate(pk_list: list):
+def kem_encapsulate(pk: bytes):
     """
     r = random
     ct = r XOR mask
     ss = KDF(pk || r)
-    ALL VALUES FOR ct ARE IN 0..255 RANGE
     """
-
-    pk = bytes(pk_list)
     r = random_bytes(32)
+    mask = kdf(b"mask", pk, length=32)
+    ct = xor_bytes(r, mask)
+    ss = kdf(b"ss", pk, r, length=32)
+    return ct, ss
+
 
+def kem_decapsulate(ct: bytes, sk: bytes, pk: bytes) -> bytes:
     mask = kdf(b"mask", pk, length=32)
-    mask_list = clamp_to_byte_list(mask)
+    r_prime = xor_bytes(ct, mask)
+    return kdf(b"ss", pk, r_prime, length=32)
 
-    ct_list = [(a ^ b) for a, b in zip(r, mask_list)]
 
-    ss_bytes = kdf(b"ss", pk, r, length=32)
-    return ct_list, ss_bytes
+# Batch KEM for handshaking with many peers at once. The masks depend
+# only on pk, so each distinct pk is hashed once, and all XORs run as
+# one NumPy operation over an (n, 32) array.
 
+def _mask_matrix(pks):
+    masks = {}
+    for pk in pks:
+        if pk not in masks:
+            masks[pk] = kdf(b"mask", pk, length=32)
+    rows = b"".join(masks[pk] for pk in pks)
+    return np.frombuffer(rows, dtype=np.uint8).reshape(len(pks), 32)
 
-def kyber_decapsulate(ct_list: list, sk: bytes, pk_list: list):
-    pk = bytes(pk_list)
 
-    mask = kdf(b"mask", pk, length=32)
-    mask_list = clamp_to_byte_list(mask)
+def encapsulate_many(pks):
+    """
+    Encapsulates to every pk in pks. Returns (cts, shared secrets), two
+    lists of bytes in the order of pks.
+    """
+    pks = [bytes(pk) for pk in pks]
+    if not pks:
+        return [], []
+
+    r = random_bytes(32 * len(pks))
+    ct = (np.frombuffer(r, dtype=np.uint8).reshape(len(pks), 32) ^ _mask_matrix(pks)).tobytes()
+
+    cts = [ct[i:i + 32] for i in range(0, len(ct), 32)]
+    sss = [kdf(b"ss", pk, r[i * 32:(i + 1) * 32], length=32) for i, pk in enumerate(pks)]
+    return cts, sss
+
+
+def decapsulate_many(cts, sk: bytes, pk: bytes):
+    """
+    Decapsulates many ciphertexts sent to one keypair. Returns the shared
+    secrets in the order of cts.
+    """
+    if not cts:
+        return []
+
+    mask = np.frombuffer(kdf(b"mask", pk, length=32), dtype=np.uint8)
+    ct = np.frombuffer(b"".join(bytes(c) for c in cts), dtype=np.uint8).reshape(len(cts), 32)
+    r_prime = (ct ^ mask).tobytes()
+    return [kdf(b"ss", pk, r_prime[i:i + 32], length=32) for i in range(0, len(r_prime), 32)]
 
-    r_prime = bytes([(c ^ m) for c, m in zip(ct_list, mask_list)])
-    ss_recv = kdf(b"ss", pk, r_prime, length=32)
-    return ss_recv
+
+# List-based API (compatibility wrappers around the bytes-native KEM)
+
+def clamp_to_byte_list(b: bytes) -> list:
+    """Convert ANY bytes object into a list of 0–255 integers."""
+    return list(b)    # each x is already 0..255
+
+def kyber_generate_keypair():
+    """
+    sk = random 32 bytes
+    pk = KDF(sk)
+    ALWAYS returned as byte lists IN 0..255 RANGE
+    """
+    pk, sk = kem_generate_keypair()
+    return clamp_to_byte_list(pk), sk
+
+
+def kyber_encapsulate(pk_list: list):
+    """
+    r = random
+    ct = r XOR mask
+    ss = KDF(pk || r)
+    ALL VALUES FOR ct ARE IN 0..255 RANGE
+    """
+    ct, ss_bytes = kem_encapsulate(bytes(pk_list))
+    return clamp_to_byte_list(ct), ss_bytes
+
+
+def kyber_decapsulate(ct_list: list, sk: bytes, pk_list: list):
+    return kem_decapsulate(bytes(ct_list), sk, bytes(pk_list))
 
 
 def generate_pqc_shared_secret(key_length_bytes: int = 32):
@@ -68,9 +134,9 @@ def generate_pqc_shared_secret(key_length_bytes: int = 32):
         ct_list (0..255)
     """
 
-    pk_list, sk = kyber_generate_keypair()
-    ct_list, ss_sender = kyber_encapsulate(pk_list)
-    ss_receiver = kyber_decapsulate(ct_list, sk, pk_list)
+    pk, sk = kem_generate_keypair()
+    ct, ss_sender = kem_encapsulate(pk)
+    ss_receiver = kem_decapsulate(ct, sk, pk)
 
     if ss_sender != ss_receiver:
         raise ValueError("KEM mismatch — simulated failure.")
@@ -78,4 +144,4 @@ def generate_pqc_shared_secret(key_length_bytes: int = 32):
     digest = hashlib.sha3_512(ss_sender).digest()
     final_key = digest[:key_length_bytes]
 
-    return final_key, pk_list, ct_list
+    return final_key, clamp_to_byte_list(pk), clamp_to_byte_list(ct)
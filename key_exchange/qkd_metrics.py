@@ -1,11 +1,28 @@
 # qkd_metrics_generator.py
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import time
 import json
-import os
+import random
+import resource
 import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 
-from qkd_simulator import run_qkd_key_exchange
+import numpy as np
+
+from key_exchange.qkd_simulator import (
+    run_qkd_session, run_qkd_key_exchange, run_qkd_key_exchange_streaming, run_qkd_batch,
+    compute_qber, estimate_qber
+)
+from key_exchange.qkd_simulator import bits_to_bytes
+from key_exchange.channel_sweep import sweep_channel_grid, save_sweep
+from key_exchange.reconciliation import cascade_reconcile, binary_entropy, secure_key_length, privacy_amplify
+from utils.hashing import sha3_512
+from utils.constants import EXPERIMENT_CACHE_DIR, QKD_BLOCK_BITS, QKD_DEFAULT_BITS, QKD_MIN_SECURE_BITS
+from utils.experiment import run_experiment
 
 BASE_DIR = "qkd_metrics"
 PLOT_DIR = os.path.join(BASE_DIR, "plots")
@@ -13,53 +30,461 @@ PLOT_DIR = os.path.join(BASE_DIR, "plots")
 os.makedirs(BASE_DIR, exist_ok=True)
 os.makedirs(PLOT_DIR, exist_ok=True)
 
-def run_metrics(bit_lengths, runs_per_case=20):
+def _sweep_case(params, rng):
+    # One noise level of the channel grid
+    return sweep_channel_grid([params["noise"]], params["intercept_rates"], params["bit_lengths"],
+                              loss_db=params["loss_db"], sessions=params["sessions"], rng=rng)
+
+def run_metrics(bit_lengths, noise_levels=[0.0], intercept_rates=[0.0, 1.0], loss_db=0.0, sessions=20,
+                workers=None, seed=0, refresh=False):
+    """
+    QBER, sifted bits and compromised fraction over the whole
+    (noise, intercept_rate, bit_length) grid. Each noise level is one
+    vectorized sweep; the experiment driver shards them over a process
+    pool and caches them under BASE_DIR. Arrays are saved to
+    channel_sweep.npz; the returned dict holds the same arrays plus the
+    sweep time.
+    """
+    print(f"\n=== Channel sweep: {len(noise_levels)} noise x {len(intercept_rates)} intercept "
+          f"x {len(bit_lengths)} lengths x {sessions} sessions ===")
+
+    cases = [{
+        "noise": noise,
+        "intercept_rates": list(intercept_rates),
+        "bit_lengths": list(bit_lengths),
+        "loss_db": loss_db,
+        "sessions": sessions
+    } for noise in noise_levels]
+
+    start = time.time()
+    outcomes = run_experiment("qkd_channel_sweep", _sweep_case, cases, seed=seed, workers=workers,
+                              cache_dir=os.path.join(BASE_DIR, EXPERIMENT_CACHE_DIR), refresh=refresh)
+
+    results = {
+        "noise_levels": np.asarray(noise_levels, dtype=np.float64),
+        "intercept_rates": np.asarray(outcomes[0]["intercept_rates"]),
+        "bit_lengths": np.asarray(outcomes[0]["bit_lengths"]),
+        "loss_db": np.float64(loss_db),
+        "sessions": np.int64(sessions)
+    }
+    for key in ("qber", "qber_std", "sifted", "compromised", "qber_theory"):
+        results[key] = np.concatenate([np.asarray(o[key]) for o in outcomes], axis=0)
+    results["exec_time_ms"] = np.float64((time.time() - start) * 1000)
+    print(f"    done in {results['exec_time_ms']:.1f} ms")
+
+    path = os.path.join(BASE_DIR, "channel_sweep.npz")
+    save_sweep(path, results)
+    print(f"[+] Saved channel sweep → {path}")
+
+    return results
+
+def run_batch_metrics(session_counts, bit_length=QKD_DEFAULT_BITS, eve_fraction=0.5):
+    """
+    Sessions/sec of run_qkd_batch against calling run_qkd_key_exchange in
+    a loop, for capacity planning. Every 1/eve_fraction-th session is
+    attacked by Eve.
+    """
+    results = {
+        "session_counts": session_counts,
+        "bit_length": bit_length,
+        "eve_fraction": eve_fraction,
+        "metrics": {}
+    }
+
+    for n in session_counts:
+        print(f"\n=== Batch QKD: {n} sessions x {bit_length} bits ===")
+        eve = [i < n * eve_fraction for i in range(n)]
+
+        t1 = time.time()
+        for attacked in eve:
+            run_qkd_key_exchange(bit_length, eve=attacked)
+        loop_s = time.time() - t1
+
+        t2 = time.time()
+        _, qbers, compromised = run_qkd_batch(n, bit_length, eve=eve)
+        batch_s = time.time() - t2
+
+        results["metrics"][n] = {
+            "loop_time_ms": loop_s * 1000,
+            "batch_time_ms": batch_s * 1000,
+            "loop_sessions_per_sec": n / max(loop_s, 1e-9),
+            "batch_sessions_per_sec": n / max(batch_s, 1e-9),
+            "compromised_fraction": float(compromised.mean()),
+            "mean_qber": float(qbers.mean())
+        }
+        print(f"    loop {n / max(loop_s, 1e-9):10.0f} sessions/s | "
+              f"batch {n / max(batch_s, 1e-9):10.0f} sessions/s | "
+              f"compromised {compromised.mean():.3f}")
+
+    return results
+
+def run_cascade_metrics(qbers, key_bits=1_000_000, runs_per_case=3):
+    """
+    Cascade on sifted keys of key_bits with errors at each QBER:
+    corrected bits/sec, disclosed parity bits against the Shannon limit
+    n h(QBER), and the fraction of the key left after privacy amplification.
+    """
+    results = {
+        "qbers": qbers,
+        "key_bits": key_bits,
+        "runs_per_case": runs_per_case,
+        "metrics": {}
+    }
+
+    rng = np.random.default_rng()
+    print(f"\n=== Cascade reconciliation on {key_bits} bit keys ===")
+
+    for qber in qbers:
+        times, leaked, residual = [], [], []
+        for _ in range(runs_per_case):
+            sender = rng.integers(0, 2, size=key_bits, dtype=np.uint8)
+            receiver = sender ^ (rng.random(key_bits) < qber).astype(np.uint8)
+
+            t1 = time.time()
+            corrected, stats = cascade_reconcile(sender, receiver, qber, rng=rng)
+            times.append(time.time() - t1)
+            leaked.append(stats["leaked_bits"])
+            residual.append(int(np.count_nonzero(corrected != sender)))
+
+        mean_leaked = statistics.mean(leaked)
+        shannon = key_bits * binary_entropy(qber)
+        results["metrics"][qber] = {
+            "exec_time_ms": [t * 1000 for t in times],
+            "corrected_bits_per_sec": key_bits / max(statistics.mean(times), 1e-9),
+            "leaked_bits": leaked,
+            "reconciliation_efficiency": mean_leaked / shannon if shannon else None,
+            "residual_errors": residual,
+            "key_efficiency": secure_key_length(key_bits, qber, int(mean_leaked)) / key_bits
+        }
+        entry = results["metrics"][qber]
+        print(f"    QBER {qber:.3f} | {entry['corrected_bits_per_sec'] / 1e6:6.2f} Mbit/s | "
+              f"f = {entry['reconciliation_efficiency'] or 0:.3f} | "
+              f"key efficiency {entry['key_efficiency']:.3f} | residual {max(residual)}")
+
+    return results
+
+def run_estimation_metrics(sample_fractions, key_bits=1_000_000, qber=0.02, runs_per_case=3):
+    """
+    Sampled QBER estimation against comparing the whole sifted key: time
+    per estimate, width of the confidence interval and the secure key
+    left per sifted bit (with the point estimate and with its upper
+    bound). Full comparison discloses every bit, so it leaves no key.
+    """
+    results = {
+        "sample_fractions": sample_fractions,
+        "key_bits": key_bits,
+        "qber": qber,
+        "runs_per_case": runs_per_case,
+        "metrics": {}
+    }
+
+    rng = np.random.default_rng()
+    sender = rng.integers(0, 2, size=key_bits, dtype=np.uint8)
+    receiver = sender ^ (rng.random(key_bits) < qber).astype(np.uint8)
+
+    t1 = time.time()
+    for _ in range(runs_per_case):
+        compute_qber(sender, receiver)
+    results["full_compare_ms"] = (time.time() - t1) * 1000 / runs_per_case
+
+    print(f"\n=== QBER estimation on {key_bits} sifted bits (true QBER {qber}) ===")
+    print(f"    full comparison {results['full_compare_ms']:8.2f} ms | key yield 0")
+
+    for fraction in sample_fractions:
+        times, yields, yields_upper, widths, estimates = [], [], [], [], []
+        for _ in range(runs_per_case):
+            t1 = time.time()
+            estimate, kept_s, kept_r = estimate_qber(sender, receiver, sample_fraction=fraction, rng=rng)
+            times.append((time.time() - t1) * 1000)
+
+            _, stats = cascade_reconcile(kept_s, kept_r, estimate["qber"], rng=rng)
+            leaked = stats["leaked_bits"]
+            yields.append(secure_key_length(len(kept_s), estimate["qber"], leaked) / key_bits)
+            yields_upper.append(secure_key_length(len(kept_s), estimate["upper"], leaked) / key_bits)
+            widths.append(estimate["upper"] - estimate["lower"])
+            estimates.append(estimate["qber"])
+
+        results["metrics"][fraction] = {
+            "estimate_time_ms": times,
+            "qber_estimate": estimates,
+            "interval_width": statistics.mean(widths),
+            "key_yield": statistics.mean(yields),
+            "key_yield_upper_bound": statistics.mean(yields_upper)
+        }
+        print(f"    sample {fraction:6.3f} | {statistics.mean(times):8.2f} ms | "
+              f"QBER {statistics.mean(estimates):.4f} ± {statistics.mean(widths) / 2:.4f} | "
+              f"yield {statistics.mean(yields):.3f} (finite-key {statistics.mean(yields_upper):.3f})")
+
+    return results
+
+def run_session_yield_metrics(bit_lengths, runs_per_case=20):
+    """
+    Per session size (including QKD_DEFAULT_BITS): bits disclosed for
+    parameter estimation, bits kept, secure bits after privacy
+    amplification and the fraction of clean sessions that yield no key.
+    """
     results = {
         "bit_lengths": bit_lengths,
+        "default_bits": QKD_DEFAULT_BITS,
+        "min_secure_bits": QKD_MIN_SECURE_BITS,
         "runs_per_case": runs_per_case,
         "metrics": {}
     }
 
+    print(f"\n=== Key yield per session size (no Eve, key needs {QKD_MIN_SECURE_BITS} secure bits) ===")
+
     for bits in bit_lengths:
+        sessions = [run_qkd_session(bits) for _ in range(runs_per_case)]
+        sampled = statistics.mean(s["sampled_bits"] for s in sessions)
+        kept = statistics.mean(s["sifted_bits"] for s in sessions)
+        secure = statistics.mean(s["secure_bits"] for s in sessions)
+        refused = statistics.mean(1.0 if s["compromised"] or s["insufficient"] else 0.0 for s in sessions)
+
         results["metrics"][bits] = {
-            "no_eve": [],
-            "eve": []
+            "sampled_bits": sampled,
+            "kept_bits": kept,
+            "sampled_fraction": sampled / max(sampled + kept, 1),
+            "secure_bits": secure,
+            "no_key_fraction": refused
         }
+        marker = " (default)" if bits == QKD_DEFAULT_BITS else ""
+        print(f"    {bits:8d} bits{marker:10s} | sampled {sampled:8.1f} | kept {kept:9.1f} | "
+              f"secure {secure:9.1f} | no key {refused:.2f}")
+
+    return results
+
+def run_amplification_metrics(key_lengths, qber=0.02, runs_per_case=3, out_bits=None):
+    """
+    Toeplitz privacy amplification (output length from QBER, or fixed
+    out_bits for long keys hashed down to short outputs) against the
+    fixed 32-byte SHA3-512 path, in input Mbit/s.
+    """
+    results = {
+        "key_lengths": key_lengths,
+        "qber": qber,
+        "out_bits": out_bits,
+        "runs_per_case": runs_per_case,
+        "metrics": {}
+    }
+
+    rng = np.random.default_rng()
+    print(f"\n=== Privacy amplification throughput (QBER {qber}) ===")
 
-        print(f"\n=== Running QKD metrics for bit_length = {bits} ===")
+    for n in key_lengths:
+        bits = rng.integers(0, 2, size=n, dtype=np.uint8)
+        secure_bits = secure_key_length(n, qber, 0) if out_bits is None else out_bits
 
+        sha_ms, toeplitz_ms = [], []
         for _ in range(runs_per_case):
-            start = time.time()
-            key, qber, compromised = run_qkd_key_exchange(bits, eve=False)
-            end = time.time()
-
-            entry = {
-                "qber": qber,
-                "compromised": compromised,
-                "exec_time_ms": round((end - start) * 1000, 5),
-                "sifted_key_length": len(key)
+            t1 = time.time()
+            sha3_512(bits_to_bytes(bits))[:32]
+            sha_ms.append((time.time() - t1) * 1000)
+
+            t2 = time.time()
+            key, _ = privacy_amplify(bits, secure_bits, rng=rng)
+            toeplitz_ms.append((time.time() - t2) * 1000)
+
+        results["metrics"][n] = {
+            "output_bytes": len(key),
+            "sha3_time_ms": sha_ms,
+            "toeplitz_time_ms": toeplitz_ms,
+            "sha3_mbit_per_sec": n / 1e3 / max(statistics.mean(sha_ms), 1e-6),
+            "toeplitz_mbit_per_sec": n / 1e3 / max(statistics.mean(toeplitz_ms), 1e-6)
+        }
+        entry = results["metrics"][n]
+        print(f"    {n:9d} bits → {len(key):7d} bytes | SHA3 {entry['sha3_mbit_per_sec']:8.1f} Mbit/s | "
+              f"Toeplitz {entry['toeplitz_mbit_per_sec']:8.2f} Mbit/s")
+
+    return results
+
+def plot_cascade(results, filename="cascade_key_efficiency.png"):
+    plt.figure(figsize=(8,5))
+
+    qbers = results["qbers"]
+    key_eff = [results["metrics"][q]["key_efficiency"] for q in qbers]
+    bound = [max(0.0, 1 - 2 * binary_entropy(q)) for q in qbers]
+
+    plt.plot(qbers, key_eff, marker="o", label="Cascade")
+    plt.plot(qbers, bound, linestyle="--", label="1 - 2h(QBER) (ideal reconciliation)")
+
+    plt.xlabel("QBER", fontsize=12)
+    plt.ylabel("Secure Key Bits / Sifted Bit", fontsize=12)
+    plt.title("Key Efficiency vs QBER", fontsize=14)
+    plt.grid(True)
+    plt.legend()
+
+    save_path = os.path.join(PLOT_DIR, filename)
+    plt.savefig(save_path, dpi=200)
+    plt.close()
+
+    print(f"[+] Saved plot → {save_path}")
+
+def run_qkd_key_exchange_scalar(bit_length: int, eve=False):
+    """
+    Per-qubit list implementation the simulator used before it was
+    vectorized. Kept only as the baseline for run_speedup_metrics.
+    """
+    sender_bits = [random.randint(0, 1) for _ in range(bit_length)]
+    sender_bases = [random.choice(['+', 'x']) for _ in range(bit_length)]
+
+    bits, bases = sender_bits, sender_bases
+    if eve:
+        eve_bases = [random.choice(['+', 'x']) for _ in range(bit_length)]
+        bits = [b if s == e else random.randint(0, 1)
+                for b, s, e in zip(sender_bits, sender_bases, eve_bases)]
+        bases = eve_bases
+
+    receiver_bases = [random.choice(['+', 'x']) for _ in range(bit_length)]
+    receiver_bits = [b if s == r else random.randint(0, 1)
+                     for b, s, r in zip(bits, bases, receiver_bases)]
+
+    sift_s = [b for b, s, r in zip(sender_bits, sender_bases, receiver_bases) if s == r]
+    sift_r = [b for b, s, r in zip(receiver_bits, sender_bases, receiver_bases) if s == r]
+
+    errors = sum(1 for a, b in zip(sift_s, sift_r) if a != b)
+    return errors / len(sift_s) if sift_s else 1.0
+
+def _scalar_qber_blocked(bit_length: int, eve: bool) -> float:
+    # Scalar baseline in QKD_BLOCK_BITS pieces so its Python lists stay
+    # bounded at 10^7 bits; equal-sized blocks, so the mean is the QBER
+    qbers = []
+    for start in range(0, bit_length, QKD_BLOCK_BITS):
+        qbers.append(run_qkd_key_exchange_scalar(min(QKD_BLOCK_BITS, bit_length - start), eve=eve))
+    return statistics.mean(qbers)
+
+def run_speedup_metrics(bit_lengths, runs_per_case=3, vector_max_bits=1_000_000):
+    """
+    Bit-packed streaming engine against the per-qubit scalar loop at the
+    same bit lengths (both sift and estimate QBER, both with bounded
+    memory), with the mean QBER of each to show that the statistics
+    match. The in-memory run_qkd_session pipeline (with Cascade and
+    privacy amplification; short sessions yield no key but still run) is
+    timed up to vector_max_bits for reference.
+    """
+    results = {
+        "bit_lengths": bit_lengths,
+        "runs_per_case": runs_per_case,
+        "vector_max_bits": vector_max_bits,
+        "metrics": {}
+    }
+
+    for bits in bit_lengths:
+        print(f"\n=== Streaming vs scalar QKD for bit_length = {bits} ===")
+        entry = {}
+
+        for eve in (False, True):
+            scalar_ms, stream_ms, vector_ms = [], [], []
+            scalar_qber, stream_qber = [], []
+
+            for _ in range(runs_per_case):
+                t1 = time.time()
+                scalar_qber.append(_scalar_qber_blocked(bits, eve))
+                scalar_ms.append((time.time() - t1) * 1000)
+
+                t2 = time.time()
+                _, qber, _ = run_qkd_key_exchange_streaming(bits, eve=eve)
+                stream_ms.append((time.time() - t2) * 1000)
+                stream_qber.append(qber)
+
+                if bits <= vector_max_bits:
+                    t3 = time.time()
+                    run_qkd_session(bits, eve=eve)
+                    vector_ms.append((time.time() - t3) * 1000)
+
+            speedup = statistics.mean(scalar_ms) / max(statistics.mean(stream_ms), 1e-6)
+            entry["eve" if eve else "no_eve"] = {
+                "scalar_time_ms": scalar_ms,
+                "stream_time_ms": stream_ms,
+                "vector_time_ms": vector_ms,
+                "scalar_qber": statistics.mean(scalar_qber),
+                "stream_qber": statistics.mean(stream_qber),
+                "speedup": speedup
             }
-            results["metrics"][bits]["no_eve"].append(entry)
+            vector = f"{statistics.mean(vector_ms):8.1f} ms" if vector_ms else "       -   "
+            print(f"    {'eve   ' if eve else 'no eve'} scalar {statistics.mean(scalar_ms):10.1f} ms | "
+                  f"stream {statistics.mean(stream_ms):8.1f} ms | x{speedup:7.1f} | "
+                  f"pipeline {vector} | "
+                  f"QBER {statistics.mean(scalar_qber):.4f} / {statistics.mean(stream_qber):.4f}")
 
-        for _ in range(runs_per_case):
-            start = time.time()
-            key, qber, compromised = run_qkd_key_exchange(bits, eve=True)
-            end = time.time()
-
-            entry = {
-                "qber": qber,
-                "compromised": compromised,
-                "exec_time_ms": round((end - start) * 1000, 5),
-                "sifted_key_length": len(key)
+        results["metrics"][bits] = entry
+
+    return results
+
+def plot_speedup(results, filename="speedup_vs_bit_length.png"):
+    plt.figure(figsize=(8,5))
+
+    bit_lengths = results["bit_lengths"]
+    for mode, label in (("no_eve", "No Eve"), ("eve", "Eve Intercept")):
+        speedups = [results["metrics"][bits][mode]["speedup"] for bits in bit_lengths]
+        plt.plot(bit_lengths, speedups, marker="o", label=label)
+
+    plt.xscale("log")
+    plt.xlabel("Bit Length", fontsize=12)
+    plt.ylabel("Speedup (scalar / streaming)", fontsize=12)
+    plt.title("Bit-Packed QKD Speedup vs Bit Length", fontsize=14)
+    plt.grid(True)
+    plt.legend()
+
+    save_path = os.path.join(PLOT_DIR, filename)
+    plt.savefig(save_path, dpi=200)
+    plt.close()
+
+    print(f"[+] Saved plot → {save_path}")
+
+def _timed_session(mode: str, bits: int, eve: bool):
+    # Runs in a fresh spawned process so ru_maxrss is this session's peak
+    run = run_qkd_key_exchange_streaming if mode == "streaming" else run_qkd_key_exchange
+    start = time.time()
+    _, qber, _ = run(bits, eve=eve)
+    elapsed = time.time() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, qber, peak_kb
+
+def run_streaming_metrics(bit_lengths, vector_max_bits=10_000_000, eve=True):
+    """
+    Bits/sec and peak RSS of the block-streaming simulator against the
+    whole-session vectorized one. Each session runs in its own process;
+    the vectorized engine is skipped above vector_max_bits.
+    """
+    results = {
+        "bit_lengths": bit_lengths,
+        "eve": eve,
+        "metrics": {}
+    }
+
+    ctx = multiprocessing.get_context("spawn")
+
+    for bits in bit_lengths:
+        print(f"\n=== Streaming vs vectorized QKD for bit_length = {bits} ===")
+        entry = {}
+
+        for mode in ("vectorized", "streaming"):
+            if mode == "vectorized" and bits > vector_max_bits:
+                continue
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                elapsed, qber, peak_kb = pool.submit(_timed_session, mode, bits, eve).result()
+
+            entry[mode] = {
+                "exec_time_ms": elapsed * 1000,
+                "bits_per_sec": bits / max(elapsed, 1e-9),
+                "peak_rss_mb": peak_kb / 1024,
+                "qber": qber
             }
-            results["metrics"][bits]["eve"].append(entry)
+            print(f"    {mode:10s} {bits / max(elapsed, 1e-9) / 1e6:8.1f} Mbit/s | "
+                  f"peak RSS {peak_kb / 1024:8.1f} MB | QBER {qber:.4f}")
+
+        results["metrics"][bits] = entry
 
     return results
 
-def save_json(results):
-    path = os.path.join(BASE_DIR, "results.json")
+def _to_builtin(obj):
+    # NumPy arrays and scalars in the results → JSON lists / numbers
+    return obj.tolist()
+
+def save_json(results, filename="results.json"):
+    path = os.path.join(BASE_DIR, filename)
     with open(path, "w") as f:
-        json.dump(results, f, indent=4)
+        json.dump(results, f, indent=4, default=_to_builtin)
     print(f"\n[+] Saved QKD Metrics → {path}")
 
 def plot_metric(results, metric, ylabel, title, filename):
@@ -67,23 +492,40 @@ def plot_metric(results, metric, ylabel, title, filename):
 
     bit_lengths = results["bit_lengths"]
 
-    no_eve_vals = []
-    eve_vals = []
-
-    for bits in bit_lengths:
-        no_eve = [r[metric] for r in results["metrics"][bits]["no_eve"]]
-        eve = [r[metric] for r in results["metrics"][bits]["eve"]]
-
-        no_eve_vals.append(statistics.mean(no_eve))
-        eve_vals.append(statistics.mean(eve))
-
-    plt.plot(bit_lengths, no_eve_vals, marker="o", label="No Eve")
-    plt.plot(bit_lengths, eve_vals, marker="o", label="Eve Intercept")
+    # One line per (noise, intercept rate) cell of the grid
+    for i, noise in enumerate(results["noise_levels"]):
+        for j, rate in enumerate(results["intercept_rates"]):
+            plt.plot(bit_lengths, results[metric][i, j], marker="o",
+                     label=f"noise {noise:g}, intercept {rate:g}")
 
+    plt.xscale("log")
     plt.xlabel("Bit Length", fontsize=12)
     plt.ylabel(ylabel, fontsize=12)
     plt.title(title, fontsize=14)
     plt.grid(True)
+    plt.legend(fontsize=7)
+
+    save_path = os.path.join(PLOT_DIR, filename)
+    plt.savefig(save_path, dpi=200)
+    plt.close()
+
+    print(f"[+] Saved plot → {save_path}")
+
+def plot_qber_vs_intercept(results, filename="qber_vs_intercept_rate.png"):
+    plt.figure(figsize=(8,5))
+
+    rates = results["intercept_rates"]
+    longest = results["bit_lengths"][-1]
+
+    for i, noise in enumerate(results["noise_levels"]):
+        line, = plt.plot(rates, results["qber"][i, :, -1], marker="o", label=f"noise {noise:g}")
+        plt.plot(rates, results["qber_theory"][i], linestyle="--", color=line.get_color())
+
+    plt.axhline(0.11, color="red", linewidth=1, label="abort threshold")
+    plt.xlabel("Intercept Rate", fontsize=12)
+    plt.ylabel("QBER", fontsize=12)
+    plt.title(f"QBER vs Intercept Rate ({longest} bits; dashed = theory)", fontsize=14)
+    plt.grid(True)
     plt.legend()
 
     save_path = os.path.join(PLOT_DIR, filename)
@@ -94,23 +536,51 @@ def plot_metric(results, metric, ylabel, title, filename):
 
 
 if __name__ == "__main__":
-    bit_lengths = [128, 256, 512, 1024]
+    bit_lengths = [128, 256, 512, 1024, 10_000, 100_000, 1_000_000, 10_000_000]
 
     print("Running QKD Metrics Generator...")
 
-    results = run_metrics(bit_lengths, runs_per_case=20)
+    results = run_metrics(bit_lengths,
+                          noise_levels=[0.0, 0.02, 0.05, 0.1],
+                          intercept_rates=[0.0, 0.1, 0.25, 0.5, 1.0],
+                          sessions=8)
     save_json(results)
 
     plot_metric(results, "qber",
                 "QBER", "QBER vs Bit Length",
                 "qber_vs_bit_length.png")
 
-    plot_metric(results, "exec_time_ms",
-                "Execution Time (ms)", "QKD Execution Time vs Bit Length",
-                "exec_time_vs_bit_length.png")
-
-    plot_metric(results, "sifted_key_length",
-                "Final Key Length (bytes)", "Sifted Key Size vs Bit Length",
+    plot_metric(results, "sifted",
+                "Sifted Bits", "Sifted Key Size vs Bit Length",
                 "sifted_vs_bit_length.png")
 
+    plot_qber_vs_intercept(results)
+
+    batch = run_batch_metrics([100, 1_000, 5_000])
+    save_json(batch, "batch.json")
+
+    cascade = run_cascade_metrics([0.005, 0.01, 0.02, 0.04, 0.06, 0.08, 0.10, 0.11])
+    save_json(cascade, "cascade.json")
+    plot_cascade(cascade)
+
+    estimation = run_estimation_metrics([0.001, 0.005, 0.01, 0.05, 0.1, 0.2])
+    save_json(estimation, "estimation.json")
+
+    session_yield = run_session_yield_metrics([256, 1024, 4096, QKD_DEFAULT_BITS, 65536])
+    save_json(session_yield, "session_yield.json")
+
+    amplification = run_amplification_metrics([1_000, 10_000, 100_000, 1_000_000, 4_000_000])
+    save_json(amplification, "amplification.json")
+
+    # Long keys to short outputs: the direct path must stay O(n m)
+    amplification_short = run_amplification_metrics([131_072, 1_000_000, 4_000_000], out_bits=8)
+    save_json(amplification_short, "amplification_short_output.json")
+
+    speedup = run_speedup_metrics([1_000, 10_000, 100_000, 1_000_000, 10_000_000], runs_per_case=3)
+    save_json(speedup, "speedup.json")
+    plot_speedup(speedup)
+
+    streaming = run_streaming_metrics([1_000_000, 10_000_000, 100_000_000, 1_000_000_000])
+    save_json(streaming, "streaming.json")
+
     print("\n[✓] ALL METRICS GENERATED SUCCESSFULLY!")
@@ -2,110 +2,436 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import random
+import math
+import hashlib
+from collections import namedtuple
+import numpy as np
+from utils.constants import (
+    QKD_BLOCK_BITS, QKD_DEFAULT_BITS, QKD_MIN_SECURE_BITS,
+    QBER_SAMPLE_FRACTION, QBER_MIN_SAMPLE, QBER_MAX_SAMPLE_FRACTION, QBER_CONFIDENCE_EPS
+)
 from utils.hashing import sha3_512
+from key_exchange.reconciliation import cascade_reconcile, secure_key_length, privacy_amplify
 
+# Vectorized engine: every stage works on whole NumPy arrays instead of
+# per-qubit Python lists. Bits are uint8 arrays of 0/1 and bases are
+# uint8 arrays with RECTILINEAR ('+') = 0 and DIAGONAL ('x') = 1.
+RECTILINEAR = 0
+DIAGONAL = 1
 
-# Random bit generator
-def generate_random_bits(n: int):
-    return [random.randint(0, 1) for _ in range(n)]
+# Shared generator, seeded from OS entropy. Every helper also takes an
+# explicit rng so a session can be reproduced from a seed; get_rng picks
+# the explicit one when given.
+_rng = np.random.default_rng()
 
 
-# Random bases: '+' or 'x'
-def generate_random_bases(n: int):
-    return [random.choice(['+', 'x']) for _ in range(n)]
+def get_rng(rng=None):
+    return _rng if rng is None else rng
 
 
-# Eve intercept-resend attack
-def eve_intercept(bits, bases, eve_enabled=False):
+# Random bit generator: n may be a length or an array shape. Unpacking
+# random bytes is several times faster than Generator.integers(0, 2)
+def generate_random_bits(n, rng=None):
+    count = int(np.prod(n))
+    raw = np.frombuffer(get_rng(rng).bytes((count + 7) // 8), dtype=np.uint8)
+    return np.unpackbits(raw, count=count).reshape(n)
+
+
+# Random bases: RECTILINEAR ('+') or DIAGONAL ('x')
+def generate_random_bases(n, rng=None):
+    return generate_random_bits(n, rng)
+
+
+# Measuring in the wrong basis yields a uniformly random bit. Drawing a
+# guess for every qubit and selecting with XOR/AND masks is cheaper than
+# scattering guesses into the mismatched positions
+def _measure(bits, prep_bases, meas_bases, rng):
+    guess = generate_random_bits(bits.shape, rng)
+    return bits ^ ((bits ^ guess) & (prep_bases ^ meas_bases))
+
+
+# Channel model: depolarizing noise (probability a qubit is replaced by
+# a random BB84 state), loss in dB, and the fraction of qubits Eve
+# intercepts and resends. The rates may also be arrays that broadcast
+# against the qubit arrays (one rate per row of a 2-D block).
+ChannelModel = namedtuple("ChannelModel", ["noise", "loss_db", "intercept_rate"], defaults=(0.0, 0.0, 0.0))
+
+
+def _bernoulli(shape, p, rng):
+    return rng.random(shape, dtype=np.float32) < np.asarray(p, dtype=np.float32)
+
+
+# Eve intercept-resend attack on a random fraction rate of the qubits
+def eve_intercept(bits, bases, eve_enabled=False, rng=None, rate=1.0):
     if not eve_enabled:
         return bits, bases
 
-    eve_bits = []
-    eve_bases = generate_random_bases(len(bits))
+    rng = get_rng(rng)
+    eve_bases = generate_random_bases(bits.shape, rng)
 
-    # Eve measures bits incorrectly if basis mismatch
-    for b, s_base, e_base in zip(bits, bases, eve_bases):
-        if s_base == e_base:
-            eve_bits.append(b)
-        else:
-            eve_bits.append(random.randint(0, 1))
+    # Eve measures bits incorrectly if basis mismatch, then resends
+    # with her random basis
+    eve_bits = _measure(bits, bases, eve_bases, rng)
+    if np.all(np.asarray(rate) >= 1):
+        return eve_bits, eve_bases
 
-    # Eve resends with her random basis
-    return eve_bits, eve_bases
+    hit = _bernoulli(bits.shape, rate, rng)
+    return np.where(hit, eve_bits, bits), np.where(hit, eve_bases, bases)
 
 
-# Measurement at receiver
-def measure_bits(bits, sender_bases, receiver_bases):
-    measured = []
-    for b, s_base, r_base in zip(bits, sender_bases, receiver_bases):
-        if s_base == r_base:
-            measured.append(b)
-        else:
-            measured.append(random.randint(0, 1))
-    return measured
+# Depolarizing channel: each qubit is replaced by a random BB84 state
+# with probability noise, so it measures as a random bit in either basis
+def depolarize(bits, bases, noise=0.0, rng=None):
+    if np.all(np.asarray(noise) <= 0):
+        return bits, bases
+
+    rng = get_rng(rng)
+    hit = _bernoulli(bits.shape, noise, rng)
+    return (np.where(hit, generate_random_bits(bits.shape, rng), bits),
+            np.where(hit, generate_random_bases(bits.shape, rng), bases))
 
 
-# Sift key
-def sift_key(sender_bases, receiver_bases, sender_bits, receiver_bits):
-    sifted_sender = []
-    sifted_receiver = []
+# Lossy channel: mask of qubits the receiver detects (None = all of them)
+def detect(shape, loss_db=0.0, rng=None):
+    transmittance = 10 ** (-loss_db / 10)
+    if transmittance >= 1:
+        return None
+    return _bernoulli(shape, transmittance, get_rng(rng))
 
-    for s_b, r_b, s_bit, r_bit in zip(sender_bases, receiver_bases, sender_bits, receiver_bits):
-        if s_b == r_b:
-            sifted_sender.append(s_bit)
-            sifted_receiver.append(r_bit)
 
-    return sifted_sender, sifted_receiver
+# Measurement at receiver
+def measure_bits(bits, sender_bases, receiver_bases, rng=None):
+    return _measure(bits, sender_bases, receiver_bases, get_rng(rng))
+
+
+# Sift key: matching bases among the detected qubits
+def sift_key(sender_bases, receiver_bases, sender_bits, receiver_bits, detected=None):
+    keep = sender_bases == receiver_bases
+    if detected is not None:
+        keep &= detected
+    return sender_bits[keep], receiver_bits[keep]
 
 
 # QBER computation
 def compute_qber(sift_s, sift_r):
     if len(sift_s) == 0:
         return 1.0  # total failure
-    errors = sum(1 for a, b in zip(sift_s, sift_r) if a != b)
+    errors = int(np.count_nonzero(sift_s != sift_r))
     return errors / len(sift_s)
 
 
-# Convert bit array → bytes
-def bits_to_bytes(bits):
-    while len(bits) % 8 != 0:
-        bits.append(0)
+# Parameter estimation: disclose a random sample of sifted positions,
+# estimate QBER on it and keep only the undisclosed bits for the key.
+# The sample is capped at max_fraction of the key, so short keys are not
+# mostly disclosed just to reach min_sample.
+# Returns ({qber, lower, upper, sampled}, kept sender bits, kept receiver bits);
+# [lower, upper] holds the true QBER except with probability eps
+def estimate_qber(sift_s, sift_r, sample_fraction: float = QBER_SAMPLE_FRACTION,
+                  min_sample: int = QBER_MIN_SAMPLE, eps: float = QBER_CONFIDENCE_EPS, rng=None,
+                  max_fraction: float = QBER_MAX_SAMPLE_FRACTION):
+    rng = get_rng(rng)
+    n = len(sift_s)
+    k = min(int(n * max_fraction), max(min_sample, int(n * sample_fraction)))
+    if k == 0:
+        return {"qber": 1.0, "lower": 0.0, "upper": 1.0, "sampled": 0}, sift_s, sift_r
+
+    sample = rng.choice(n, size=k, replace=False)
+    qber = compute_qber(sift_s[sample], sift_r[sample])
+    delta = math.sqrt(math.log(2 / eps) / (2 * k))
+
+    keep = np.ones(n, dtype=bool)
+    keep[sample] = False
 
-    output = bytearray()
-    for i in range(0, len(bits), 8):
-        byte = 0
-        for bit in bits[i:i+8]:
-            byte = (byte << 1) | bit
-        output.append(byte)
-    return bytes(output)
+    estimate = {
+        "qber": qber,
+        "lower": max(0.0, qber - delta),
+        "upper": min(1.0, qber + delta),
+        "sampled": k
+    }
+    return estimate, sift_s[keep], sift_r[keep]
+
+
+# Convert bit array → bytes (MSB first, zero-padded to a whole byte)
+def bits_to_bytes(bits):
+    return np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes()
 
 
 # FULL QKD PIPELINE
-def run_qkd_key_exchange(bit_length: int = 256, eve=False):
+#
+# run_qkd_session returns the distilled key at its secure length, which
+# follows from the estimated QBER and the bits disclosed by Cascade.
+# run_qkd_key_exchange condenses it to the fixed 32-byte key the hybrid
+# key derivation uses. Sessions too short to keep QKD_MIN_SECURE_BITS
+# secret bits yield no key and are flagged insufficient rather than
+# compromised; run_qkd_key_exchange and run_qkd_batch raise ValueError
+# for them, since only a longer session can fix that.
+def run_qkd_session(bit_length: int = QKD_DEFAULT_BITS, eve=False, rng=None, channel: ChannelModel = None):
+    """
+    channel -> ChannelModel for noise, loss and partial interception
+               (eve=True intercepts every qubit)
+
+    Returns a dict with:
+        key            -> Toeplitz-amplified key (secure_bits // 8 bytes),
+                          or None when compromised or insufficient
+        qber, qber_upper, compromised
+        insufficient   -> too few secure bits for a key (channel not at fault)
+        sampled_bits   -> sifted bits disclosed for parameter estimation
+        sifted_bits    -> sifted bits left after parameter estimation
+        leaked_bits    -> parities disclosed by Cascade
+        secure_bits    -> bits that survive privacy amplification
+        raw_sifted     -> sender's sifted bits (as bytes) for the fallback key
+    """
+    rng = get_rng(rng)
+    channel = channel or ChannelModel()
+    intercept_rate = 1.0 if eve else channel.intercept_rate
+
     # 1. Sender bits + bases
-    sender_bits = generate_random_bits(bit_length)
-    sender_bases = generate_random_bases(bit_length)
+    sender_bits = generate_random_bits(bit_length, rng)
+    sender_bases = generate_random_bases(bit_length, rng)
 
-    # 2. Eve intercepts (optional)
-    intercepted_bits, intercepted_bases = eve_intercept(sender_bits, sender_bases, eve_enabled=eve)
+    # 2. Eve intercepts (optional), then the channel adds noise and loss
+    channel_bits, channel_bases = eve_intercept(sender_bits, sender_bases, eve_enabled=intercept_rate > 0,
+                                                rng=rng, rate=intercept_rate)
+    channel_bits, channel_bases = depolarize(channel_bits, channel_bases, channel.noise, rng)
+    detected = detect(bit_length, channel.loss_db, rng)
 
     # 3. Receiver chooses bases
-    receiver_bases = generate_random_bases(bit_length)
+    receiver_bases = generate_random_bases(bit_length, rng)
 
     # 4. Receiver measures
-    receiver_bits = measure_bits(intercepted_bits, intercepted_bases if eve else sender_bases, receiver_bases)
+    receiver_bits = measure_bits(channel_bits, channel_bases, receiver_bases, rng)
 
-    # 5. Sift matching-basis bits
-    sift_s, sift_r = sift_key(sender_bases, receiver_bases, sender_bits, receiver_bits)
+    # 5. Sift matching-basis bits among the detected qubits
+    sift_s, sift_r = sift_key(sender_bases, receiver_bases, sender_bits, receiver_bits, detected)
 
-    # 6. QBER
-    qber = compute_qber(sift_s, sift_r)
+    return _distill(sift_s, sift_r, rng)
+
+
+def _distill(sift_s, sift_r, rng) -> dict:
+    """
+    Classical post-processing of one session's sifted bits (steps 6-9),
+    shared by run_qkd_session and run_qkd_batch. Returns the session dict.
+    """
+    # 6. QBER, estimated on a disclosed sample; the sampled bits are
+    # dropped and the rest of the sifted key carries on. Security
+    # decisions use the upper confidence bound, not the point estimate,
+    # so a sample that underestimates the QBER cannot lengthen the key
+    estimate, sift_s, sift_r = estimate_qber(sift_s, sift_r, rng=rng)
+    qber = estimate["qber"]
+    qber_upper = estimate["upper"]
+
+    session = {
+        "key": None,
+        "qber": qber,
+        "qber_upper": qber_upper,
+        "compromised": True,
+        "insufficient": False,
+        "sampled_bits": estimate["sampled"],
+        "sifted_bits": len(sift_s),
+        "leaked_bits": 0,
+        "secure_bits": 0,
+        "raw_sifted": bits_to_bytes(sift_s)
+    }
+
+    # 7. If QBER may be too high → channel compromised. When even an
+    # error-free sample could not bound it below 0.11, the sample is too
+    # small to tell, so a clean-looking session is insufficient instead
+    if qber_upper > 0.11:
+        if qber <= 0.11 and qber_upper - qber > 0.11:
+            session["compromised"] = False
+            session["insufficient"] = True
+        return session
+
+    # 8. Error correction: receiver fixes its sifted bits with Cascade
+    corrected, ec = cascade_reconcile(sift_s, sift_r, qber, rng=rng)
+    session["leaked_bits"] = ec["leaked_bits"]
+
+    # Both sides compare a hash of the reconciled key; a residual error
+    # leaves them with different keys
+    if sha3_512(bits_to_bytes(corrected)) != sha3_512(session["raw_sifted"]):
+        return session
+
+    # 9. Privacy amplification (Toeplitz hash) down to the bits Eve cannot
+    # know after the parities disclosed by Cascade. Fewer secret bits than
+    # the QKD key itself → no key, but the channel itself is fine: the
+    # session was too short, which is not a compromise
+    secure_bits = secure_key_length(len(corrected), qber_upper, ec["leaked_bits"])
+    session["secure_bits"] = secure_bits
+    if secure_bits < QKD_MIN_SECURE_BITS:
+        session["compromised"] = False
+        session["insufficient"] = True
+        return session
+
+    session["key"], _ = privacy_amplify(corrected, secure_bits, rng=rng)
+    session["compromised"] = False
+    return session
+
+
+def _final_key(session: dict) -> bytes:
+    # Fixed-length key for derive_hybrid_key; a compromised session still
+    # returns a key (of the raw sifted bits) alongside its flag, as before
+    material = session["raw_sifted"] if session["compromised"] else session["key"]
+    return sha3_512(material)[:32]
+
+
+def _check_sufficient(sessions, bit_length: int):
+    short = [s["secure_bits"] for s in sessions if s["insufficient"]]
+    if short:
+        raise ValueError(f"{bit_length}-qubit sessions are too short: {min(short)} secure bits left, "
+                         f"a key needs {QKD_MIN_SECURE_BITS}. Use a longer session.")
 
-    # 7. If QBER too high → channel compromised
-    compromised = qber > 0.11
 
-    # 8. Privacy amplification
-    final_key = sha3_512(bits_to_bytes(sift_s))[:32]
+def run_qkd_key_exchange(bit_length: int = QKD_DEFAULT_BITS, eve=False):
+    if bit_length < QKD_MIN_SECURE_BITS:
+        raise ValueError(f"bit_length must be at least {QKD_MIN_SECURE_BITS} qubits.")
+
+    session = run_qkd_session(bit_length, eve=eve)
+    _check_sufficient([session], bit_length)
+    return _final_key(session), session["qber"], session["compromised"]
+
+
+# STREAMING QKD PIPELINE
+#
+# Same quantum stage as run_qkd_key_exchange (QBER over the whole sifted
+# key, no reconciliation; the key is a hash), but qubits are simulated in
+# blocks of block_bits and every per-qubit value is bit-packed (8 qubits
+# per byte). Sifting and measurement are bitwise masks, QBER counts come
+# from popcounts, and the sifted key is fed to a running SHA3-512, so
+# memory stays flat however many qubits are simulated.
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(packed) -> int:
+    return int(_POPCOUNT[packed].sum(dtype=np.int64))
+
+
+def _random_packed(nbytes: int, rng):
+    return np.frombuffer(rng.bytes(nbytes), dtype=np.uint8)
+
+
+def _measure_packed(bits, prep_bases, meas_bases, rng):
+    mismatch = prep_bases ^ meas_bases
+    return (bits & ~mismatch) | (_random_packed(len(bits), rng) & mismatch)
+
+
+def run_qkd_key_exchange_streaming(bit_length: int = QKD_DEFAULT_BITS, eve=False, block_bits: int = QKD_BLOCK_BITS, rng=None):
+    if block_bits <= 0 or block_bits % 8:
+        raise ValueError("block_bits must be a positive multiple of 8.")
+
+    rng = get_rng(rng)
+    hasher = hashlib.sha3_512()
+    sifted = errors = 0
+    carry = np.empty(0, dtype=np.uint8)     # sifted bits not yet filling a byte
+
+    for start in range(0, bit_length, block_bits):
+        nbits = min(block_bits, bit_length - start)
+        nbytes = (nbits + 7) // 8
+
+        # Qubits past nbits in the last byte are never sifted
+        valid = np.full(nbytes, 0xFF, dtype=np.uint8)
+        if nbits % 8:
+            valid[-1] = (0xFF << (8 - nbits % 8)) & 0xFF
+
+        # 1. Sender bits + bases
+        sender_bits = _random_packed(nbytes, rng)
+        sender_bases = _random_packed(nbytes, rng)
+
+        # 2. Eve intercepts (optional) and resends in her bases
+        bits, bases = sender_bits, sender_bases
+        if eve:
+            bases = _random_packed(nbytes, rng)
+            bits = _measure_packed(sender_bits, sender_bases, bases, rng)
+
+        # 3-4. Receiver chooses bases and measures
+        receiver_bases = _random_packed(nbytes, rng)
+        receiver_bits = _measure_packed(bits, bases, receiver_bases, rng)
+
+        # 5-6. Sift mask + error count
+        sift = ~(sender_bases ^ receiver_bases) & valid
+        sifted += _popcount(sift)
+        errors += _popcount((sender_bits ^ receiver_bits) & sift)
+
+        # 8. Privacy amplification over the sifted sender bits, in order
+        kept = np.unpackbits(sender_bits, count=nbits)[np.unpackbits(sift, count=nbits).view(bool)]
+        kept = np.concatenate((carry, kept))
+        whole = len(kept) - len(kept) % 8
+        hasher.update(np.packbits(kept[:whole]).tobytes())
+        carry = kept[whole:]
+
+    if len(carry):
+        hasher.update(np.packbits(carry).tobytes())
+
+    qber = errors / sifted if sifted else 1.0
+    compromised = qber > 0.11
+    final_key = hasher.digest()[:32]
 
     return final_key, qber, compromised
+
+
+# BATCHED QKD PIPELINE
+#
+# n_sessions independent sessions of bit_length qubits. The quantum stage
+# (preparation, channel, measurement, sifting) runs as one (sessions x
+# qubits) array computation; every session's sifted bits then go through
+# the same classical post-processing as run_qkd_session (sampled QBER,
+# Cascade, Toeplitz amplification), so a batch session is the same
+# protocol as run_qkd_key_exchange. eve is a bool for every session or
+# one bool per session. Sessions are processed in row blocks of about
+# QKD_BLOCK_BITS qubits so memory stays bounded for large batches.
+
+def _batch_block(n, bit_length, eve_rows, channel, rng):
+    shape = (n, bit_length)
+    sender_bits = generate_random_bits(shape, rng)
+    sender_bases = generate_random_bases(shape, rng)
+
+    # Eve intercepts every qubit of the rows she attacks, and the
+    # channel's intercept rate of the others
+    rate = np.where(eve_rows, 1.0, channel.intercept_rate)[:, None]
+    bits, bases = eve_intercept(sender_bits, sender_bases, eve_enabled=bool(np.any(rate > 0)),
+                                rng=rng, rate=rate)
+    bits, bases = depolarize(bits, bases, channel.noise, rng)
+    detected = detect(shape, channel.loss_db, rng)
+
+    receiver_bases = generate_random_bases(shape, rng)
+    receiver_bits = _measure(bits, bases, receiver_bases, rng)
+
+    keep = sender_bases == receiver_bases
+    if detected is not None:
+        keep &= detected
+
+    # Row-major boolean indexing keeps each session's sifted bits together
+    # and in order; split them back per session for post-processing
+    flat_s, flat_r = sender_bits[keep], receiver_bits[keep]
+    bounds = np.concatenate(([0], np.cumsum(np.count_nonzero(keep, axis=1))))
+    return [_distill(flat_s[lo:hi], flat_r[lo:hi], rng)
+            for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def run_qkd_batch(n_sessions: int, bit_length: int = QKD_DEFAULT_BITS, eve=False, rng=None,
+                  channel: ChannelModel = None):
+    """
+    Returns (keys, qber, compromised):
+        keys        -> list of n_sessions 32-byte final keys, as
+                       run_qkd_key_exchange returns them
+        qber        -> float64 array of per-session estimated QBER
+        compromised -> bool array of per-session compromise flags
+    Raises ValueError if any session is too short to yield a key.
+    """
+    rng = get_rng(rng)
+    channel = channel or ChannelModel()
+    eve_rows = np.broadcast_to(np.asarray(eve, dtype=bool), (n_sessions,))
+
+    rows = max(1, QKD_BLOCK_BITS // max(bit_length, 1))
+    sessions = []
+
+    for start in range(0, n_sessions, rows):
+        end = min(start + rows, n_sessions)
+        sessions.extend(_batch_block(end - start, bit_length, eve_rows[start:end], channel, rng))
+
+    _check_sufficient(sessions, bit_length)
+
+    keys = [_final_key(session) for session in sessions]
+    qber = np.array([session["qber"] for session in sessions], dtype=np.float64)
+    compromised = np.array([session["compromised"] for session in sessions], dtype=bool)
+    return keys, qber, compromised
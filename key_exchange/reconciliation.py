@@ -0,0 +1,178 @@
+# Cascade information reconciliation + Toeplitz privacy amplification
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math
+import numpy as np
+
+from utils.constants import CASCADE_PASSES, TOEPLITZ_DIRECT_MAX
+
+# Bits are uint8 arrays of 0/1, as in qkd_simulator. Each pass shuffles
+# the key, compares block parities and binary-searches every odd block
+# at once. Parities of any range come from prefix-XOR arrays, so a whole
+# level of the binary search is a handful of array lookups. After each
+# correction round all earlier passes are re-checked (the Cascade step),
+# until every block of every pass agrees.
+#
+# Every parity the receiver asks for is disclosed on the public channel
+# and counted in leaked_bits, which privacy amplification subtracts.
+
+
+def _prefix_parity(bits):
+    # P[i] = parity of bits[:i]
+    out = np.zeros(len(bits) + 1, dtype=np.uint8)
+    np.bitwise_xor.accumulate(bits, out=out[1:])
+    return out
+
+
+def _correct_pass(sender, receiver, perm, block):
+    """
+    Fixes one error in every odd-parity block of this pass (in place).
+    Returns (errors corrected, parity bits leaked by the binary search).
+    """
+    a = sender[perm]
+    b = receiver[perm]
+    n = len(a)
+
+    pa = _prefix_parity(a)
+    pb = _prefix_parity(b)
+
+    lo = np.arange(0, n, block)
+    hi = np.minimum(lo + block, n)
+    odd = (pa[hi] ^ pa[lo]) != (pb[hi] ^ pb[lo])
+    lo, hi = lo[odd], hi[odd]
+    if len(lo) == 0:
+        return 0, 0
+
+    leaked = 0
+    active = hi - lo > 1
+    while active.any():
+        mid = (lo + hi) // 2
+        leaked += int(np.count_nonzero(active))
+        left_odd = (pa[mid] ^ pa[lo]) != (pb[mid] ^ pb[lo])
+        hi = np.where(active & left_odd, mid, hi)
+        lo = np.where(active & ~left_odd, mid, lo)
+        active = hi - lo > 1
+
+    receiver[perm[lo]] ^= 1
+    return len(lo), leaked
+
+
+def initial_block_size(qber: float, n: int) -> int:
+    # ~0.73 / QBER puts about one error in each first-pass block
+    if qber <= 0:
+        return max(n, 1)
+    return max(1, min(n, int(0.73 / qber)))
+
+
+def cascade_reconcile(sender_bits, receiver_bits, qber: float, passes: int = CASCADE_PASSES, rng=None):
+    """
+    Returns (corrected receiver bits, stats). stats holds leaked_bits,
+    errors_corrected and the block size of each pass.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    sender = np.asarray(sender_bits, dtype=np.uint8)
+    receiver = np.array(receiver_bits, dtype=np.uint8)
+    n = len(sender)
+
+    stats = {"leaked_bits": 0, "errors_corrected": 0, "block_sizes": []}
+    if n == 0:
+        return receiver, stats
+
+    block = initial_block_size(qber, n)
+    done = []
+
+    for p in range(passes):
+        perm = np.arange(n) if p == 0 else rng.permutation(n)
+        done.append((perm, block))
+        stats["block_sizes"].append(block)
+
+        # Sender discloses the parity of every top-level block
+        stats["leaked_bits"] += -(-n // block)
+
+        # Correct this pass, then keep revisiting earlier passes until no
+        # block anywhere has odd parity. Each round fixes at least one
+        # real error, so this terminates
+        changed = True
+        while changed:
+            changed = False
+            for pass_perm, pass_block in reversed(done):
+                fixed, leaked = _correct_pass(sender, receiver, pass_perm, pass_block)
+                stats["errors_corrected"] += fixed
+                stats["leaked_bits"] += leaked
+                changed = changed or fixed > 0
+
+        block = min(2 * block, n)
+
+    return receiver, stats
+
+
+def binary_entropy(p: float) -> float:
+    if p <= 0 or p >= 1:
+        return 0.0
+    return -p * math.log2(p) - (1 - p) * math.log2(1 - p)
+
+
+def secure_key_length(n_sifted: int, qber: float, leaked_bits: int) -> int:
+    """
+    Bits that survive privacy amplification: n (1 - h(QBER)) minus the
+    parity bits disclosed during reconciliation.
+    """
+    return max(0, int(n_sifted * (1 - binary_entropy(qber))) - leaked_bits)
+
+
+# Toeplitz-hash privacy amplification
+#
+# A random m x n Toeplitz matrix over GF(2) is a universal hash family,
+# so y = T x compresses the n reconciled bits to m bits Eve knows
+# (almost) nothing about. T is fixed by a public seed of n + m - 1 bits,
+# T[i, j] = seed[i - j + n - 1], which makes T x one slice of the
+# convolution seed * x. Small products use np.convolve in "valid" mode,
+# which computes just those m outputs (n m operations, however long the
+# seed); large ones an FFT, so 10^6-bit keys cost O(n log n) instead of
+# O(n m).
+
+def _toeplitz_product(seed, bits, out_bits):
+    # (seed * bits)[n - 1 : n - 1 + out_bits] over the integers
+    n = len(bits)
+    if n * out_bits <= TOEPLITZ_DIRECT_MAX:
+        return np.convolve(seed.astype(np.int64), bits.astype(np.int64), mode="valid")
+
+    # A circular convolution of length >= len(seed) only wraps terms into
+    # indices below n - 1, so the slice we need is exact at half the
+    # size of the full linear convolution
+    nfft = 1 << (len(seed) - 1).bit_length()
+    spectrum = np.fft.rfft(seed, nfft) * np.fft.rfft(bits, nfft)
+    return np.rint(np.fft.irfft(spectrum, nfft)[n - 1:n - 1 + out_bits]).astype(np.int64)
+
+
+def toeplitz_hash(bits, out_bits: int, seed):
+    """
+    Returns T x mod 2 (uint8 bits) for the Toeplitz matrix given by seed
+    (n + out_bits - 1 bits).
+    """
+    bits = np.asarray(bits, dtype=np.uint8)
+    seed = np.asarray(seed, dtype=np.uint8)
+    n = len(bits)
+    if len(seed) != n + out_bits - 1:
+        raise ValueError("Toeplitz seed must be n + out_bits - 1 bits long.")
+    if out_bits == 0 or n == 0:
+        return np.zeros(out_bits, dtype=np.uint8)
+
+    return (_toeplitz_product(seed, bits, out_bits) & 1).astype(np.uint8)
+
+
+def privacy_amplify(bits, secure_bits: int, seed=None, rng=None):
+    """
+    Compresses the reconciled key bits to secure_bits // 8 bytes with a
+    Toeplitz hash. seed is the public seed (drawn from rng when None).
+    Returns (key bytes, seed).
+    """
+    out_bits = secure_bits - secure_bits % 8
+    if seed is None:
+        rng = np.random.default_rng() if rng is None else rng
+        seed_bits = max(len(bits) + out_bits - 1, 0)
+        seed = np.unpackbits(np.frombuffer(rng.bytes((seed_bits + 7) // 8), dtype=np.uint8), count=seed_bits)
+
+    key = np.packbits(toeplitz_hash(bits, out_bits, seed)).tobytes()
+    return key, seed
@@ -5,24 +5,23 @@ from utils.io_utils import read_file_bytes, write_file_bytes
 from utils.hashing import sha3_512
 
 # KEY EXCHANGE
-from key_exchange.qkd_simulator import run_qkd_key_exchange
-from key_exchange.pqc_kyber import generate_pqc_shared_secret
-from key_exchange.hybrid_key_derivation import derive_hybrid_key
+from key_exchange.key_pool import get_key_pool
 
 # CRYPTO CORE
-from crypto_core.file_encryptor import encrypt_file_bytes
-from crypto_core.file_packager import package_encrypted_file
-from crypto_core.file_decryptor import decrypt_packed_file
+from crypto_core.signed_encrypt import encrypt_and_sign_bytes
+from crypto_core.verified_decrypt import verify_and_decrypt_bytes
+from crypto_core.resumable import encrypt_file_resumable, decrypt_file_resumable, checkpoint_path
+from crypto_core.archive import create_archive, read_archive_manifest, ArchiveReader
 
 # SIGNATURES
-from pqc_signature.dilithium_sign import generate_sig_keypair, sign_file_bytes
-from pqc_signature.dilithium_verify import verify_file_signature
+from pqc_signature.dilithium_sign import generate_sig_keypair, sign_file_bytes, sign_file_path
+from pqc_signature.dilithium_verify import verify_file_signature, verify_file_path
 
 # AUDIT LOG
 from audit.audit_log import create_log_entry, append_log
 from audit.audit_signer import sign_log_entry
 
-def sender_encrypt_and_sign(input_file: str):
+def sender_encrypt_and_sign(input_file: str, compression: str = "none", aead: str = "aes-gcm"):
     print("\n=== SENDER SIDE ===")
 
     # Load file
@@ -30,42 +29,159 @@ def sender_encrypt_and_sign(input_file: str):
     file_size = len(plaintext)
     print(f"[+] Loaded file: {input_file} ({file_size} bytes)")
 
-    # QKD WITH QBER + EAVESDROPPER DETECTION
-    qkd_key, qber, compromised = run_qkd_key_exchange(eve=False)
-    print(f"[+] QKD QBER: {qber:.4f}")
-    print(f"[+] Channel Compromised? {compromised}")
+    # HYBRID KEY (QKD + PQC) — taken from the key pool, which only keeps
+    # keys from uncompromised QKD sessions (one-shot CLI: one key ahead)
+    pooled = get_key_pool(high_water=1).get()
+    hybrid_key = pooled.key
+    print(f"[+] QKD QBER: {pooled.qber:.4f}")
+    print(f"[+] Hybrid Key {pooled.key_id} taken from pool (QKD + PQC)")
 
-    if compromised:
-        raise ValueError("[!] QKD Channel compromised — Encryption aborted.")
+    # ENCRYPTION + PQC SIGNATURE in one pass: each sealed segment of the
+    # (v2) package is hashed for the signature as soon as it is produced
+    pk_sig, sk_sig = generate_sig_keypair()
+    packaged, signature = encrypt_and_sign_bytes(hybrid_key, plaintext, sk_sig,
+                                                 compression=compression, aead=aead)
+    print("[+] File Encrypted & Packaged")
+    print("[+] PQC Signature Created")
 
-    # PQC KEM (Kyber)
-    pqc_key, pk_kem, ct_kem = generate_pqc_shared_secret()
-    print("[+] PQC Shared Secret Generated")
+    # AUDIT LOG — MUST SIGN USING SAME KEYPAIR
+    entry = create_log_entry("FILE_ENCRYPTED", {
+        "filename": input_file,
+        "bytes": file_size,
+        "key_id": pooled.key_id
+    })
+    append_log(sign_log_entry(entry, sk_sig, pk_sig), sk_sig, pk_sig)
+    print("[+] Audit Log Entry Added")
 
-    # HYBRID KEY
-    hybrid_key = derive_hybrid_key(qkd_key, pqc_key)
-    print("[+] Hybrid Key Derived (QKD + PQC)")
+    # Everything receiver needs
+    return packaged, signature, pk_sig, sk_sig, hybrid_key
 
-    # ENCRYPTION
-    ciphertext, nonce, tag = encrypt_file_bytes(hybrid_key, plaintext)
-    packaged = package_encrypted_file(ciphertext, nonce, tag, file_size)
-    print("[+] File Encrypted & Packaged")
+def sender_encrypt_resumable(input_file: str, package_path: str, compression: str = "none",
+                             aead: str = "aes-gcm", key_path: str = "sender_hybrid_key.bin"):
+    """
+    File-to-file encryption that can be resumed after an interruption.
+    The hybrid key is saved before encryption starts, so a restarted run
+    reuses it instead of running a new key exchange.
+    """
+    print("\n=== SENDER SIDE (RESUMABLE) ===")
+
+    if os.path.exists(checkpoint_path(package_path)) and os.path.exists(key_path):
+        hybrid_key = read_file_bytes(key_path)
+        print(f"[+] Resuming from checkpoint {checkpoint_path(package_path)}")
+    else:
+        pooled = get_key_pool(high_water=1).get()
+        hybrid_key = pooled.key
+        write_file_bytes(key_path, hybrid_key)
+        print(f"[+] QKD QBER: {pooled.qber:.4f}")
+        print(f"[+] Hybrid Key {pooled.key_id} taken from pool (QKD + PQC)")
+
+    stats = encrypt_file_resumable(hybrid_key, input_file, package_path,
+                                   compression=compression, aead=aead)
+    print(f"[+] File Encrypted & Packaged ({stats['segments']} segments, "
+          f"resumed at segment {stats['resumed_from_segment']})")
 
-    # PQC SIGNATURE
     pk_sig, sk_sig = generate_sig_keypair()
-    signature = sign_file_bytes(packaged, sk_sig)
+    signature = sign_file_path(package_path, sk_sig)
     print("[+] PQC Signature Created")
 
-    # AUDIT LOG — MUST SIGN USING SAME KEYPAIR
     entry = create_log_entry("FILE_ENCRYPTED", {
         "filename": input_file,
-        "bytes": file_size
+        "bytes": stats["bytes"]
     })
     append_log(sign_log_entry(entry, sk_sig, pk_sig), sk_sig, pk_sig)
     print("[+] Audit Log Entry Added")
 
-    # Everything receiver needs
-    return packaged, signature, pk_sig, sk_sig, hybrid_key
+    return signature, pk_sig, sk_sig, hybrid_key
+
+def receiver_verify_and_decrypt_resumable(package_path: str, signature: bytes,
+                                          pk_sig: bytes, sk_sig: bytes,
+                                          hybrid_key: bytes, output_file: str):
+
+    print("\n=== RECEIVER SIDE (RESUMABLE) ===")
+
+    print("[*] Verifying PQC Signature...")
+    valid = verify_file_path(package_path, signature, pk_sig)
+    print(f"[+] Signature Valid: {valid}")
+
+    entry = create_log_entry("SIGNATURE_VERIFIED", {"valid": valid})
+    append_log(sign_log_entry(entry, sk_sig, pk_sig), sk_sig, pk_sig)
+
+    if not valid:
+        raise ValueError("[!] Signature verification failed — file rejected.")
+
+    print("[*] Decrypting File...")
+    stats = decrypt_file_resumable(hybrid_key, package_path, output_file)
+    print(f"[+] File decrypted successfully → {output_file} "
+          f"(resumed at segment {stats['resumed_from_segment']})")
+
+    entry2 = create_log_entry("FILE_DECRYPTED", {
+        "output": output_file,
+        "bytes": stats["bytes"]
+    })
+    append_log(sign_log_entry(entry2, sk_sig, pk_sig), sk_sig, pk_sig)
+
+    print("[+] Audit Log Updated")
+
+def sender_encrypt_directory(input_dir: str, archive_path: str):
+    """
+    Packs a whole directory into one archive: one key exchange, one
+    signature (over the archive manifest) and one audit entry.
+    """
+    print("\n=== SENDER SIDE (DIRECTORY) ===")
+
+    pooled = get_key_pool(high_water=1).get()
+    hybrid_key = pooled.key
+    print(f"[+] QKD QBER: {pooled.qber:.4f}")
+    print(f"[+] Hybrid Key {pooled.key_id} taken from pool (QKD + PQC)")
+
+    manifest = create_archive(hybrid_key, input_dir, archive_path)
+    with ArchiveReader(hybrid_key, archive_path) as archive:
+        count = len(archive.members)
+        total = sum(m["size"] for m in archive.members)
+    print(f"[+] Archived {count} files ({total} bytes) → {archive_path}")
+
+    # One signature covers every member through the manifest digests
+    pk_sig, sk_sig = generate_sig_keypair()
+    signature = sign_file_bytes(manifest, sk_sig)
+    print("[+] PQC Signature Created (manifest)")
+
+    entry = create_log_entry("DIRECTORY_ENCRYPTED", {
+        "directory": input_dir,
+        "files": count,
+        "bytes": total
+    })
+    append_log(sign_log_entry(entry, sk_sig, pk_sig), sk_sig, pk_sig)
+    print("[+] Audit Log Entry Added")
+
+    return signature, pk_sig, sk_sig, hybrid_key
+
+def receiver_verify_and_extract(archive_path: str, signature: bytes,
+                                pk_sig: bytes, sk_sig: bytes,
+                                hybrid_key: bytes, output_dir: str):
+
+    print("\n=== RECEIVER SIDE (DIRECTORY) ===")
+
+    print("[*] Verifying PQC Signature over archive manifest...")
+    valid = verify_file_signature(read_archive_manifest(archive_path), signature, pk_sig)
+    print(f"[+] Signature Valid: {valid}")
+
+    entry = create_log_entry("SIGNATURE_VERIFIED", {"valid": valid})
+    append_log(sign_log_entry(entry, sk_sig, pk_sig), sk_sig, pk_sig)
+
+    if not valid:
+        raise ValueError("[!] Signature verification failed — archive rejected.")
+
+    with ArchiveReader(hybrid_key, archive_path) as archive:
+        written = archive.extract_all(output_dir)
+    print(f"[+] Extracted {len(written)} files → {output_dir}")
+
+    entry2 = create_log_entry("DIRECTORY_DECRYPTED", {
+        "output": output_dir,
+        "files": len(written)
+    })
+    append_log(sign_log_entry(entry2, sk_sig, pk_sig), sk_sig, pk_sig)
+
+    print("[+] Audit Log Updated")
 
 def receiver_verify_and_decrypt(packed_bytes: bytes, signature: bytes,
                                 pk_sig: bytes, sk_sig: bytes,
@@ -73,9 +189,10 @@ def receiver_verify_and_decrypt(packed_bytes: bytes, signature: bytes,
 
     print("\n=== RECEIVER SIDE ===")
 
-    # SIGNATURE VERIFICATION
-    print("[*] Verifying PQC Signature...")
-    valid = verify_file_signature(packed_bytes, signature, pk_sig)
+    # SIGNATURE VERIFICATION + DECRYPTION (one pass over the package;
+    # the output only appears once the signature and tags check out)
+    print("[*] Verifying PQC Signature & Decrypting File...")
+    valid, written = verify_and_decrypt_bytes(hybrid_key, packed_bytes, signature, pk_sig, output_file)
     print(f"[+] Signature Valid: {valid}")
 
     entry = create_log_entry("SIGNATURE_VERIFIED", {"valid": valid})
@@ -84,16 +201,12 @@ def receiver_verify_and_decrypt(packed_bytes: bytes, signature: bytes,
     if not valid:
         raise ValueError("[!] Signature verification failed — file rejected.")
 
-    # DECRYPTION
-    print("[*] Decrypting File...")
-    plaintext = decrypt_packed_file(hybrid_key, packed_bytes)
-    write_file_bytes(output_file, plaintext)
     print(f"[+] File decrypted successfully → {output_file}")
 
     # AUDIT LOG
     entry2 = create_log_entry("FILE_DECRYPTED", {
         "output": output_file,
-        "bytes": len(plaintext)
+        "bytes": written
     })
     append_log(sign_log_entry(entry2, sk_sig, pk_sig), sk_sig, pk_sig)
 
@@ -104,13 +217,37 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="QuantaCrypt — Hybrid QKD + PQC Encryption System")
     parser.add_argument("--encrypt", type=str, help="Encrypt and sign this file")
-    parser.add_argument("--decrypt", type=str, help="Decrypt using stored ciphertext")
+    parser.add_argument("--decrypt", nargs="?", const=True, help="Decrypt using stored ciphertext")
     parser.add_argument("--out", type=str, default="decrypted_output.bin", help="Output file for decrypted data")
+    parser.add_argument("--compress", type=str, default="none", choices=["none", "auto", "zlib", "lzma"],
+                        help="Compress before encrypting (auto skips incompressible data)")
+    parser.add_argument("--aead", type=str, default="aes-gcm",
+                        choices=["aes-gcm", "chacha20-poly1305", "aes-gcm-siv", "auto"],
+                        help="AEAD cipher (auto benchmarks this host once and caches the choice)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Checkpointed file-to-file job (segmented format); rerun the same command to resume")
+    parser.add_argument("--encrypt-dir", type=str, help="Encrypt and sign every file in this directory as one archive")
+    parser.add_argument("--decrypt-dir", action="store_true", help="Verify and extract the stored archive into --out")
 
     args = parser.parse_args()
 
-    if args.encrypt:
-        packaged, signature, pk_sig, sk_sig, hybrid_key = sender_encrypt_and_sign(args.encrypt)
+    if args.encrypt and args.resume:
+        signature, pk_sig, sk_sig, hybrid_key = sender_encrypt_resumable(args.encrypt, "cipher_package.bin",
+                                                                         args.compress, args.aead)
+
+        write_file_bytes("cipher_signature.bin", signature)
+        write_file_bytes("sender_pk_sig.bin", pk_sig)
+        write_file_bytes("sender_sk_sig.bin", sk_sig)
+
+        print("\n[+] Encryption complete. Files saved:")
+        print("- cipher_package.bin")
+        print("- cipher_signature.bin")
+        print("- sender_pk_sig.bin")
+        print("- sender_sk_sig.bin")
+        print("- sender_hybrid_key.bin")
+
+    elif args.encrypt:
+        packaged, signature, pk_sig, sk_sig, hybrid_key = sender_encrypt_and_sign(args.encrypt, args.compress, args.aead)
 
         # Save artifacts
         write_file_bytes("cipher_package.bin", packaged)
@@ -126,6 +263,38 @@ if __name__ == "__main__":
         print("- sender_sk_sig.bin")
         print("- sender_hybrid_key.bin")
 
+    elif args.encrypt_dir:
+        signature, pk_sig, sk_sig, hybrid_key = sender_encrypt_directory(args.encrypt_dir, "cipher_archive.bin")
+
+        write_file_bytes("cipher_signature.bin", signature)
+        write_file_bytes("sender_pk_sig.bin", pk_sig)
+        write_file_bytes("sender_sk_sig.bin", sk_sig)
+        write_file_bytes("sender_hybrid_key.bin", hybrid_key)
+
+        print("\n[+] Encryption complete. Files saved:")
+        print("- cipher_archive.bin")
+        print("- cipher_signature.bin")
+        print("- sender_pk_sig.bin")
+        print("- sender_sk_sig.bin")
+        print("- sender_hybrid_key.bin")
+
+    elif args.decrypt_dir:
+        signature = read_file_bytes("cipher_signature.bin")
+        pk_sig = read_file_bytes("sender_pk_sig.bin")
+        sk_sig = read_file_bytes("sender_sk_sig.bin")
+        hybrid_key = read_file_bytes("sender_hybrid_key.bin")
+
+        output_dir = args.out if args.out != "decrypted_output.bin" else "decrypted_output"
+        receiver_verify_and_extract("cipher_archive.bin", signature, pk_sig, sk_sig, hybrid_key, output_dir)
+
+    elif args.decrypt and args.resume:
+        signature = read_file_bytes("cipher_signature.bin")
+        pk_sig = read_file_bytes("sender_pk_sig.bin")
+        sk_sig = read_file_bytes("sender_sk_sig.bin")
+        hybrid_key = read_file_bytes("sender_hybrid_key.bin")
+
+        receiver_verify_and_decrypt_resumable("cipher_package.bin", signature, pk_sig, sk_sig, hybrid_key, args.out)
+
     elif args.decrypt:
         packaged = read_file_bytes("cipher_package.bin")
         signature = read_file_bytes("cipher_signature.bin")
@@ -138,4 +307,10 @@ if __name__ == "__main__":
     else:
         print("Usage:")
         print("  python main.py --encrypt myfile.pdf")
+        print("  python main.py --encrypt server.log --compress auto")
+        print("  python main.py --encrypt myfile.pdf --aead auto")
+        print("  python main.py --encrypt big.iso --resume      (rerun to resume)")
+        print("  python main.py --decrypt --resume --out big.iso")
         print("  python main.py --decrypt --out result.pdf")
+        print("  python main.py --encrypt-dir ./documents")
+        print("  python main.py --decrypt-dir --out ./restored")
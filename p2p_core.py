@@ -52,7 +52,7 @@ def receive_once(port, output_name="received_file"):
     package = open("tmp_cipher_package.bin", "rb").read()
 
     # 4. Decrypt (re-run QKD + PQC to derive hybrid key)
-    qkd_key, _, comp = run_qkd_key_exchange(256)
+    qkd_key, _, comp = run_qkd_key_exchange()
     pqc_key, _, _ = generate_pqc_shared_secret()
     hybrid_key = derive_hybrid_key(qkd_key, pqc_key)
 
@@ -65,7 +65,7 @@ def receive_once(port, output_name="received_file"):
 
 def send_once(sender_port, receiver_ip, receiver_port, filepath):
     # Reconstruct key path
-    qkd_key, qber, comp = run_qkd_key_exchange(256)
+    qkd_key, qber, comp = run_qkd_key_exchange()
     pqc_key, pk_list, ct_list = generate_pqc_shared_secret()
     hybrid_key = derive_hybrid_key(qkd_key, pqc_key)
 
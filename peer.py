@@ -8,15 +8,14 @@ import threading
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # === IMPORT EXISTING QUANTACRYPT MODULES ===
-from utils.io_utils import read_file_bytes, write_file_bytes
+from utils.io_utils import write_file_bytes
 from key_exchange.qkd_simulator import run_qkd_key_exchange
 from key_exchange.pqc_kyber import generate_pqc_shared_secret
 from key_exchange.hybrid_key_derivation import derive_hybrid_key
-from crypto_core.file_encryptor import encrypt_file_bytes
-from crypto_core.file_packager import package_encrypted_file
-from crypto_core.file_decryptor import decrypt_packed_file
-from pqc_signature.dilithium_sign import generate_sig_keypair, sign_file_bytes
-from pqc_signature.dilithium_verify import verify_file_signature
+from key_exchange.key_pool import get_key_pool
+from crypto_core.signed_encrypt import encrypt_and_sign_file
+from crypto_core.verified_decrypt import verify_and_decrypt_file
+from pqc_signature.dilithium_sign import generate_sig_keypair
 from audit.audit_log import create_log_entry, append_log
 from audit.audit_signer import sign_log_entry
 from audit.pychain_anchor import anchor_to_blockchain
@@ -69,6 +68,27 @@ def recv_file(conn):
 
     return filename, bytes(data)
 
+# Streams a file part straight to disk instead of buffering it
+def recv_file_to(conn, path):
+    header = recv_json(conn)
+    filename = header["filename"]
+    size = header["size"]
+
+    print(f"[P2P] Receiving {filename} ({size} bytes) → {path}")
+
+    remaining = size
+    buf = memoryview(bytearray(64 * 1024))
+
+    with open(path, "wb") as f:
+        while remaining > 0:
+            n = conn.recv_into(buf, min(len(buf), remaining))
+            if not n:
+                raise ConnectionError(f"Connection closed with {remaining} of {size} bytes of {filename} left.")
+            f.write(buf[:n])
+            remaining -= n
+
+    return filename
+
 def listener():
     srv = socket.socket()
     srv.bind(("0.0.0.0", PORT))
@@ -92,14 +112,13 @@ def receive_secure_file(conn):
     print(f"[P2P] Incoming secure file: {filename}")
 
     # === Receive all artifacts (same as client.py) ===
-    _, package = recv_file(conn)
+    recv_file_to(conn, "cipher_package.bin")
     _, signature = recv_file(conn)
     _, pk_sig = recv_file(conn)
     _, sk_sig = recv_file(conn)
     _, hybrid_key = recv_file(conn)
 
     # Save raw artifacts
-    write_file_bytes("cipher_package.bin", package)
     write_file_bytes("cipher_signature.bin", signature)
     write_file_bytes("sender_pk_sig.bin", pk_sig)
     write_file_bytes("sender_sk_sig.bin", sk_sig)
@@ -118,18 +137,14 @@ def receive_secure_file(conn):
     pqc_key, _, _ = generate_pqc_shared_secret()
     _ = derive_hybrid_key(qkd_key, pqc_key)
 
-    # Verify signature
-    valid = verify_file_signature(package, signature, pk_sig)
+    # Verify signature + decrypt using Hybrid key, in one pass
+    out_path = "decrypted_" + filename
+    valid, _ = verify_and_decrypt_file(hybrid_key, "cipher_package.bin", signature, pk_sig, out_path)
     print(f"[P2P] Signature valid: {valid}")
     if not valid:
         print("[P2P] Invalid signature. ABORT.")
         return
 
-    # Decrypt using Hybrid key
-    out = decrypt_packed_file(hybrid_key, package)
-    out_path = "decrypted_" + filename
-    write_file_bytes(out_path, out)
-
     print(f"[P2P] File decrypted → {out_path}")
 
     # Audit
@@ -144,29 +159,19 @@ def send_secure(peer_ip, peer_port, filepath):
     print(f"[P2P] Connected to {peer_ip}:{peer_port}")
 
     filename = os.path.basename(filepath)
-    plaintext = read_file_bytes(filepath)
 
-    # === QKD ===
-    qkd_key, qber, compromised = run_qkd_key_exchange()
-    print(f"[QKD] QBER={qber}, compromised={compromised}")
-    if compromised:
+    # === QKD + Kyber + Hybrid (pre-generated by the key pool) ===
+    try:
+        pooled = get_key_pool().get()
+    except ValueError:
         print("[ABORT] QKD compromised.")
         return
+    hybrid_key = pooled.key
+    print(f"[QKD] QBER={pooled.qber}, key={pooled.key_id}")
 
-    # === Kyber ===
-    pqc_key, pk_list, ct_list = generate_pqc_shared_secret()
-
-    # === Hybrid ===
-    hybrid_key = derive_hybrid_key(qkd_key, pqc_key)
-
-    # === Encrypt ===
-    ciphertext, nonce, tag = encrypt_file_bytes(hybrid_key, plaintext)
-    packaged = package_encrypted_file(ciphertext, nonce, tag, len(plaintext))
-    write_file_bytes("cipher_package.bin", packaged)
-
-    # === Signature ===
+    # === Encrypt + Signature (one streaming pass, file to file) ===
     pk_sig, sk_sig = generate_sig_keypair()
-    signature = sign_file_bytes(packaged, sk_sig)
+    signature, _ = encrypt_and_sign_file(hybrid_key, filepath, "cipher_package.bin", sk_sig)
 
     write_file_bytes("cipher_signature.bin", signature)
     write_file_bytes("sender_pk_sig.bin", pk_sig)
@@ -193,6 +198,7 @@ def send_secure(peer_ip, peer_port, filepath):
 
 if __name__ == "__main__":
     threading.Thread(target=listener, daemon=True).start()
+    get_key_pool()      # pre-generate hybrid keys in the background
 
     while True:
         print("\n1) Send File")
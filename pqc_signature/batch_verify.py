@@ -0,0 +1,248 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from utils.constants import VERIFY_CACHE_SIZE
+from utils.io_utils import iter_file_chunks
+from .dilithium_verify import Verifier
+
+# Batch verification of (package, signature, pk) triples
+#
+# package is either the package bytes or a path to the package file.
+# Results are cached by (SHA-256 of the package, pk): a package that has
+# already been verified under the same key and signature is answered
+# without running the signature check. The digest is computed by the
+# worker alongside the check, never in the submitting thread; SHA-256 is
+# used because it only names the package in memory and costs a fraction
+# of the SHA3-512 signature check on a cold batch. For paths
+# the digest is also remembered per file identity (path, size, mtime,
+# inode), so re-checking an unchanged file costs one stat() and no job.
+# With thread pools, bytes are looked up in the cache by the worker
+# itself. Process workers do not share the cache, so there the submitting
+# side hashes bytes and answers repeats before pickling anything.
+
+
+class VerificationCache:
+    """
+    Bounded LRU of (digest, pk) -> (signature, valid). Safe to share
+    between threads.
+    """
+
+    def __init__(self, maxsize: int = VERIFY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes, pk: bytes, signature: bytes):
+        # Returns the cached result, or None when this exact triple is unknown
+        with self._lock:
+            entry = self._entries.get((digest, pk))
+            if entry is None or not hmac.compare_digest(entry[0], signature):
+                self.misses += 1
+                return None
+            self._entries.move_to_end((digest, pk))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, digest: bytes, pk: bytes, signature: bytes, valid: bool):
+        with self._lock:
+            self._entries[(digest, pk)] = (bytes(signature), valid)
+            self._entries.move_to_end((digest, pk))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def package_digest(data) -> bytes:
+    return hashlib.sha256(data).digest()
+
+def _file_identity(path: str):
+    st = os.stat(path)
+    return os.path.realpath(path), st.st_size, st.st_mtime_ns, st.st_ino
+
+
+# Worker side (module level so process pools can pickle the jobs).
+# Jobs return (valid, digest, answered from cache).
+
+def _verify_bytes_job(package: bytes, signature: bytes, pk: bytes, cache: VerificationCache = None,
+                      digest: bytes = None):
+    if digest is None:
+        digest = package_digest(package)
+    if cache is not None:
+        cached = cache.get(digest, pk, signature)
+        if cached is not None:
+            return cached, digest, True
+    return Verifier(pk).update(package).finalize(signature), digest, False
+
+def _verify_path_job(path: str, signature: bytes, pk: bytes, chunk_size: int):
+    # One read feeds both the signature check and the cache digest
+    verifier = Verifier(pk)
+    digest = hashlib.sha256()
+    for chunk in iter_file_chunks(path, chunk_size):
+        verifier.update(chunk)
+        digest.update(chunk)
+    return verifier.finalize(signature), digest.digest(), False
+
+def _is_path(package) -> bool:
+    return isinstance(package, (str, os.PathLike))
+
+
+class BatchVerifier:
+    """
+    Verifies many (package, signature, pk) triples on a pool of workers.
+
+    workers      -> pool size (default: os.cpu_count())
+    executor     -> "process", "thread", or None to pick from the first
+                    item: threads for bytes (no pickling, and hashlib
+                    releases the GIL), processes for paths
+    max_inflight -> jobs queued at once (default: 4 * workers)
+    cache        -> VerificationCache to consult and fill (shared between
+                    batches; default: a new one of VERIFY_CACHE_SIZE)
+    """
+
+    def __init__(self, workers: int = None, executor: str = None, max_inflight: int = None,
+                 cache: VerificationCache = None, chunk_size: int = 1024 * 1024):
+        if executor not in (None, "thread", "process"):
+            raise ValueError("executor must be 'thread', 'process' or None.")
+
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.max_inflight = max_inflight or 4 * self.workers
+        self.cache = cache if cache is not None else VerificationCache()
+        self.chunk_size = chunk_size
+        self._file_digests = OrderedDict()
+        self.stats = {}
+
+    def _make_pool(self, executor: str):
+        if executor == "process":
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="qc-verify")
+
+    def _lookup(self, package, signature: bytes, pk: bytes, executor: str):
+        """
+        Returns (cached result or None, file identity or None, digest or
+        None). Bytes are only hashed here for process pools; thread
+        workers hash and look them up themselves.
+        """
+        if not _is_path(package):
+            if executor != "process":
+                return None, None, None
+            digest = package_digest(package)
+            return self.cache.get(digest, pk, signature), None, digest
+
+        identity = _file_identity(package)
+        digest = self._file_digests.get(identity)
+        if digest is None:
+            return None, identity, None
+        return self.cache.get(digest, pk, signature), identity, digest
+
+    def _remember(self, identity, digest: bytes, signature: bytes, pk: bytes, valid: bool):
+        if identity is not None:
+            self._file_digests[identity] = digest
+            self._file_digests.move_to_end(identity)
+            while len(self._file_digests) > self.cache.maxsize:
+                self._file_digests.popitem(last=False)
+        self.cache.put(digest, pk, signature, valid)
+
+    def iter_verify(self, items, ordered: bool = True):
+        """
+        Yields (index, valid) for each triple in items. With ordered=True
+        results come back in input order, otherwise as soon as they finish.
+        self.stats is filled in once the generator is exhausted.
+        """
+        t0 = time.perf_counter()
+        total = hits = dispatched = 0
+        executor = self.executor
+        pool = None
+
+        try:
+            pending = deque()    # (index, future or None, cached, identity, signature, pk)
+
+            def submit(index, package, signature, pk):
+                nonlocal total, hits, dispatched, executor, pool
+                total += 1
+                executor = executor or ("process" if _is_path(package) else "thread")
+                cached, identity, digest = self._lookup(package, signature, pk, executor)
+                if cached is not None:
+                    hits += 1
+                    pending.append((index, None, cached, identity, signature, pk))
+                    return
+
+                if pool is None:
+                    pool = self._make_pool(executor)
+
+                dispatched += 1
+                if identity is not None:
+                    future = pool.submit(_verify_path_job, os.fspath(package), signature, pk, self.chunk_size)
+                elif executor == "thread":
+                    future = pool.submit(_verify_bytes_job, package, signature, pk, self.cache)
+                else:
+                    future = pool.submit(_verify_bytes_job, package, signature, pk, None, digest)
+                pending.append((index, future, None, identity, signature, pk))
+
+            def finish(entry):
+                nonlocal hits
+                index, future, cached, identity, signature, pk = entry
+                if future is None:
+                    return index, cached
+                valid, digest, from_cache = future.result()
+                if from_cache:
+                    hits += 1
+                self._remember(identity, digest, signature, pk, valid)
+                return index, valid
+
+            def drain():
+                if ordered:
+                    return finish(pending.popleft())
+                while True:
+                    for entry in pending:
+                        if entry[1] is None or entry[1].done():
+                            pending.remove(entry)
+                            return finish(entry)
+                    wait([e[1] for e in pending], return_when=FIRST_COMPLETED)
+
+            for index, (package, signature, pk) in enumerate(items):
+                submit(index, package, signature, pk)
+                while len(pending) >= self.max_inflight:
+                    yield drain()
+            while pending:
+                yield drain()
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+        wall = time.perf_counter() - t0
+        self.stats = {
+            "workers": self.workers,
+            "executor": executor,
+            "verified": total,
+            "cache_hits": hits,
+            "dispatched": dispatched,
+            "wall_time_s": wall,
+            "verifications_per_s": (total / wall) if wall else 0.0,
+        }
+
+    def verify_all(self, items):
+        """
+        Returns a list of bools, one per triple, in input order.
+        """
+        return [valid for _, valid in self.iter_verify(items, ordered=True)]
+
+
+def verify_batch(items, workers: int = None, executor: str = None, cache: VerificationCache = None):
+    return BatchVerifier(workers, executor, cache=cache).verify_all(items)
@@ -5,6 +5,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import secrets
 import hashlib
 
+from utils.io_utils import iter_file_chunks
+
 # Generate keypair
 # sk = random 32 bytes
 # pk = SHA3-256(sk)
@@ -29,3 +31,50 @@ def sign_message(message: bytes, sk: bytes):
 # Helper wrapper: sign packed encrypted file
 def sign_file_bytes(file_bytes: bytes, sk: bytes):
     return sign_message(file_bytes, sk)
+
+
+# Incremental signing (same signatures as sign_message)
+#
+#   signer = Signer(sk)
+#   signer.update(chunk) ...
+#   sig = signer.finalize()
+#
+# pk = SHA3-256(sk) and the pk-prefixed hash state are computed once per
+# Signer, so signing many messages with one key does not redo them.
+class Signer:
+    def __init__(self, sk: bytes):
+        self.pk = hashlib.sha3_256(sk).digest()
+        self._prefix = hashlib.sha3_512()
+        self._prefix.update(self.pk)
+        self._h = self._prefix.copy()
+
+    def update(self, data):
+        self._h.update(data)
+        return self
+
+    def finalize(self) -> bytes:
+        # Returns the signature and resets for the next message
+        sig = self._h.digest()
+        self._h = self._prefix.copy()
+        return sig
+
+    def sign(self, message: bytes) -> bytes:
+        # One-shot signing that leaves any update() in progress untouched
+        h = self._prefix.copy()
+        h.update(message)
+        return h.digest()
+
+
+# Sign a file without loading it (one reusable read buffer)
+def sign_file_path(path: str, sk: bytes, chunk_size: int = 1024 * 1024):
+    signer = Signer(sk)
+    for chunk in iter_file_chunks(path, chunk_size):
+        signer.update(chunk)
+    return signer.finalize()
+
+# Sign a message given as an iterable of byte chunks
+def sign_iterable(chunks, sk: bytes):
+    signer = Signer(sk)
+    for chunk in chunks:
+        signer.update(chunk)
+    return signer.finalize()
@@ -2,6 +2,9 @@ import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import hashlib
+import hmac
+
+from utils.io_utils import iter_file_chunks
 
 # Verify signature:
 #   expected = SHA3-512(pk || message)
@@ -16,3 +19,47 @@ def verify_signature(message: bytes, signature: bytes, pk: bytes) -> bool:
 
 def verify_file_signature(file_bytes: bytes, signature: bytes, pk: bytes):
     return verify_signature(file_bytes, signature, pk)
+
+# Incremental verification (same result as verify_signature)
+#
+#   verifier = Verifier(pk)
+#   verifier.update(chunk) ...
+#   ok = verifier.finalize(signature)
+#
+# The pk-prefixed hash state is computed once per Verifier.
+class Verifier:
+    def __init__(self, pk: bytes):
+        self.pk = pk
+        self._prefix = hashlib.sha3_512()
+        self._prefix.update(pk)
+        self._h = self._prefix.copy()
+
+    def update(self, data):
+        self._h.update(data)
+        return self
+
+    def finalize(self, signature: bytes) -> bool:
+        # Checks the signature and resets for the next message
+        expected = self._h.digest()
+        self._h = self._prefix.copy()
+        return hmac.compare_digest(expected, signature)
+
+    def verify(self, message: bytes, signature: bytes) -> bool:
+        h = self._prefix.copy()
+        h.update(message)
+        return hmac.compare_digest(h.digest(), signature)
+
+
+# Verify a file without loading it (one reusable read buffer)
+def verify_file_path(path: str, signature: bytes, pk: bytes, chunk_size: int = 1024 * 1024) -> bool:
+    verifier = Verifier(pk)
+    for chunk in iter_file_chunks(path, chunk_size):
+        verifier.update(chunk)
+    return verifier.finalize(signature)
+
+# Verify a message given as an iterable of byte chunks
+def verify_iterable(chunks, signature: bytes, pk: bytes) -> bool:
+    verifier = Verifier(pk)
+    for chunk in chunks:
+        verifier.update(chunk)
+    return verifier.finalize(signature)
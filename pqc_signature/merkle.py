@@ -0,0 +1,196 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.constants import MERKLE_MAGIC, MERKLE_CHUNK_SIZE
+from utils.io_utils import ensure_file_exists, pack_uint32, pack_uint64
+from .dilithium_sign import sign_message
+from .dilithium_verify import verify_signature
+
+# Merkle-tree signature mode
+#
+#   leaf  = SHA3-256(0x00 || chunk)
+#   node  = SHA3-256(0x01 || left || right)     (an odd last node moves up as is)
+#   sig   = sign_message(MERKLE_MAGIC || chunk_size || total_size || root, sk)
+#
+# Leaves are independent, so they are hashed on a thread pool (hashlib
+# releases the GIL on large inputs), and any single chunk can be checked
+# against the signed root with an O(log n) proof.
+
+def leaf_hash(chunk) -> bytes:
+    h = hashlib.sha3_256(b"\x00")
+    h.update(chunk)
+    return h.digest()
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha3_256(b"\x01" + left + right).digest()
+
+def leaf_count(total_size: int, chunk_size: int) -> int:
+    # Empty input still has one (empty) leaf
+    return max(1, -(-total_size // chunk_size))
+
+
+# Leaf hashing
+
+def hash_leaves_bytes(data, chunk_size: int = MERKLE_CHUNK_SIZE, workers: int = 1):
+    view = memoryview(data).cast("B")
+    chunks = [view[i * chunk_size:(i + 1) * chunk_size] for i in range(leaf_count(len(view), chunk_size))]
+
+    if workers <= 1:
+        return [leaf_hash(c) for c in chunks]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(leaf_hash, chunks))
+
+def hash_leaves_file(path: str, chunk_size: int = MERKLE_CHUNK_SIZE, workers: int = 1):
+    """
+    Hashes the chunks of a file with positional reads, so workers never
+    share a file offset and only `workers` chunks are in memory at once.
+    """
+    ensure_file_exists(path)
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        total = os.fstat(fd).st_size
+        count = leaf_count(total, chunk_size)
+
+        def hash_chunk(i):
+            return leaf_hash(os.pread(fd, chunk_size, i * chunk_size))
+
+        if workers <= 1:
+            leaves = [hash_chunk(i) for i in range(count)]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                leaves = list(pool.map(hash_chunk, range(count)))
+    finally:
+        os.close(fd)
+
+    return leaves, total
+
+
+# Tree
+
+class MerkleTree:
+    """
+    All levels of the tree, leaves first. Built from leaf hashes.
+    """
+
+    def __init__(self, leaves, total_size: int, chunk_size: int = MERKLE_CHUNK_SIZE):
+        if len(leaves) != leaf_count(total_size, chunk_size):
+            raise ValueError("Leaf count does not match the size and chunk size.")
+
+        self.total_size = total_size
+        self.chunk_size = chunk_size
+        self.levels = [list(leaves)]
+
+        level = self.levels[0]
+        while len(level) > 1:
+            nxt = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                nxt.append(level[-1])
+            self.levels.append(nxt)
+            level = nxt
+
+    @property
+    def root(self) -> bytes:
+        return self.levels[-1][0]
+
+    def root_message(self) -> bytes:
+        return merkle_root_message(self.root, self.total_size, self.chunk_size)
+
+    def proof(self, index: int):
+        """
+        Sibling hashes from the leaf up to the root (promoted levels skipped).
+        """
+        if not 0 <= index < len(self.levels[0]):
+            raise IndexError("Chunk index out of range.")
+
+        path = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                path.append(level[sibling])
+            index //= 2
+        return path
+
+
+def merkle_root_message(root: bytes, total_size: int, chunk_size: int) -> bytes:
+    # Binding the geometry stops a proof being replayed against another layout
+    return MERKLE_MAGIC + pack_uint32(chunk_size) + pack_uint64(total_size) + root
+
+def root_from_proof(chunk, index: int, proof, total_size: int, chunk_size: int = MERKLE_CHUNK_SIZE) -> bytes:
+    """
+    Recomputes the root implied by one chunk and its proof.
+    """
+    n = leaf_count(total_size, chunk_size)
+    if not 0 <= index < n:
+        raise ValueError("Chunk index out of range.")
+
+    expected = min(chunk_size, total_size - index * chunk_size) if total_size else 0
+    if len(chunk) != expected:
+        raise ValueError("Chunk length does not match its position.")
+
+    h = leaf_hash(chunk)
+    proof = list(proof)
+    used = 0
+
+    while n > 1:
+        if index % 2:
+            h = node_hash(proof[used], h)
+            used += 1
+        elif index + 1 < n:
+            h = node_hash(h, proof[used])
+            used += 1
+        index //= 2
+        n = (n + 1) // 2
+
+    if used != len(proof):
+        raise ValueError("Proof has the wrong length.")
+    return h
+
+
+# Sign / verify
+
+def merkle_sign_bytes(data, sk: bytes, chunk_size: int = MERKLE_CHUNK_SIZE, workers: int = 1):
+    """
+    Returns (signature, MerkleTree).
+    """
+    view = memoryview(data).cast("B")
+    tree = MerkleTree(hash_leaves_bytes(view, chunk_size, workers), len(view), chunk_size)
+    return sign_message(tree.root_message(), sk), tree
+
+def merkle_sign_file(path: str, sk: bytes, chunk_size: int = MERKLE_CHUNK_SIZE, workers: int = 1):
+    """
+    Returns (signature, MerkleTree).
+    """
+    leaves, total = hash_leaves_file(path, chunk_size, workers)
+    tree = MerkleTree(leaves, total, chunk_size)
+    return sign_message(tree.root_message(), sk), tree
+
+def merkle_verify_root(root: bytes, total_size: int, chunk_size: int, signature: bytes, pk: bytes) -> bool:
+    return verify_signature(merkle_root_message(root, total_size, chunk_size), signature, pk)
+
+def merkle_verify_bytes(data, signature: bytes, pk: bytes,
+                        chunk_size: int = MERKLE_CHUNK_SIZE, workers: int = 1) -> bool:
+    view = memoryview(data).cast("B")
+    tree = MerkleTree(hash_leaves_bytes(view, chunk_size, workers), len(view), chunk_size)
+    return merkle_verify_root(tree.root, len(view), chunk_size, signature, pk)
+
+def merkle_verify_file(path: str, signature: bytes, pk: bytes,
+                       chunk_size: int = MERKLE_CHUNK_SIZE, workers: int = 1) -> bool:
+    leaves, total = hash_leaves_file(path, chunk_size, workers)
+    tree = MerkleTree(leaves, total, chunk_size)
+    return merkle_verify_root(tree.root, total, chunk_size, signature, pk)
+
+def merkle_verify_chunk(chunk, index: int, proof, root: bytes, total_size: int,
+                        signature: bytes, pk: bytes, chunk_size: int = MERKLE_CHUNK_SIZE) -> bool:
+    """
+    Checks one chunk (e.g. for a range read or a resumed transfer) against
+    the signed root without the rest of the file.
+    """
+    try:
+        implied = root_from_proof(chunk, index, proof, total_size, chunk_size)
+    except (ValueError, IndexError):
+        return False
+    return implied == root and merkle_verify_root(root, total_size, chunk_size, signature, pk)
@@ -6,15 +6,12 @@ import time
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from utils.io_utils import read_file_bytes, write_file_bytes
-from key_exchange.qkd_simulator import run_qkd_key_exchange
-from key_exchange.pqc_kyber import generate_pqc_shared_secret
-from key_exchange.hybrid_key_derivation import derive_hybrid_key
+from utils.io_utils import write_file_bytes
+from key_exchange.key_pool import get_key_pool
 
-from crypto_core.file_encryptor import encrypt_file_bytes
-from crypto_core.file_packager import package_encrypted_file
+from crypto_core.signed_encrypt import encrypt_and_sign_file
 
-from pqc_signature.dilithium_sign import generate_sig_keypair, sign_file_bytes
+from pqc_signature.dilithium_sign import generate_sig_keypair
 
 from audit.audit_log import create_log_entry, append_log
 from audit.audit_signer import sign_log_entry
@@ -23,6 +20,14 @@ from audit.pychain_anchor import anchor_to_blockchain
 HOST = "0.0.0.0"
 PORT = 7000
 
+# Set to "auto" to compress text, logs and CSV (incompressible files are
+# detected and stored raw)
+COMPRESSION = "none"
+
+# Set to "auto" to use the fastest AEAD on this host (benchmarked once,
+# cached); clients follow the header either way
+AEAD = "aes-gcm"
+
 def send_json(conn, obj):
     conn.sendall((json.dumps(obj) + "\n").encode())
 
@@ -46,6 +51,9 @@ def start_server():
     print("         QuantaCrypt SECURE SERVER (SENDER)")
     print("=====================================================")
 
+    # Start filling the key pool while waiting for the client
+    key_pool = get_key_pool()
+
     srv = socket.socket()
     srv.bind((HOST, PORT))
     srv.listen(1)
@@ -67,33 +75,23 @@ def start_server():
             continue
 
         filename = os.path.basename(filepath)
-        plaintext = read_file_bytes(filepath)
-        fsize = len(plaintext)
+        fsize = os.path.getsize(filepath)
 
         print("\n========== QUANTACRYPT ENCRYPTION ==========")
 
-        # ----- QKD -----
-        qkd_key, qber, compromised = run_qkd_key_exchange(eve=False)
-        print(f"[QKD] QBER={qber:.4f}, compromised={compromised}")
-        if compromised:
+        # ----- QKD + KYBER + HYBRID (pre-generated by the key pool) -----
+        try:
+            pooled = key_pool.get()
+        except ValueError:
             print("[ABORT] Quantum channel compromised.")
             continue
+        hybrid_key = pooled.key
+        print(f"[QKD] QBER={pooled.qber:.4f}, key={pooled.key_id}, pool={key_pool.stats()}")
 
-        # ----- KYBER -----
-        pqc_key, pk_list, ct_list = generate_pqc_shared_secret()
-
-        # ----- HYBRID -----
-        hybrid_key = derive_hybrid_key(qkd_key, pqc_key)
-
-        # ----- AES ENCRYPT -----
-        ciphertext, nonce, tag = encrypt_file_bytes(hybrid_key, plaintext)
-        packaged = package_encrypted_file(ciphertext, nonce, tag, fsize)
-
-        write_file_bytes("cipher_package.bin", packaged)
-
-        # ----- SIGNATURE -----
+        # ----- AES ENCRYPT + SIGNATURE (one streaming pass, file to file) -----
         pk_sig, sk_sig = generate_sig_keypair()
-        signature = sign_file_bytes(packaged, sk_sig)
+        signature, _ = encrypt_and_sign_file(hybrid_key, filepath, "cipher_package.bin", sk_sig,
+                                             compression=COMPRESSION, aead=AEAD)
 
         write_file_bytes("cipher_signature.bin", signature)
         write_file_bytes("sender_pk_sig.bin", pk_sig)
@@ -23,6 +23,120 @@ HEADER_FIXED_SIZE = (
     8                   # file_size (uint64)
 )
 
+# Segmented streaming format (VERSION 2)
+STREAM_VERSION = 2
+
+# Per-segment nonce = prefix (7) || segment index (uint32) || last-segment flag (1)
+NONCE_PREFIX_SIZE = 7
+
+# Plaintext bytes per segment — bounds the memory used by encrypt/decrypt
+DEFAULT_SEGMENT_SIZE = 1024 * 1024      # 1 MB
+MIN_SEGMENT_SIZE = 4096                 # 4 KB
+MAX_SEGMENT_SIZE = 256 * 1024 * 1024    # 256 MB
+
+# Header size of a VERSION 2 package
+STREAM_HEADER_SIZE = (
+    len(MAGIC_BYTES) +
+    1 +                 # version
+    1 +                 # flags
+    1 +                 # compression codec
+    1 +                 # AEAD algorithm
+    NONCE_PREFIX_SIZE +
+    4 +                 # segment_size (uint32)
+    8                   # file_size (uint64)
+)
+
+# Header flags (VERSION 2)
+FLAG_INDEXED = 0x01     # segment offset index appended after the last segment
+
+# Segment index trailer: (count + 1) uint64 offsets, then magic + index offset
+INDEX_MAGIC = b"QCIX"
+INDEX_FOOTER_SIZE = len(INDEX_MAGIC) + 8
+
+# Compression codecs (VERSION 2). With a codec set, every segment record
+# is prefixed by its length (uint32) and its plaintext by a raw/compressed marker
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+
+# AEAD algorithms (VERSION 2). All three use 12-byte nonces and 16-byte tags,
+# so the segment layout does not depend on the choice
+AEAD_AES_GCM = 0
+AEAD_CHACHA20_POLY1305 = 1
+AEAD_AES_GCM_SIV = 2
+
+# Startup micro-benchmark used to pick the fastest AEAD on this host. The
+# choice is cached per user, not in the working directory
+AEAD_BENCH_SIZE = 1024 * 1024
+AEAD_CACHE_FILE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "quantacrypt", "aead_choice.json")
+
+# Bytes sampled to detect incompressible input, and the zlib ratio above
+# which compression is skipped
+COMPRESSION_SAMPLE_SIZE = 64 * 1024
+COMPRESSION_SKIP_RATIO = 0.9
+
+# Multi-file archive container
+ARCHIVE_MAGIC = b"QCARCH"
+ARCHIVE_VERSION = 1
+ARCHIVE_NONCE_PREFIX_SIZE = 8       # + 4-byte member index
+ARCHIVE_HEADER_SIZE = len(ARCHIVE_MAGIC) + 1 + ARCHIVE_NONCE_PREFIX_SIZE
+ARCHIVE_FOOTER_MAGIC = b"QCAX"
+ARCHIVE_FOOTER_SIZE = 8 + 8 + len(ARCHIVE_FOOTER_MAGIC)    # toc offset, toc length, magic
+
+# Resumable jobs: sidecar checkpoint next to the output, written at most
+# once per CHECKPOINT_INTERVAL plaintext bytes
+CHECKPOINT_SUFFIX = ".ckpt"
+CHECKPOINT_INTERVAL = 64 * 1024 * 1024
+
+# Content-defined chunking / deduplicated chunk store
+CDC_MIN_SIZE = 2 * 1024
+CDC_AVG_SIZE = 8 * 1024
+CDC_MAX_SIZE = 64 * 1024
+DEDUP_MANIFEST_VERSION = 1
+
+# Merkle-tree signature mode: leaves are fixed-size package chunks
+MERKLE_MAGIC = b"QCMERKLE"
+MERKLE_CHUNK_SIZE = 1024 * 1024
+
+# Batch signature verification: LRU entries keyed by (package digest, pk)
+VERIFY_CACHE_SIZE = 4096
+
+# Streaming BB84 simulation: qubits processed per block (multiple of 8)
+QKD_BLOCK_BITS = 1 << 20
+
+# Raw qubits per key-exchange session, and the secret bits a session must
+# keep after privacy amplification to yield a key (the 256-bit QKD key)
+QKD_DEFAULT_BITS = 16384
+QKD_MIN_SECURE_BITS = 256
+
+# QKD parameter estimation: fraction of sifted bits disclosed to estimate
+# QBER (at least QBER_MIN_SAMPLE, never more than QBER_MAX_SAMPLE_FRACTION
+# of it), and the failure probability of its two-sided Hoeffding
+# confidence interval
+QBER_SAMPLE_FRACTION = 0.1
+QBER_MIN_SAMPLE = 64
+QBER_MAX_SAMPLE_FRACTION = 0.25
+QBER_CONFIDENCE_EPS = 1e-3
+
+# Cascade error correction: number of passes (block size doubles each pass)
+CASCADE_PASSES = 4
+
+# Toeplitz privacy amplification: products with n * m up to this size
+# (n input bits, m output bits) are convolved directly, larger ones
+# through an FFT
+TOEPLITZ_DIRECT_MAX = 1 << 20
+
+# Background hybrid-key pool: keys kept ready, and consecutive compromised
+# QKD sessions after which an empty pool reports the channel as compromised
+KEY_POOL_HIGH_WATER = 32
+KEY_POOL_MAX_FAILURES = 8
+
+# Metrics experiment driver: per-case result cache, under each
+# generator's results directory
+EXPERIMENT_CACHE_DIR = "experiment_cache"
+
 # Audit log file name
 AUDIT_LOG_FILE = "audit.log"
 
@@ -0,0 +1,141 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from utils.constants import EXPERIMENT_CACHE_DIR
+
+# Shared driver for the metrics generators
+#
+# An experiment is a case function and a list of parameter dicts. Each
+# case gets its own RNG stream, spawned from the experiment seed with a
+# spawn key derived from the case parameters, so results do not depend
+# on the worker count, on scheduling, or on which other cases are in the
+# list. Completed cases are cached on disk (one JSON file per case keyed
+# by experiment name, parameters, seed and a hash of the repository
+# source loaded in the process), so an interrupted or repeated run only
+# computes the cases that are missing, and any code change starts over.
+# Wall-clock benchmarks pass cache=False (a stored timing says nothing
+# about this run) and workers=1 (parallel cases compete for the CPU).
+#
+# case_fn(params: dict, rng: numpy.random.Generator) -> JSON-serializable
+# result (NumPy arrays and scalars are converted to lists / numbers). It
+# must be a module-level function so process pools can pickle it.
+
+
+def _to_builtin(obj):
+    return obj.tolist()
+
+def _normalize(result):
+    # Fresh and cached results go through the same JSON round trip
+    return json.loads(json.dumps(result, default=_to_builtin))
+
+def case_key(name: str, params: dict, seed: int) -> str:
+    blob = json.dumps({"experiment": name, "params": params, "seed": seed},
+                      sort_keys=True, default=_to_builtin)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+def code_version() -> str:
+    """
+    SHA-256 over the repository source files imported in this process.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+    paths = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and path.endswith(".py"):
+            path = os.path.abspath(path)
+            if path.startswith(root):
+                paths.add(path)
+
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        h.update(os.path.relpath(path, root).encode())
+        with open(path, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+def case_rng(key: str, seed: int):
+    spawn_key = (int(key[:16], 16),)
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=spawn_key))
+
+
+def _run_case(case_fn, params: dict, key: str, seed: int):
+    return _normalize(case_fn(params, case_rng(key, seed)))
+
+
+class _CaseCache:
+    def __init__(self, directory: str, name: str, version: str):
+        self.directory = os.path.join(directory, name)
+        self.version = version
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # The case key also seeds the case RNG, so the code version only
+        # enters the file name
+        name = hashlib.sha256((key + self.version).encode()).hexdigest()
+        return os.path.join(self.directory, name + ".json")
+
+    def load(self, key: str):
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)["result"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def store(self, key: str, params: dict, seed: int, result):
+        path = self._path(key)
+        tmp_path = path + ".part"
+        with open(tmp_path, "w") as f:
+            json.dump({"params": params, "seed": seed, "code_version": self.version, "result": result},
+                      f, default=_to_builtin)
+        os.replace(tmp_path, path)
+
+
+def run_experiment(name: str, case_fn, cases, seed: int = 0, workers: int = None,
+                   cache_dir: str = EXPERIMENT_CACHE_DIR, refresh: bool = False, cache: bool = True):
+    """
+    Runs every case (cached ones are loaded instead) and returns the
+    results in the order of cases.
+
+    workers -> process pool size (default: os.cpu_count(); 1 runs inline)
+    refresh -> recompute every case, overwriting the cache
+    cache   -> False neither reads nor writes the cache (timing cases)
+    """
+    cases = list(cases)
+    store = _CaseCache(cache_dir, name, code_version()) if cache else None
+    keys = [case_key(name, params, seed) for params in cases]
+
+    results = [None] * len(cases)
+    pending = []
+    for i, key in enumerate(keys):
+        cached = None if refresh or store is None else store.load(key)
+        if cached is None:
+            pending.append(i)
+        else:
+            results[i] = cached
+
+    print(f"[*] {name}: {len(cases) - len(pending)} cached, {len(pending)} to run")
+
+    def finish(i, result):
+        results[i] = result
+        if store is not None:
+            store.store(keys[i], cases[i], seed, result)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(pending) <= 1:
+        for i in pending:
+            finish(i, _run_case(case_fn, cases[i], keys[i], seed))
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+        futures = {pool.submit(_run_case, case_fn, cases[i], keys[i], seed): i for i in pending}
+        for future in as_completed(futures):
+            # Stored as soon as it finishes, so an interruption keeps it
+            finish(futures[future], future.result())
+
+    return results
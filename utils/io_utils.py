@@ -30,6 +30,38 @@ def pack_uint64(value: int) -> bytes:
 def unpack_uint64(data: bytes) -> int:
     return int.from_bytes(data, byteorder="big")
 
+def pack_uint32(value: int) -> bytes:
+    return value.to_bytes(4, byteorder="big")
+
+def unpack_uint32(data: bytes) -> int:
+    return int.from_bytes(data, byteorder="big")
+
+# Read exactly n bytes unless EOF is reached first
+def read_exact(f, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) == n or not data:
+        return data
+
+    parts = [data]
+    remaining = n - len(data)
+    while remaining > 0:
+        chunk = f.read(remaining)
+        if not chunk:
+            break
+        parts.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(parts)
+
 def ensure_file_exists(path: str):
     if not os.path.isfile(path):
         raise FileNotFoundError(f"File does not exist: {path}")
+
+# Yields successive chunks of a file as slices of one reusable buffer.
+# Each slice is only valid until the next one is produced.
+def iter_file_chunks(path: str, chunk_size: int = 1024 * 1024):
+    ensure_file_exists(path)
+
+    buf = memoryview(bytearray(chunk_size))
+    with open(path, "rb") as f:
+        while n := f.readinto(buf):
+            yield buf[:n]